@@ -0,0 +1,51 @@
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from maiconverter.simai import fragment_cache, iter_catalog, parse_file
+
+from corpus import random_maidata
+
+
+def main():
+    parser = argparse.ArgumentParser("simai catalog scan")
+    parser.add_argument("-s", "--songs", type=int, default=2000)
+    parser.add_argument("-f", "--fragments", type=int, default=400)
+    parser.add_argument("-w", "--workers", type=int, default=None)
+    parser.add_argument(
+        "--parse", type=int, default=20, help="Songs fully parsed for comparison"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        text = random_maidata([args.fragments] * 5)
+        for i in range(args.songs):
+            os.mkdir(os.path.join(root, str(i)))
+            with open(os.path.join(root, str(i), "maidata.txt"), "w") as f:
+                f.write(text)
+
+        start = time.perf_counter()
+        count = sum(1 for _ in iter_catalog(root, workers=args.workers))
+        elapsed = time.perf_counter() - start
+        print(
+            f"catalog: {count} songs in {elapsed:.3f}s, "
+            f"{elapsed / count * 1e3:.3f}ms per song"
+        )
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(args.parse):
+                fragment_cache.clear()
+                parse_file(os.path.join(root, str(i), "maidata.txt"), workers=0)
+        elapsed = time.perf_counter() - start
+        print(
+            f"parse_file: {args.parse} songs in {elapsed:.3f}s, "
+            f"{elapsed / args.parse * 1e3:.3f}ms per song"
+        )
+
+
+if __name__ == "__main__":
+    main()
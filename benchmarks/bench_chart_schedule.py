@@ -0,0 +1,56 @@
+import argparse
+import contextlib
+import io
+import os
+import time
+
+from maiconverter.simai import parse_file_str, fragment_cache, get_executor
+from maiconverter.simai.executor import SCHEDULES
+
+from corpus import random_maidata
+
+
+def best_time(maidata: str, workers: int, schedule: str, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        # Every run has to parse every fragment
+        fragment_cache.clear()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            parse_file_str(maidata, workers=workers, schedule=schedule)
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser("simai chart scheduling")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count())
+    parser.add_argument(
+        "-c",
+        "--charts",
+        type=int,
+        nargs="+",
+        default=[300, 600, 1200, 2000, 3500, 5000],
+        help="Number of fragments of each chart",
+    )
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    maidata = random_maidata(args.charts, args.seed)
+    print(f"{len(args.charts)} charts, {sum(args.charts)} fragments")
+
+    # Start the worker pool before timing
+    best_time(maidata, args.workers, "hybrid", 1)
+    serial = best_time(maidata, 0, "fragment", args.repeat)
+    print(f"{'serial':<10}{serial:>10.3f}s")
+    for schedule in SCHEDULES:
+        elapsed = best_time(maidata, args.workers, schedule, args.repeat)
+        print(f"{schedule:<10}{elapsed:>10.3f}s{serial / elapsed:>8.2f}x")
+
+    get_executor(args.workers).shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import argparse
+import contextlib
+import io
+import random
+import re
+import time
+
+from corpus import random_chart
+from maiconverter.simai import SimaiChart, SimaiEditSession
+
+
+def edits(text, count, seed=0):
+    # Texts after changing one fragment at a time to a tap, keeping its
+    # BPM and divisor markers, like typing in an editor
+    rng = random.Random(seed)
+    fragments = text.split(",")
+    result = []
+    for _ in range(count):
+        i = rng.randrange(1, len(fragments) - 1)
+        markers = re.match(r"^(\([^)]*\)|\{[^}]*\})*", fragments[i]).group(0)
+        fragments[i] = markers + str(rng.randint(1, 8))
+        result.append(",".join(fragments))
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser("simai edit session")
+    parser.add_argument(
+        "-f", "--fragments", type=int, nargs="+", default=[1000, 4000, 16000]
+    )
+    parser.add_argument("-e", "--edits", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'fragments':>10}{'from_str':>12}{'update':>12}{'replayed':>10}")
+    for count in args.fragments:
+        texts = edits(random_chart(count), args.edits)
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for text in texts:
+                SimaiChart.from_str(text, workers=0)
+        full = (time.perf_counter() - start) / len(texts)
+
+        session = SimaiEditSession(random_chart(count), workers=0)
+        replayed = 0
+        start = time.perf_counter()
+        for text in texts:
+            replayed += session.update(text).replayed
+        update = (time.perf_counter() - start) / len(texts)
+
+        print(
+            f"{count:>10}{full * 1e3:>10.2f}ms{update * 1e3:>10.2f}ms"
+            f"{replayed / len(texts):>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import argparse
+import pickle
+import time
+
+from maiconverter.simai import SimaiChart, parse_fragment
+
+from corpus import random_fragments
+
+
+def main():
+    parser = argparse.ArgumentParser("simai event size and chart building")
+    parser.add_argument("-n", "--fragments", type=int, default=50000)
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    fragments = ["(150){16}"] + random_fragments(args.fragments, args.seed)
+    events_list = [parse_fragment(fragment) for fragment in fragments]
+    notes = sum(len(events) for events in events_list)
+
+    # What a worker sends back for a chunk of fragments
+    payload = len(pickle.dumps(events_list, pickle.HIGHEST_PROTOCOL))
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        pickle.loads(pickle.dumps(events_list, pickle.HIGHEST_PROTOCOL))
+    roundtrip = (time.perf_counter() - start) / args.repeat
+
+    build = float("inf")
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        SimaiChart.from_events(events_list)
+        build = min(build, time.perf_counter() - start)
+
+    print(f"{len(fragments)} fragments, {notes} events")
+    print(f"Pickled size:    {payload / notes:>8.1f} bytes/event")
+    print(f"Pickle + unpickle: {roundtrip / notes * 1e6:>6.2f} us/event")
+    print(f"from_events:       {build / notes * 1e6:>6.2f} us/event")
+
+
+if __name__ == "__main__":
+    main()
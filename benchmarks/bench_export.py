@@ -0,0 +1,69 @@
+import argparse
+import os
+import time
+import tracemalloc
+
+from corpus import random_simai_chart
+
+
+def best_time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+
+def peak_memory(func):
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser("simai chart export")
+    parser.add_argument(
+        "-n", "--notes", type=int, nargs="+", default=[1000, 10000, 100000]
+    )
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    parser.add_argument(
+        "-m", "--mode", choices=["default", "compact"], default="default"
+    )
+    args = parser.parse_args()
+
+    print(
+        f"{'notes':>8}{'export':>10}{'per note':>12}{'export_to':>12}"
+        f"{'peak export':>14}{'peak export_to':>16}"
+    )
+    with open(os.devnull, "w", encoding="utf-8") as out:
+        for count in args.notes:
+            simai = random_simai_chart(count, args.seed)
+
+            def to_string():
+                out.write(simai.export(mode=args.mode))
+
+            def to_stream():
+                simai.export_to(out, mode=args.mode)
+
+            best = best_time(to_string, args.repeat)
+            best_stream = best_time(to_stream, args.repeat)
+            peak = peak_memory(to_string)
+            peak_stream = peak_memory(to_stream)
+
+            print(
+                f"{count:>8}{best:>9.3f}s{best / count * 1e6:>10.1f}us"
+                f"{best_stream:>11.3f}s{peak / 1e6:>12.1f}MB{peak_stream / 1e6:>14.1f}MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+# Time from starting to load a parser to the end of the first parse, in a new
+# process each run, like a CLI invocation or a spawned pool worker
+SNIPPET = """
+import time
+from maiconverter.simai import simai_parser
+start = time.perf_counter()
+parser = simai_parser.{loader}
+parser.parse("1-5[8:1]*V35[4:1]")
+print(time.perf_counter() - start)
+"""
+
+LOADERS = {
+    "generated": "_get_generated_parser('simai_fragment.lark', "
+    "simai_parser._fragment_transformer)",
+    "lark": "get_parser('simai_fragment.lark', "
+    "transformer=simai_parser._fragment_transformer)",
+}
+
+
+def first_parse(loader: str, cache_dir: str) -> float:
+    env = dict(os.environ, MAICONVERTER_CACHE_DIR=cache_dir)
+    # Installed packages come with compiled bytecode, let the first run write it
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    output = subprocess.run(
+        [sys.executable, "-c", SNIPPET.format(loader=LOADERS[loader])],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return float(output)
+
+
+def main():
+    parser = argparse.ArgumentParser("simai time to first parse")
+    parser.add_argument("-r", "--repeat", type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cases = [
+            ("generated", "generated", ""),
+            ("Lark, no disk cache", "lark", ""),
+            ("Lark, disk cache", "lark", cache_dir),
+        ]
+        for name, loader, cache in cases:
+            try:
+                first_parse(loader, cache)
+            except subprocess.CalledProcessError:
+                print(f"{name}: unavailable, run python setup.py build_parsers -i")
+                continue
+
+            best = min(first_parse(loader, cache) for _ in range(args.repeat))
+            print(f"{name:<22}{best * 1000:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import argparse
+import random
+import time
+
+from maiconverter.simai import SlideNote, TapNote, convert_to_fragment
+
+
+def chord(size, seed=0):
+    # A star and a slide for every note, like a generated stress chart
+    rng = random.Random(seed)
+    events = []
+    for i in range(size):
+        position = i % 8
+        events.append(TapNote(1.0, position, is_star=True))
+
+        end_position = rng.randrange(8)
+        events.append(SlideNote(1.0, position, end_position, 0.5, "-"))
+
+    rng.shuffle(events)
+    return events
+
+
+def main():
+    parser = argparse.ArgumentParser("simai fragment emission")
+    parser.add_argument(
+        "-s", "--sizes", type=int, nargs="+", default=[8, 64, 512, 4096]
+    )
+    parser.add_argument("-r", "--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'slides':>8}{'best':>12}{'per note':>12}")
+    for size in args.sizes:
+        events = chord(size)
+        best = None
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            convert_to_fragment(events, 120.0)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        print(f"{size:>8}{best * 1e3:>10.3f}ms{best / len(events) * 1e6:>10.2f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import argparse
+import time
+
+from maiconverter.simai.simai_parser import (
+    check_fragment_scanner,
+    get_parser,
+    _lark_parse_fragment,
+)
+from maiconverter.simai.simai_scanner import scan_fragment
+
+from corpus import random_fragments
+
+
+def throughput(parse, fragments) -> float:
+    start = time.perf_counter()
+    for fragment in fragments:
+        parse(fragment)
+
+    return len(fragments) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser("simai fragment parser throughput")
+    parser.add_argument("-n", "--fragments", type=int, default=20000)
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    fragments = random_fragments(args.fragments, args.seed)
+    scanned = check_fragment_scanner(fragments)
+    print(f"{scanned}/{len(fragments)} fragments handled by the scanner")
+
+    # Exclude grammar loading from the Lark figures
+    get_parser("simai_fragment.lark")
+    lark_rate = throughput(_lark_parse_fragment, fragments)
+    scanner_rate = throughput(scan_fragment, fragments)
+    print(f"Lark:    {lark_rate:>12,.0f} fragments/sec")
+    print(f"Scanner: {scanner_rate:>12,.0f} fragments/sec")
+    print(f"Speedup: {scanner_rate / lark_rate:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
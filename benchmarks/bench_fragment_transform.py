@@ -0,0 +1,87 @@
+import argparse
+import time
+import tracemalloc
+
+from lark import Tree
+
+from maiconverter.simai.simai_parser import (
+    FRAGMENT_GRAMMAR,
+    FragmentTransformer,
+    get_fragment_parser,
+    get_parser,
+)
+
+from corpus import random_fragments
+
+
+def tree_parse(fragment: str):
+    # How fragments were parsed before: build a tree, then transform it
+    return FragmentTransformer().transform(get_parser(FRAGMENT_GRAMMAR).parse(fragment))
+
+
+def inline_parse(fragment: str):
+    return get_fragment_parser().parse(fragment)
+
+
+def count_trees(parse, fragments) -> int:
+    count = 0
+    init = Tree.__init__
+
+    def counting_init(self, *args, **kwargs):
+        nonlocal count
+        count += 1
+        init(self, *args, **kwargs)
+
+    Tree.__init__ = counting_init
+    try:
+        for fragment in fragments:
+            parse(fragment)
+    finally:
+        Tree.__init__ = init
+
+    return count
+
+
+def peak_memory(parse, fragments) -> int:
+    tracemalloc.start()
+    try:
+        for fragment in fragments:
+            parse(fragment)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def seconds(parse, fragments) -> float:
+    start = time.perf_counter()
+    for fragment in fragments:
+        parse(fragment)
+
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser("simai fragment tree-less transform")
+    parser.add_argument("-n", "--fragments", type=int, default=20000)
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    fragments = random_fragments(args.fragments, args.seed)
+    for fragment in fragments:
+        if tree_parse(fragment) != inline_parse(fragment):
+            raise AssertionError(f"Output differs for {fragment!r}")
+
+    print(f"{len(fragments)} fragments")
+    print(f"{'':<8}{'us/fragment':>12}{'trees/fragment':>16}{'peak KiB':>10}")
+    for name, parse in [("tree", tree_parse), ("inline", inline_parse)]:
+        elapsed = min(seconds(parse, fragments) for _ in range(3))
+        trees = count_trees(parse, fragments)
+        peak = peak_memory(parse, fragments[:1000])
+        print(
+            f"{name:<8}{elapsed / len(fragments) * 1e6:>12.1f}"
+            f"{trees / len(fragments):>16.2f}{peak / 1024:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import argparse
+import io
+import random
+import time
+
+from corpus import random_ma2
+from maiconverter.event import tick_to_measure
+from maiconverter.maima2 import MaiMa2, TapNote
+from maiconverter.maima2.tools import load_v1
+
+
+def del_tap_by_scan(ma2, tick, position):
+    # MaiMa2.del_tap before the note index, without the statistics
+    tap_notes = [
+        x
+        for x in ma2.notes
+        if isinstance(x, TapNote) and x.tick == tick and x.position == position
+    ]
+    for note in tap_notes:
+        ma2.notes.remove(note)
+
+
+def load(text):
+    ma2 = MaiMa2()
+    load_v1(ma2, io.StringIO(text))
+    return ma2
+
+
+def main():
+    parser = argparse.ArgumentParser("ma2 editing")
+    parser.add_argument("-n", "--notes", type=int, nargs="+", default=[2000, 20000])
+    parser.add_argument("-d", "--deletes", type=float, default=0.25)
+    args = parser.parse_args()
+
+    print(f"{'notes':>8}{'deletes':>9}{'scan':>10}{'index':>10}{'between':>11}")
+    for count in args.notes:
+        text = random_ma2(count)
+        taps = [
+            (note.tick, note.position)
+            for note in load(text).notes
+            if isinstance(note, TapNote)
+        ]
+        targets = random.Random(0).sample(taps, int(len(taps) * args.deletes))
+
+        ma2 = load(text)
+        start = time.perf_counter()
+        for tick, position in targets:
+            del_tap_by_scan(ma2, tick, position)
+        len(ma2.notes)
+        scan = time.perf_counter() - start
+
+        ma2 = load(text)
+        start = time.perf_counter()
+        for tick, position in targets:
+            ma2.del_tap(tick_to_measure(tick), position)
+        len(ma2.notes)
+        index = time.perf_counter() - start
+
+        # One query per measure of the chart
+        last = int(max(note.measure for note in ma2.notes)) + 1
+        start = time.perf_counter()
+        for measure in range(last):
+            ma2.notes_between(measure, measure + 1)
+        between = (time.perf_counter() - start) / last
+
+        print(
+            f"{count:>8}{len(targets):>9}{scan:>9.3f}s{index:>9.3f}s"
+            f"{between * 1e6:>9.1f}us"
+        )
+
+
+if __name__ == "__main__":
+    main()
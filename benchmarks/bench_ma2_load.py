@@ -0,0 +1,59 @@
+import argparse
+import os
+import tempfile
+import time
+
+from corpus import random_ma2
+from maiconverter.maima2 import MaiMa2
+
+
+def open_by_line(path):
+    # MaiMa2.open before load_v1
+    ma2 = MaiMa2()
+    with open(path, "r", encoding="utf-8") as in_f:
+        for line in in_f:
+            if line in ["\n", "\r\n"]:
+                continue
+
+            ma2.parse_line(line)
+
+    return ma2
+
+
+def best_time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser("ma2 loading")
+    parser.add_argument("-n", "--notes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'notes':>8}{'lines':>8}{'parse_line':>14}{'open':>14}")
+    for count in args.notes:
+        text = random_ma2(count)
+        lines = text.count("\n")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "chart.ma2")
+            with open(path, "w", encoding="utf-8") as out:
+                out.write(text)
+
+            by_line = best_time(lambda: open_by_line(path), args.repeat)
+            bulk = best_time(lambda: MaiMa2.open(path), args.repeat)
+
+        print(
+            f"{count:>8}{lines:>8}{lines / by_line / 1000:>10.0f}k/s"
+            f"{lines / bulk / 1000:>10.0f}k/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import argparse
+import os
+import tempfile
+import time
+
+from maiconverter.maima2 import MaiMa2, iter_probe
+
+from corpus import random_ma2
+
+
+def main():
+    parser = argparse.ArgumentParser("ma2 probe scan")
+    parser.add_argument("-c", "--charts", type=int, default=2000)
+    parser.add_argument("-n", "--notes", type=int, default=1000)
+    parser.add_argument("-w", "--workers", type=int, default=None)
+    parser.add_argument(
+        "--open", type=int, default=20, help="Charts fully opened for comparison"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        text = random_ma2(args.notes)
+        for i in range(args.charts):
+            with open(os.path.join(root, f"{i:06}_03.ma2"), "w") as f:
+                f.write(text)
+
+        start = time.perf_counter()
+        count = sum(1 for _ in iter_probe(root, workers=args.workers))
+        elapsed = time.perf_counter() - start
+        print(
+            f"iter_probe: {count} charts in {elapsed:.3f}s, "
+            f"{elapsed / count * 1e3:.3f}ms per chart"
+        )
+
+        start = time.perf_counter()
+        for i in range(args.open):
+            MaiMa2.open(os.path.join(root, f"{i:06}_03.ma2"))
+        elapsed = time.perf_counter() - start
+        print(
+            f"MaiMa2.open: {args.open} charts in {elapsed:.3f}s, "
+            f"{elapsed / args.open * 1e3:.3f}ms per chart"
+        )
+
+
+if __name__ == "__main__":
+    main()
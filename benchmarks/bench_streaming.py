@@ -0,0 +1,59 @@
+import argparse
+import contextlib
+import io
+import os
+import time
+import tracemalloc
+
+from maiconverter.simai import SimaiChart, fragment_cache, get_executor
+
+from corpus import random_chart
+
+
+def collected(chart: str, workers: int) -> SimaiChart:
+    # Waits for every fragment before building, like from_str used to
+    executor = get_executor(workers)
+    return SimaiChart.from_events(executor.parse("".join(chart.split()).split(",")))
+
+
+def streamed(chart: str, workers: int) -> SimaiChart:
+    with contextlib.redirect_stdout(io.StringIO()):
+        return SimaiChart.from_str(chart, workers=workers)
+
+
+def measure(build, chart: str, workers: int):
+    fragment_cache.clear()
+    start = time.perf_counter()
+    build(chart, workers)
+    elapsed = time.perf_counter() - start
+
+    fragment_cache.clear()
+    tracemalloc.start()
+    try:
+        build(chart, workers)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser("simai streaming chart construction")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count())
+    parser.add_argument("-n", "--fragments", type=int, default=100000)
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    chart = random_chart(args.fragments, args.seed)
+    # Start the worker pool before timing
+    streamed(random_chart(5000, args.seed + 1), args.workers)
+
+    print(f"{args.fragments} fragments, {args.workers} workers")
+    for name, build in [("collected", collected), ("streamed", streamed)]:
+        elapsed, peak = measure(build, chart, args.workers)
+        print(f"{name:<10}{elapsed:>8.2f}s{peak / 2 ** 20:>10.1f} MiB peak")
+
+
+if __name__ == "__main__":
+    main()
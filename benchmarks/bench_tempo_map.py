@@ -0,0 +1,52 @@
+import argparse
+import random
+import time
+
+from maiconverter.simai import SimaiChart
+
+
+def gimmick_chart(bpm_changes, seed=0):
+    # A BPM change on every fragment, each with a slide whose duration is
+    # given with an equivalent BPM, like gimmick charts
+    rng = random.Random(seed)
+    fragments = ["(150){8}1"]
+    for _ in range(bpm_changes):
+        bpm = rng.choice([75, 150, 300, 600, 1200])
+        start = rng.randrange(8) + 1
+        end = (start + 3) % 8 + 1
+        fragments.append(f"({bpm}){start}-{end}[{bpm}#8:1]")
+
+    return ",".join(fragments) + ",E"
+
+
+def best_time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser("simai tempo map")
+    parser.add_argument("-b", "--bpms", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'bpms':>8}{'parse':>10}{'per bpm':>12}{'export':>10}{'per bpm':>12}")
+    for count in args.bpms:
+        text = gimmick_chart(count)
+        simai = SimaiChart.from_str(text, workers=0)
+        parse = best_time(lambda: SimaiChart.from_str(text, workers=0), args.repeat)
+        export = best_time(simai.export, args.repeat)
+        print(
+            f"{count:>8}{parse:>9.3f}s{parse / count * 1e6:>10.1f}us"
+            f"{export:>9.3f}s{export / count * 1e6:>10.1f}us"
+        )
+
+
+if __name__ == "__main__":
+    main()
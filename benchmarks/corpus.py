@@ -0,0 +1,154 @@
+"""Synthetic simai input shared by the benchmarks."""
+
+import random
+from typing import List
+
+from maiconverter.simai import SimaiChart
+
+SLIDE_PATTERNS = ["-", "^", "<", ">", "s", "z", "v", "w", "p", "q", "pp", "qq"]
+
+
+def random_duration(rng: random.Random) -> str:
+    if rng.random() < 0.8:
+        return f"[{rng.choice([2, 4, 8, 16])}:{rng.randint(1, 4)}]"
+
+    return f"[{rng.choice([120, 160, 200])}#{rng.choice([4, 8])}:{rng.randint(1, 4)}]"
+
+
+def random_note(rng: random.Random) -> str:
+    button = str(rng.randint(1, 8))
+    roll = rng.random()
+    if roll < 0.5:
+        return button + rng.choice(["", "", "", "b", "x", "$"])
+    if roll < 0.65:
+        return button + rng.choice(["h", "hx"]) + random_duration(rng)
+    if roll < 0.85:
+        slide = button + rng.choice(SLIDE_PATTERNS) + str(rng.randint(1, 8))
+        slide += random_duration(rng)
+        if rng.random() < 0.2:
+            slide += "*" + rng.choice(SLIDE_PATTERNS) + str(rng.randint(1, 8))
+            slide += random_duration(rng)
+        return slide
+    if roll < 0.95:
+        return rng.choice(["C", "B3", "E5", "B8"]) + rng.choice(["", "f", "h[4:1]"])
+
+    return "`" + button
+
+
+def random_fragment(rng: random.Random) -> str:
+    fragment = ""
+    if rng.random() < 0.02:
+        fragment += f"({rng.choice([120, 150, 200])})"
+    if rng.random() < 0.05:
+        fragment += "{" + str(rng.choice([4, 8, 16, 12, 24, 1, 2, 32])) + "}"
+
+    count = rng.choice([0, 0, 1, 1, 1, 1, 2, 3])
+    return fragment + "/".join(random_note(rng) for _ in range(count))
+
+
+def random_fragments(count: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    fragments = [random_fragment(rng) for _ in range(count)]
+    # The parsers don't accept empty fragments
+    return [fragment for fragment in fragments if fragment != ""]
+
+
+def random_chart(fragment_count: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    fragments = ["(150){4}"] + [random_fragment(rng) for _ in range(fragment_count)]
+    lines = [",".join(fragments[i : i + 16]) for i in range(0, len(fragments), 16)]
+    return ",\n".join(lines) + ",\nE\n"
+
+
+def random_maidata(fragment_counts: List[int], seed: int = 0) -> str:
+    result = "&title=Benchmark\n&artist=maiconverter\n&first=0\n"
+    for i, count in enumerate(fragment_counts):
+        result += f"&lv_{i + 2}={i + 5}\n"
+        result += f"&inote_{i + 2}=" + random_chart(count, seed + i)
+
+    return result
+
+
+def random_simai_chart(note_count: int, seed: int = 0) -> SimaiChart:
+    # Notes on a 384 ticks per measure grid, like charts converted from ma2,
+    # with about 8 notes per measure and an occasional BPM change
+    rng = random.Random(seed)
+    simai = SimaiChart()
+    simai.set_bpm(0, 150)
+    measures = max(1, note_count // 8)
+    for _ in range(note_count // 500):
+        simai.set_bpm(1 + rng.randint(1, measures), rng.choice([120, 180, 200]))
+
+    for _ in range(note_count):
+        measure = 1 + rng.randint(0, measures) + rng.randrange(0, 384, 12) / 384
+        position = rng.randint(0, 7)
+        roll = rng.random()
+        if roll < 0.55:
+            simai.add_tap(measure, position, is_break=rng.random() < 0.1)
+        elif roll < 0.7:
+            simai.add_hold(measure, position, rng.randrange(24, 384, 24) / 384)
+        elif roll < 0.9:
+            simai.add_slide(
+                measure,
+                position,
+                (position + 4) % 8,
+                rng.randrange(96, 768, 48) / 384,
+                rng.choice(["-", ">", "<", "^", "s", "z"]),
+            )
+        else:
+            simai.add_touch_tap(measure, 0, "C")
+
+    return simai
+
+
+MA2_TAPS = ["TAP", "TAP", "TAP", "BRK", "XTP", "STR", "BST", "XST"]
+MA2_SLIDES = ["SI_", "SCL", "SCR", "SUL", "SUR", "SV_", "SXL", "SXR", "SLL", "SLR"]
+
+
+def random_ma2(note_count: int, seed: int = 0) -> str:
+    # A ma2 file with every note type on a 384 ticks per measure grid, about
+    # 8 notes per measure, and an occasional BPM change
+    rng = random.Random(seed)
+    lines = []
+    for i in range(note_count):
+        whole = 1 + i // 8
+        tick = rng.randrange(0, 384, 12)
+        position = rng.randint(0, 7)
+        roll = rng.random()
+        if roll < 0.55:
+            line_type = rng.choice(MA2_TAPS)
+            lines.append(f"{line_type}\t{whole}\t{tick}\t{position}")
+        elif roll < 0.7:
+            line_type = rng.choice(["HLD", "HLD", "XHO"])
+            duration = rng.randrange(24, 384, 24)
+            lines.append(f"{line_type}\t{whole}\t{tick}\t{position}\t{duration}")
+        elif roll < 0.9:
+            # Slides that pass check_slide for every pattern above
+            line_type = rng.choice(MA2_SLIDES)
+            end = (position + (-2 if line_type == "SLR" else 2)) % 8
+            duration = rng.randrange(96, 768, 48)
+            lines.append(
+                f"{line_type}\t{whole}\t{tick}\t{position}\t96\t{duration}\t{end}"
+            )
+        elif roll < 0.95:
+            lines.append(f"TTP\t{whole}\t{tick}\t{position}\tB\t0\tM1")
+        else:
+            duration = rng.randrange(96, 384, 96)
+            lines.append(f"THO\t{whole}\t{tick}\t0\t{duration}\tC\t1\tM1")
+
+    bpms = ["BPM\t0\t0\t150.000"]
+    for whole in sorted(rng.sample(range(2, 2 + note_count // 8), note_count // 500)):
+        bpms.append(f"BPM\t{whole}\t0\t{rng.choice([120, 180, 200])}.000")
+
+    header = [
+        "VERSION\t0.00.00\t1.03.00",
+        "FES_MODE\t0",
+        "BPM_DEF\t150.000\t150.000\t200.000\t120.000",
+        "MET_DEF\t4\t4",
+        "RESOLUTION\t384",
+        "CLK_DEF\t384",
+        "COMPATIBLE_CODE\tMA2",
+    ]
+    footer = [f"T_REC_ALL\t{note_count}", f"T_NUM_ALL\t{note_count}"]
+    sections = [header, bpms + ["MET\t0\t0\t4\t4"], lines, footer]
+    return "\n\n".join("\n".join(section) for section in sections) + "\n"
@@ -6,9 +6,16 @@ import sys
 
 import maiconverter
 from maiconverter.maicrypt import finale_file_encrypt, finale_file_decrypt
-from maiconverter.maima2 import MaiMa2
+from maiconverter.maima2 import MaiMa2, iter_probe, write_probes
 from maiconverter.maisxt import MaiSxt
-from maiconverter.simai import parse_file, SimaiChart
+from maiconverter.simai import (
+    parse_file,
+    SimaiChart,
+    MaiData,
+    iter_catalog,
+    profile_parsing,
+    write_catalog,
+)
 from maiconverter.converter import (
     ma2_to_sdt,
     ma2_to_simai,
@@ -34,6 +41,14 @@ def dir_path(string):
     raise NotADirectoryError(string)
 
 
+# Comma-separated chart numbers, like "5,6"
+def level_list(string):
+    try:
+        return [int(level) for level in string.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid chart numbers: {string}")
+
+
 def crypto(args, output):
     if args.key is None:
         raise RuntimeError("Key not supplied")
@@ -76,6 +91,36 @@ def crypto(args, output):
             handle_file(file, output, args.command, args.key)
 
 
+def catalog(args, output):
+    if not os.path.isdir(args.path):
+        raise NotADirectoryError(args.path)
+
+    path = os.path.join(output, "catalog." + args.catalog_format)
+    with open(path, "w", newline="", encoding="utf-8") as out:
+        count = write_catalog(
+            iter_catalog(args.path, workers=args.parse_workers, encoding=args.encoding),
+            out,
+            format=args.catalog_format,
+        )
+
+    print(f"Wrote {count} songs to {path}")
+
+
+def ma2_catalog(args, output):
+    if not os.path.isdir(args.path):
+        raise NotADirectoryError(args.path)
+
+    path = os.path.join(output, "ma2catalog." + args.catalog_format)
+    with open(path, "w", newline="", encoding="utf-8") as out:
+        count = write_probes(
+            iter_probe(args.path, workers=args.parse_workers, encoding=args.encoding),
+            out,
+            format=args.catalog_format,
+        )
+
+    print(f"Wrote {count} charts to {path}")
+
+
 def chart_convert(args, output):
     if args.command in ["ma2tosdt", "ma2tosimai"]:
         file_regex = r"\.ma2"
@@ -98,6 +143,20 @@ def chart_convert(args, output):
     else:
         files = [args.path]
 
+    if args.parse_profile is None:
+        convert_files(files, output, args)
+    else:
+        with profile_parsing() as profile:
+            convert_files(files, output, args)
+
+        print(profile.report(top=args.parse_profile))
+
+
+def convert_files(files, output, args):
+    if args.command == "ma2tosimai" and args.maidata:
+        handle_ma2_song(files, output, args)
+        return
+
     for file in files:
         name = os.path.splitext(os.path.basename(file))[0]
 
@@ -132,11 +191,65 @@ def handle_ma2(file, name, output_path, args):
         os.path.join(output_path, name + ext), "w+", newline="\r\n", encoding="utf-8"
     ) as out:
         if isinstance(output, SimaiChart):
-            out.write(output.export(max_den=args.max_divisor))
+            output.export_to(
+                out,
+                max_den=args.max_divisor,
+                mode="compact" if args.compact else "default",
+            )
         else:
             out.write(output.export())
 
 
+def ma2_difficulties(names):
+    # ma2 files of a song end with _00 for Basic up to _04 for Re:Master,
+    # which are charts 2 to 6 in a maidata. Files without a suffix get the
+    # lowest numbers that no other file uses, in order.
+    matches = [re.search(r"_(\d{2})$", name) for name in names]
+    used = {int(match.group(1)) + 2 for match in matches if match is not None}
+    difficulties = []
+    free = 2
+    for match in matches:
+        if match is not None:
+            difficulties.append(int(match.group(1)) + 2)
+            continue
+
+        while free in used:
+            free += 1
+        used.add(free)
+        difficulties.append(free)
+
+    return difficulties
+
+
+def handle_ma2_song(files, output_path, args):
+    if os.path.isdir(args.path):
+        title = os.path.basename(os.path.abspath(args.path))
+    else:
+        title = os.path.splitext(os.path.basename(args.path))[0]
+
+    maidata = MaiData(title)
+    files = sorted(files)
+    names = [os.path.splitext(os.path.basename(file))[0] for file in files]
+    for file, difficulty in zip(files, ma2_difficulties(names)):
+        try:
+            ma2 = MaiMa2.open(file, encoding=args.encoding)
+            if len(args.delay) != 0:
+                ma2.offset(args.delay)
+
+            maidata.add_chart(difficulty, ma2_to_simai(ma2))
+        except:
+            print(f"Error occurred processing {file}.")
+            raise
+
+    maidata.charts.sort(key=lambda chart: chart[0])
+    maidata.save(
+        os.path.join(output_path, "maidata.txt"),
+        workers=args.parse_workers,
+        max_den=args.max_divisor,
+        mode="compact" if args.compact else "default",
+    )
+
+
 def handle_sxt(file, name, output_path, args):
     sxt = MaiSxt.open(file, encoding=args.encoding, bpm=args.bpm)
     if len(args.delay) != 0:
@@ -153,7 +266,11 @@ def handle_sxt(file, name, output_path, args):
         os.path.join(output_path, name + ext), "w+", newline="\r\n", encoding="utf-8"
     ) as out:
         if isinstance(output, SimaiChart):
-            out.write(output.export(max_den=args.max_divisor))
+            output.export_to(
+                out,
+                max_den=args.max_divisor,
+                mode="compact" if args.compact else "default",
+            )
         else:
             out.write(output.export(resolution=args.resolution))
 
@@ -162,7 +279,11 @@ def handle_simai_chart(file, name, output_path, args):
     with open(file, "r", encoding=args.encoding) as f:
         chart_text = f.read()
 
-    simai = SimaiChart.from_str(chart_text, message=f"Parsing Simai chart at {file}...")
+    simai = SimaiChart.from_str(
+        chart_text,
+        message=f"Parsing Simai chart at {file}...",
+        workers=args.parse_workers,
+    )
     if len(args.delay) != 0:
         simai.offset(args.delay)
 
@@ -183,7 +304,12 @@ def handle_simai_chart(file, name, output_path, args):
 
 
 def handle_simai_file(file, output_path, args):
-    title, charts = parse_file(file, encoding=args.encoding)
+    title, charts = parse_file(
+        file,
+        encoding=args.encoding,
+        workers=args.parse_workers,
+        levels=args.levels,
+    )
     for i, chart in enumerate(charts):
         diff, simai_chart = chart
         if len(args.delay) != 0:
@@ -252,6 +378,8 @@ COMMANDS = [
     "simaifiletosdt",
     "simaitoma2",
     "simaitosdt",
+    "simaicatalog",
+    "ma2catalog",
 ]
 
 
@@ -319,6 +447,47 @@ def parse_arg():
         default=1000,
         help="Max divisor used in Simai export",
     )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Export Simai charts with the fewest characters instead of "
+        "starting lines at divisor changes",
+    )
+    parser.add_argument(
+        "--maidata",
+        action="store_true",
+        help="For ma2tosimai, write every ma2 chart of the input directory to "
+        "a single maidata.txt, one difficulty each, instead of one file per chart",
+    )
+    parser.add_argument(
+        "--catalog-format",
+        choices=["jsonl", "csv"],
+        default="jsonl",
+        help="Output format of simaicatalog and ma2catalog. Defaults to jsonl",
+    )
+    parser.add_argument(
+        "--parse-workers",
+        metavar="N",
+        type=int,
+        help="Number of worker processes used for parsing Simai charts and "
+        "exporting --maidata. 0 works serially. Defaults to the number of CPUs",
+    )
+    parser.add_argument(
+        "--parse-profile",
+        metavar="N",
+        type=int,
+        nargs="?",
+        const=10,
+        help="Print a histogram of Simai fragment parse times and the N "
+        "slowest fragments. N defaults to 10",
+    )
+    parser.add_argument(
+        "--levels",
+        metavar="N,N",
+        type=level_list,
+        help="Comma-separated chart numbers (the N in &inote_N) to convert for "
+        "simaifiletoma2/simaifiletosdt, like 5,6. Defaults to every chart",
+    )
     parser.add_argument(
         "-o",
         "--output",
@@ -357,6 +526,10 @@ def main():
     try:
         if args.command in ["encrypt", "decrypt"]:
             crypto(args, output_dir)
+        elif args.command == "simaicatalog":
+            catalog(args, output_dir)
+        elif args.command == "ma2catalog":
+            ma2_catalog(args, output_dir)
         else:
             chart_convert(args, output_dir)
     finally:
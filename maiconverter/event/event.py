@@ -1,5 +1,20 @@
 import enum
 
+# Ticks per measure of the time of every event. Divisible by the 384 and
+# 1920 resolutions of ma2 charts, by every power of two up to 1024, and
+# by 3, 5, 7, and 9, so the common ma2 grids and simai divisors are exact.
+TICKS_PER_MEASURE = 322560
+
+
+def measure_to_tick(measure: float) -> int:
+    """Converts a time in measures to the nearest tick."""
+    return round(measure * TICKS_PER_MEASURE)
+
+
+def tick_to_measure(tick: int) -> float:
+    """Converts a time in ticks to measures."""
+    return tick / TICKS_PER_MEASURE
+
 
 class EventType(enum.Enum):
     note = 0
@@ -8,9 +23,30 @@ class EventType(enum.Enum):
 
 
 class Event:
+    """Something that happens at a point in a chart.
+
+    The time is stored as an integer number of ticks, TICKS_PER_MEASURE
+    per measure, so events can be compared, hashed, grouped, and sorted
+    exactly. measure converts it from and to measures.
+
+    Attributes:
+        tick: Time of the event, in ticks.
+        event_type: What kind of event it is.
+    """
+
     def __init__(self, measure: float, event_type: EventType) -> None:
         if measure < 0:
             raise ValueError("Measure is negative " + str(measure))
 
-        self.measure = round(measure * 10000) / 10000
+        self.tick = round(measure * TICKS_PER_MEASURE)
         self.event_type = event_type
+
+    @property
+    def measure(self) -> float:
+        """Time of the event, in measures. Setting it rounds to the nearest
+        tick."""
+        return self.tick / TICKS_PER_MEASURE
+
+    @measure.setter
+    def measure(self, measure: float) -> None:
+        self.tick = round(measure * TICKS_PER_MEASURE)
@@ -1,5 +1,4 @@
 import enum
-import math
 from functools import total_ordering
 from typing import Dict
 
@@ -52,25 +51,27 @@ class Note(Event):
         self.position = position
         self.note_type = note_type
 
-    def __key(self):
-        return self.measure, self.event_type, self.position, self.note_type
+    def _key(self):
+        return self.tick, self.event_type, self.position, self.note_type
 
 
+# Notes are compared by tick, so equal times are exactly equal and sorting
+# is a total order
 @total_ordering
 class MaiNote(Note):
     def __hash__(self):
-        return hash(self.__key())
+        return hash(self._key())
 
     def __lt__(self, other):
-        if math.isclose(self.measure, other.measure, abs_tol=0.0001):
+        if self.tick == other.tick:
             if self.position == other.position:
                 return self.note_type.value < other.note_type.value
             return self.position < other.position
-        return self.measure < other.measure
+        return self.tick < other.tick
 
     def __eq__(self, other):
         return (
-            math.isclose(self.measure, other.measure, abs_tol=0.0001)
+            self.tick == other.tick
             and self.position == other.position
             and self.note_type.value == other.note_type.value
         )
@@ -79,20 +80,20 @@ class MaiNote(Note):
 @total_ordering
 class SimaiNote(Note):
     def __hash__(self):
-        return hash(self.__key())
+        return hash(self._key())
 
     def __lt__(self, other):
-        if math.isclose(self.measure, other.measure, abs_tol=0.0001):
+        if self.tick == other.tick:
             if self.note_type == other.note_type:
                 return self.position < other.position
             else:
                 return self.note_type.value < other.note_type.value
         else:
-            return self.measure < other.measure
+            return self.tick < other.tick
 
     def __eq__(self, other):
         return (
-            math.isclose(self.measure, other.measure, abs_tol=0.0001)
+            self.tick == other.tick
             and self.note_type.value == other.note_type.value
             and self.position == other.position
         )
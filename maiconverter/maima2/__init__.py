@@ -1,3 +1,10 @@
 from .ma2note import *
 from .tools import parse_v1
-from .maima2 import MaiMa2
+from .maima2 import MaiMa2, NoteIndex
+from .probe import (
+    Ma2Probe,
+    probe_ma2,
+    find_ma2_files,
+    iter_probe,
+    write_probes,
+)
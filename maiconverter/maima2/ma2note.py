@@ -1,7 +1,13 @@
 import math
 from typing import Tuple
 
-from maiconverter.event import MaiNote, NoteType, Event, EventType
+from maiconverter.event import (
+    MaiNote,
+    NoteType,
+    Event,
+    EventType,
+    TICKS_PER_MEASURE,
+)
 from maiconverter.tool import slide_distance
 
 # Dictionary for a note type's representation in ma2
@@ -84,7 +90,7 @@ class SlideNote(MaiNote):
         self.duration = duration
 
     def to_str(self, resolution: int = 384) -> str:
-        measure = measure_to_ma2_time(self.measure, resolution)
+        measure = tick_to_ma2_time(self.tick, resolution)
         template = "{}\t{}\t{}\t{}\t{}\t{}\t{}"
         inv_slide_dict = {v: k for k, v in slide_dict.items()}
         if self.pattern not in inv_slide_dict:
@@ -137,7 +143,7 @@ class HoldNote(MaiNote):
         self.duration = duration
 
     def to_str(self, resolution: int) -> str:
-        measure = measure_to_ma2_time(self.measure, resolution)
+        measure = tick_to_ma2_time(self.tick, resolution)
         template = "HLD\t{}\t{}\t{}\t{}"
         duration = round(self.duration * resolution)
         return template.format(measure[0], measure[1], self.position, duration)
@@ -179,7 +185,7 @@ class TapNote(MaiNote):
             super().__init__(measure, position, NoteType.tap)
 
     def to_str(self, resolution: int) -> str:
-        measure = measure_to_ma2_time(self.measure, resolution)
+        measure = tick_to_ma2_time(self.tick, resolution)
         template = "{}\t{}\t{}\t{}"
         inv_note_dict = {v: k for k, v in note_dict.items()}
         if self.note_type.value not in inv_note_dict:
@@ -231,7 +237,7 @@ class TouchTapNote(MaiNote):
         self.size = size
 
     def to_str(self, resolution: int) -> str:
-        measure = measure_to_ma2_time(self.measure, resolution)
+        measure = tick_to_ma2_time(self.tick, resolution)
         template = "TTP\t{}\t{}\t{}\t{}\t{}\t{}"
         fireworks = 1 if self.is_firework else 0
         return template.format(
@@ -289,7 +295,7 @@ class TouchHoldNote(MaiNote):
         self.size = size
 
     def to_str(self, resolution: int) -> str:
-        measure = measure_to_ma2_time(self.measure, resolution)
+        measure = tick_to_ma2_time(self.tick, resolution)
         template = "{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}"
         name = "THO"
         duration = round(self.duration * resolution)
@@ -334,10 +340,7 @@ class BPM(Event):
         self.bpm = bpm
 
     def to_str(self, resolution: int) -> str:
-        if self.measure == 0.0:
-            measure = (0, 0)
-        else:
-            measure = measure_to_ma2_time(self.measure, resolution)
+        measure = tick_to_ma2_time(self.tick, resolution)
 
         template = "BPM\t{}\t{}\t{:.3f}"
         return template.format(measure[0], measure[1], self.bpm)
@@ -378,10 +381,7 @@ class Meter(Event):
         self.denominator = meter_denominator
 
     def to_str(self, resolution: int) -> str:
-        if self.measure == 0.0:
-            measure = (0, 0)
-        else:
-            measure = measure_to_ma2_time(self.measure, resolution)
+        measure = tick_to_ma2_time(self.tick, resolution)
 
         template = "MET\t{}\t{}\t{}\t{}"
         return template.format(measure[0], measure[1], self.numerator, self.denominator)
@@ -424,12 +424,38 @@ def measure_to_ma2_time(measure: float, resolution: int) -> Tuple[int, int]:
     if measure < 0:
         raise ValueError("Measure is negative. " + str(measure))
 
-    (decimal_part, whole_part) = math.modf(measure)
+    decimal_part, whole_part = math.modf(measure)
     decimal_part = round(decimal_part * resolution)
 
     return int(whole_part), decimal_part
 
 
+def tick_to_ma2_time(tick: int, resolution: int) -> Tuple[int, int]:
+    """Convert a time in ticks to ma2's format, like measure_to_ma2_time.
+    The time is rounded to the nearest tick of the chart's resolution
+    with integers, so times on that grid convert exactly.
+
+    Args:
+        tick: The time a note happened, in ticks. See Event.
+        resolution: The number of ticks equal to one measure in the chart.
+
+    Returns:
+        A tuple (WHOLE_PART, FRACTIONAL_PART).
+
+    Raises:
+        ValueError: When tick is negative.
+
+    Examples:
+        >>> tick_to_ma2_time(measure_to_tick(2.5), 384)
+        (2, 192)
+    """
+    if tick < 0:
+        raise ValueError("Tick is negative. " + str(tick))
+
+    ma2_ticks = (2 * tick * resolution + TICKS_PER_MEASURE) // (2 * TICKS_PER_MEASURE)
+    return divmod(ma2_ticks, resolution)
+
+
 def check_slide(pattern: int, start_position: int, end_position: int):
     """Function that checks a slide if it's valid. Will raise a ValueError if given
     a slide that will crash the game or has undefined behaviour.
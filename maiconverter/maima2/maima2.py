@@ -1,8 +1,9 @@
 from __future__ import annotations
 
+import bisect
 import math
-from collections import defaultdict
-from typing import Tuple, List, Union
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, Optional, Tuple, List, Type, Union
 
 from .ma2note import (
     TapNote,
@@ -14,8 +15,9 @@ from .ma2note import (
     Meter,
     check_slide,
 )
-from .tools import parse_v1
-from maiconverter.event import NoteType
+from .tools import parse_v1, load_v1, SUPPORTED_V1
+from .probe import Ma2Probe, probe_ma2
+from maiconverter.event import NoteType, measure_to_tick
 from maiconverter.tool import (
     second_to_measure,
     measure_to_second,
@@ -25,6 +27,126 @@ from maiconverter.tool import (
 # Latest chart version
 MA2_VERSION = "1.03.00"
 
+Ma2Note = Union[TapNote, HoldNote, SlideNote, TouchTapNote, TouchHoldNote]
+
+
+def _index_key(note: Ma2Note) -> tuple:
+    # What del_* methods match for each kind of note
+    if isinstance(note, SlideNote):
+        return note.tick, note.position, note.end_position
+    if isinstance(note, (TouchTapNote, TouchHoldNote)):
+        return note.tick, note.position, note.region
+
+    return note.tick, note.position
+
+
+class NoteIndex:
+    """The notes of a ma2 chart by kind, for finding them by time and
+    position with a dict lookup, and by time range with bisect, instead of
+    scanning every note. Also finds where notes are in the list they were
+    indexed from, as long as notes are only appended to it or deleted.
+
+    Attributes:
+        keys: Notes of each kind by tick and position, and by end position
+            for slides or region for touch notes.
+        ticks: Ticks with at least one note of each kind, in ascending order.
+        at: Notes of each kind by tick.
+        slots: Position of each note in the list when it was added, by id.
+    """
+
+    def __init__(self, notes: List[Ma2Note]) -> None:
+        self.keys: Dict[type, Dict[tuple, List[Ma2Note]]] = defaultdict(dict)
+        self.ticks: Dict[type, List[int]] = defaultdict(list)
+        self.at: Dict[type, Dict[int, List[Ma2Note]]] = defaultdict(dict)
+        self.reslot(notes)
+        for note in notes:
+            self._index(note)
+
+    def reslot(self, notes: List[Ma2Note]) -> None:
+        """Records the position of every note in the list."""
+        self.slots: Dict[int, int] = {id(note): i for i, note in enumerate(notes)}
+        self._next = len(notes)
+        self._size = max(2 * len(notes), 1024)
+        # Fenwick tree counting the slots whose notes were deleted
+        self._deleted = [0] * (self._size + 1)
+
+    def find(self, note: Ma2Note) -> Optional[int]:
+        """Returns the position of a note in the list, which is its slot
+        minus the number of notes deleted before it, or None if unknown."""
+        slot = self.slots.get(id(note))
+        if slot is None:
+            return None
+
+        deleted = 0
+        i = slot + 1
+        while i > 0:
+            deleted += self._deleted[i]
+            i -= i & -i
+
+        return slot - deleted
+
+    def forget(self, note: Ma2Note) -> None:
+        """Records that a note was deleted from the list."""
+        i = self.slots.pop(id(note)) + 1
+        while i <= self._size:
+            self._deleted[i] += 1
+            i += i & -i
+
+    def add(self, note: Ma2Note) -> None:
+        """Indexes a note appended to the list."""
+        # Notes past the size of the tree have no slot until reslot
+        if self._next < self._size:
+            self.slots[id(note)] = self._next
+            self._next += 1
+
+        self._index(note)
+
+    def _index(self, note: Ma2Note) -> None:
+        kind = type(note)
+        self.keys[kind].setdefault(_index_key(note), []).append(note)
+        at = self.at[kind]
+        if note.tick in at:
+            at[note.tick].append(note)
+        else:
+            at[note.tick] = [note]
+            bisect.insort(self.ticks[kind], note.tick)
+
+    def pop(self, kind: type, key: tuple) -> List[Ma2Note]:
+        """Removes and returns the notes of a kind with the given key."""
+        notes = self.keys[kind].pop(key, [])
+        if len(notes) == 0:
+            return notes
+
+        # Every note of a key is on the same tick
+        at = self.at[kind]
+        popped = {id(note) for note in notes}
+        same_tick = [x for x in at[key[0]] if id(x) not in popped]
+        if len(same_tick) == 0:
+            del at[key[0]]
+            ticks = self.ticks[kind]
+            del ticks[bisect.bisect_left(ticks, key[0])]
+        else:
+            at[key[0]] = same_tick
+
+        return notes
+
+    def between(
+        self, start: int, end: int, kinds: Optional[Iterable[type]] = None
+    ) -> List[Ma2Note]:
+        """Returns the notes from tick start up to but not including tick
+        end, sorted by tick."""
+        result = []
+        for kind in self.ticks if kinds is None else kinds:
+            ticks = self.ticks.get(kind, [])
+            at = self.at[kind]
+            for tick in ticks[
+                bisect.bisect_left(ticks, start) : bisect.bisect_left(ticks, end)
+            ]:
+                result.extend(at[tick])
+
+        result.sort(key=lambda x: x.tick)
+        return result
+
 
 class MaiMa2:
     """A class that represents a ma2 chart. Contains notes, bpm,
@@ -69,9 +191,10 @@ class MaiMa2:
         self.fes_mode = fes_mode
         self.bpms: List[BPM] = []
         self.meters: List[Meter] = []
-        self.notes: List[
-            Union[TapNote, HoldNote, SlideNote, TouchTapNote, TouchHoldNote]
-        ] = []
+        self.notes: List[Ma2Note] = []
+        self._note_index: Optional[NoteIndex] = None
+        # Identity and length of notes when the index was last up to date
+        self._index_key: Optional[Tuple[int, int]] = None
         self.notes_stat = {
             "TAP": 0,
             "BRK": 0,
@@ -90,19 +213,115 @@ class MaiMa2:
         self.version = ("0.00.00", version)
         self.resolution = 384
 
+    def _index_in_step(self) -> bool:
+        return self._note_index is not None and self._index_key == (
+            id(self.notes),
+            len(self.notes),
+        )
+
+    def note_index(self) -> NoteIndex:
+        """Returns the notes indexed by kind, time, and position. It is kept
+        up to date by add_* and del_* methods, until offset changes the
+        notes, or notes is replaced or changes length.
+
+        Note:
+            Call invalidate_note_index after changing the time, position,
+            end position, or region of a note in notes directly.
+        """
+        if not self._index_in_step():
+            self._note_index = NoteIndex(self.notes)
+            self._index_key = (id(self.notes), len(self.notes))
+
+        return self._note_index
+
+    def invalidate_note_index(self) -> None:
+        """Rebuilds the note index on next use."""
+        self._note_index = None
+
+    def notes_between(
+        self,
+        start: float,
+        end: float,
+        kinds: Optional[Iterable[Type[Ma2Note]]] = None,
+    ) -> List[Ma2Note]:
+        """Gets the notes from measure start up to but not including end,
+        sorted by time, without scanning every note.
+
+        Args:
+            start: First measure of the range.
+            end: Measure after the range.
+            kinds: Note classes to include, like TapNote or SlideNote.
+                Defaults to every kind of note.
+
+        Examples:
+            Get the taps and holds in measure 2.
+
+            >>> ma2 = MaiMa2()
+            >>> ma2.add_tap(1, 7).add_tap(2.5, 3).add_slide(2.5, 3, 7, 0.5, 1)
+            >>> notes = ma2.notes_between(2, 3, kinds=[TapNote, HoldNote])
+            >>> [(note.measure, note.position) for note in notes]
+            [(2.5, 3)]
+        """
+        return self.note_index().between(
+            measure_to_tick(start), measure_to_tick(end), kinds
+        )
+
+    def _add_note(self, note: Ma2Note) -> None:
+        in_step = self._index_in_step()
+        self.notes.append(note)
+        if in_step:
+            self._note_index.add(note)
+            self._index_key = (id(self.notes), len(self.notes))
+
+    def _pop_notes(self, kind: Type[Ma2Note], key: tuple) -> List[Ma2Note]:
+        index = self.note_index()
+        notes = index.pop(kind, key)
+        for note in notes:
+            i = index.find(note)
+            if i is None or i >= len(self.notes) or self.notes[i] is not note:
+                # notes was reordered, like by export, or outgrew the slots
+                index.reslot(self.notes)
+                i = index.find(note)
+
+            del self.notes[i]
+            index.forget(note)
+
+        self._index_key = (id(self.notes), len(self.notes))
+        return notes
+
     @classmethod
     def open(cls, path: str, encoding: str = "utf-8") -> MaiMa2:
+        """Opens a ma2 file. The file is read in large blocks by load_v1,
+        which gives the same chart as calling parse_line on every line.
+
+        Args:
+            path: Path of the ma2 file.
+            encoding: Encoding of the ma2 file.
+
+        Raises:
+            ValueError: When the ma2 version is not supported, or a note or
+                slide is invalid.
+        """
         ma2 = cls()
         with open(path, "r", encoding=encoding) as in_f:
-            for line in in_f:
-                if line in ["\n", "\r\n"]:
-                    continue
-
-                ma2.parse_line(line)
+            load_v1(ma2, in_f)
 
         return ma2
 
+    @staticmethod
+    def probe(path: str, encoding: str = "utf-8") -> Ma2Probe:
+        """Reads the header and summary lines of a ma2 file without reading
+        its notes. See probe_ma2.
+
+        Examples:
+            >>> MaiMa2.probe("001234_03.ma2").summary["T_REC_ALL"]
+            2
+        """
+        return probe_ma2(path, encoding)
+
     def parse_line(self, line: str) -> MaiMa2:
+        """Reads a single line of a ma2 file, for building a chart a line at
+        a time. Use open for whole files."""
         # Ma2 notes are tab-separated so we make a list called values that contains all the info
         values = line.rstrip().split("\t")
         line_type = values[0]
@@ -110,7 +329,7 @@ class MaiMa2:
             self.version = (values[1], values[2])
         elif line_type == "FES_MODE":
             self.fes_mode = values[1] == "1"
-        elif self.version[1] in ["1.02.00", "1.03.00"]:
+        elif self.version[1] in SUPPORTED_V1:
             parse_v1(self, values)
         else:
             raise ValueError(f"Unknown Ma2 version: {self.version}")
@@ -336,7 +555,7 @@ class MaiMa2:
         elif not is_break and not is_star and not is_ex:
             self.notes_stat["TAP"] += 1
 
-        self.notes.append(tap_note)
+        self._add_note(tap_note)
 
         return self
 
@@ -354,13 +573,8 @@ class MaiMa2:
             >>> ma2.add_tap(26.75, 4, is_break=True)
             >>> ma2.del_tap(26.75, 4)
         """
-        tap_notes = [
-            x
-            for x in self.notes
-            if isinstance(x, TapNote)
-            and math.isclose(x.measure, measure, abs_tol=0.0001)
-            and x.position == position
-        ]
+        tick = measure_to_tick(measure)
+        tap_notes = self._pop_notes(TapNote, (tick, position))
         for note in tap_notes:
             is_ex = note.note_type in [NoteType.ex_tap, NoteType.ex_star]
             is_break = note.note_type in [NoteType.break_tap, NoteType.break_star]
@@ -369,7 +583,6 @@ class MaiMa2:
                 NoteType.ex_star,
                 NoteType.break_star,
             ]
-            self.notes.remove(note)
             if is_ex and is_star:
                 self.notes_stat["XST"] -= 1
             elif is_ex and not is_star:
@@ -419,7 +632,7 @@ class MaiMa2:
         else:
             self.notes_stat["HLD"] += 1
 
-        self.notes.append(hold_note)
+        self._add_note(hold_note)
 
         return self
 
@@ -439,16 +652,10 @@ class MaiMa2:
             >>> ma2.add_hold(3.25, 0, 2)
             >>> ma2.del_hold(3.25, 0)
         """
-        hold_notes = [
-            x
-            for x in self.notes
-            if isinstance(x, HoldNote)
-            and math.isclose(x.measure, measure, abs_tol=0.0001)
-            and x.position == position
-        ]
+        tick = measure_to_tick(measure)
+        hold_notes = self._pop_notes(HoldNote, (tick, position))
         for note in hold_notes:
             is_ex = note.note_type == NoteType.ex_hold
-            self.notes.remove(note)
             if is_ex:
                 self.notes_stat["XHO"] -= 1
             else:
@@ -503,7 +710,7 @@ class MaiMa2:
             delay,
         )
         self.notes_stat["SLD"] += 1
-        self.notes.append(slide_note)
+        self._add_note(slide_note)
 
         return self
 
@@ -513,17 +720,10 @@ class MaiMa2:
         start_position: int,
         end_position: int,
     ) -> MaiMa2:
-        slide_notes = [
-            x
-            for x in self.notes
-            if isinstance(x, SlideNote)
-            and math.isclose(x.measure, measure, abs_tol=0.0001)
-            and x.position == start_position
-            and x.end_position == end_position
-        ]
+        tick = measure_to_tick(measure)
+        slide_notes = self._pop_notes(SlideNote, (tick, start_position, end_position))
 
         for note in slide_notes:
-            self.notes.remove(note)
             self.notes_stat["SLD"] -= 1
 
         return self
@@ -557,21 +757,14 @@ class MaiMa2:
         """
         touch_tap = TouchTapNote(measure, position, region, is_firework, size)
         self.notes_stat["TTP"] += 1
-        self.notes.append(touch_tap)
+        self._add_note(touch_tap)
 
         return self
 
     def del_touch_tap(self, measure: float, position: int, region: str) -> MaiMa2:
-        touch_taps = [
-            x
-            for x in self.notes
-            if isinstance(x, TouchTapNote)
-            and math.isclose(x.measure, measure, abs_tol=0.0001)
-            and x.position == position
-            and x.region == region
-        ]
+        tick = measure_to_tick(measure)
+        touch_taps = self._pop_notes(TouchTapNote, (tick, position, region))
         for note in touch_taps:
-            self.notes.remove(note)
             self.notes_stat["TTP"] -= 1
 
         return self
@@ -610,7 +803,7 @@ class MaiMa2:
             measure, position, region, duration, is_firework, size
         )
         self.notes_stat["THO"] += 1
-        self.notes.append(touch_tap)
+        self._add_note(touch_tap)
 
         return self
 
@@ -620,16 +813,9 @@ class MaiMa2:
         position: int,
         region: str,
     ) -> MaiMa2:
-        touch_holds = [
-            x
-            for x in self.notes
-            if isinstance(x, TouchHoldNote)
-            and math.isclose(x.measure, measure, abs_tol=0.0001)
-            and x.position == position
-            and x.region == region
-        ]
+        tick = measure_to_tick(measure)
+        touch_holds = self._pop_notes(TouchHoldNote, (tick, position, region))
         for note in touch_holds:
-            self.notes.remove(note)
             self.notes_stat["THO"] -= 1
 
         return self
@@ -637,20 +823,23 @@ class MaiMa2:
     def offset(self, offset: Union[float, str]) -> MaiMa2:
         offset = offset_arg_to_measure(offset, self.second_to_measure)
 
+        offset = measure_to_tick(offset)
         for note in self.notes:
-            note.measure = round(note.measure + offset, 4)
+            note.tick += offset
+
+        self._note_index = None
 
         for bpm in self.bpms:
             if 0 <= bpm.measure <= 1:
                 continue
 
-            bpm.measure = round(bpm.measure + offset, 4)
+            bpm.tick += offset
 
         for meter in self.meters:
             if 0 <= meter.measure <= 1:
                 continue
 
-            meter.measure = round(meter.measure + offset, 4)
+            meter.tick += offset
 
         return self
 
@@ -769,17 +958,12 @@ class MaiMa2:
         result += "T_JUDGE_SLD\t{}\n".format(num_slides)
         result += "T_JUDGE_ALL\t{}\n".format(judge_all)
 
-        taps = [
-            note.measure
+        taps = Counter(
+            note.tick
             for note in self.notes
             if isinstance(note, (TapNote, HoldNote, TouchTapNote, TouchHoldNote))
-        ]
-        measures = set(taps)
-        num_eachpairs = 0
-
-        for measure in measures:
-            if taps.count(measure) > 1:
-                num_eachpairs += 1
+        )
+        num_eachpairs = sum(1 for count in taps.values() if count > 1)
 
         result += "TTM_EACHPAIRS\t{}\n".format(num_eachpairs)
 
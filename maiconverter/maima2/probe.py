@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import os
+from types import MappingProxyType
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    TextIO,
+    Tuple,
+)
+
+from maiconverter.simai.records import (
+    RECORD_FORMATS,
+    find_files,
+    iter_records,
+    write_records,
+)
+
+PROBE_FORMATS = RECORD_FORMATS
+# Summary lines at the end of a ma2 file, in the order they are written
+SUMMARY_KEYS = [
+    "T_REC_TAP",
+    "T_REC_BRK",
+    "T_REC_XTP",
+    "T_REC_HLD",
+    "T_REC_XHO",
+    "T_REC_STR",
+    "T_REC_BST",
+    "T_REC_XST",
+    "T_REC_TTP",
+    "T_REC_THO",
+    "T_REC_SLD",
+    "T_REC_ALL",
+    "T_NUM_TAP",
+    "T_NUM_BRK",
+    "T_NUM_HLD",
+    "T_NUM_SLD",
+    "T_NUM_ALL",
+    "T_JUDGE_TAP",
+    "T_JUDGE_HLD",
+    "T_JUDGE_SLD",
+    "T_JUDGE_ALL",
+    "TTM_EACHPAIRS",
+    "TTM_SCR_TAP",
+    "TTM_SCR_BRK",
+    "TTM_SCR_HLD",
+    "TTM_SCR_SLD",
+    "TTM_SCR_ALL",
+    "TTM_SCR_S",
+    "TTM_SCR_SS",
+    "TTM_RAT_ACV",
+]
+_SUMMARY_PREFIXES = ("T_REC_", "T_NUM_", "T_JUDGE_", "TTM_")
+# Lines before the first BPM line
+_HEADER_KEYS = {
+    "VERSION",
+    "FES_MODE",
+    "BPM_DEF",
+    "MET_DEF",
+    "RESOLUTION",
+    "CLK_DEF",
+    "COMPATIBLE_CODE",
+}
+# Number of bytes read from the end of a file at first. The summary of
+# official charts is about 600 bytes.
+PROBE_TAIL = 4096
+CSV_HEADER = (
+    ["path", "version", "fes_mode", "bpm_def", "met_def", "resolution"]
+    + SUMMARY_KEYS
+    + ["error"]
+)
+
+
+class Ma2Probe(NamedTuple):
+    """Header and summary lines of a ma2 file, read without its notes.
+
+    Attributes:
+        path: Path of the ma2 file.
+        version: Values of "VERSION", like MaiMa2.version.
+        fes_mode: Whether "FES_MODE" is 1.
+        bpm_def: Values of "BPM_DEF": starting, mode, highest, and lowest
+            BPM.
+        met_def: Values of "MET_DEF": numerator and denominator.
+        resolution: Value of "RESOLUTION", or None if missing.
+        summary: Value of each "T_REC_*", "T_NUM_*", "T_JUDGE_*", and "TTM_*"
+            line, by name.
+        error: Why the file couldn't be read, or None.
+    """
+
+    path: str
+    version: Tuple[str, ...] = ()
+    fes_mode: bool = False
+    bpm_def: Tuple[float, ...] = ()
+    met_def: Tuple[int, ...] = ()
+    resolution: Optional[int] = None
+    summary: Mapping[str, int] = MappingProxyType({})
+    error: Optional[str] = None
+
+
+def _read_head(f, encoding: str) -> Dict[str, List[str]]:
+    # Reads lines until the first one that isn't part of the header
+    header = {}
+    for line in f:
+        values = line.decode(encoding).rstrip().split("\t")
+        if values[0] in _HEADER_KEYS:
+            header[values[0]] = values[1:]
+        elif values[0] != "":
+            break
+
+    return header
+
+
+def _read_tail(f, size: int, encoding: str) -> Dict[str, int]:
+    # Reads the summary lines at the end of the file, reading further back
+    # until a line before the summary is found
+    tail = PROBE_TAIL
+    while True:
+        start = max(0, size - tail)
+        f.seek(start)
+        lines = f.read(size - start).split(b"\n")
+        if start != 0:
+            # The first line is cut
+            lines.pop(0)
+
+        # Summary lines from the last one up
+        summary = []
+        complete = start == 0
+        for line in reversed(lines):
+            values = line.decode(encoding).rstrip().split("\t")
+            if values[0] == "":
+                if len(summary) == 0:
+                    continue
+                complete = True
+                break
+            if not values[0].startswith(_SUMMARY_PREFIXES):
+                complete = True
+                break
+
+            summary.append((values[0], int(values[1])))
+
+        if complete:
+            summary.reverse()
+            return dict(summary)
+
+        tail *= 4
+
+
+def probe_ma2(path: str, encoding: str = "utf-8") -> Ma2Probe:
+    """Reads the header and summary lines of a ma2 file. Only the start and
+    the end of the file are read, note lines are skipped entirely. Files
+    that can't be read give a record with only path and error set.
+
+    Args:
+        path: Path of the ma2 file.
+        encoding: Encoding of the ma2 file.
+
+    Examples:
+        >>> probe = probe_ma2("001234_03.ma2")
+        >>> probe.bpm_def[0], probe.summary["T_REC_ALL"]
+        (160.0, 2)
+    """
+    try:
+        with open(path, "rb") as f:
+            header = _read_head(f, encoding)
+            summary = _read_tail(f, f.seek(0, os.SEEK_END), encoding)
+
+        resolution = header.get("RESOLUTION")
+        return Ma2Probe(
+            path,
+            tuple(header.get("VERSION", [])),
+            header.get("FES_MODE", ["0"])[0] == "1",
+            tuple(float(x) for x in header.get("BPM_DEF", [])),
+            tuple(int(x) for x in header.get("MET_DEF", [])),
+            None if resolution is None else int(resolution[0]),
+            summary,
+        )
+    except (OSError, UnicodeDecodeError, ValueError, IndexError) as e:
+        return Ma2Probe(path, error=f"{type(e).__name__}: {e}")
+
+
+def find_ma2_files(root: str) -> List[str]:
+    """Finds every .ma2 file, ignoring case, under root. Returns their paths
+    sorted."""
+    return find_files(root, lambda file: file.endswith(".ma2"))
+
+
+def iter_probe(
+    root: str, workers: Optional[int] = None, encoding: str = "utf-8"
+) -> Iterator[Ma2Probe]:
+    """Probes every ma2 file under a directory on the worker pool, and
+    yields one record per file sorted by path.
+
+    Args:
+        root: Directory of the game data.
+        workers: Number of worker processes. Defaults to the number of
+            CPUs. 0 reads every file in the current process.
+        encoding: Encoding of ma2 files.
+
+    Examples:
+        Write a JSON line per ma2 file of a data dump.
+
+        >>> with open("ma2.jsonl", "w", encoding="utf-8") as out:
+        ...     write_probes(iter_probe("A000"), out)
+    """
+    return iter_records(find_ma2_files(root), probe_ma2, workers, encoding)
+
+
+def _csv_row(record: Ma2Probe) -> list:
+    return (
+        [
+            record.path,
+            " ".join(record.version),
+            int(record.fes_mode),
+            " ".join(str(x) for x in record.bpm_def),
+            " ".join(str(x) for x in record.met_def),
+            record.resolution,
+        ]
+        + [record.summary.get(key, "") for key in SUMMARY_KEYS]
+        + [record.error]
+    )
+
+
+def write_probes(
+    records: Iterable[Ma2Probe], stream: TextIO, format: str = "jsonl"
+) -> int:
+    """Writes ma2 probe records as they come.
+
+    Args:
+        records: Records from iter_probe or probe_ma2.
+        stream: A text stream. Open CSV files with newline="".
+        format: "jsonl" writes a JSON object per line. "csv" writes a
+            header, then a row per file with a column per summary line.
+            Lists are written separated by spaces.
+
+    Returns:
+        The number of records written.
+
+    Raises:
+        ValueError: When format is unknown.
+    """
+    return write_records(records, stream, format, CSV_HEADER, _csv_row)
@@ -1,6 +1,21 @@
-from typing import List
+from collections import Counter
+from typing import Callable, Dict, List, Optional, TextIO, Tuple
 
-from .ma2note import note_dict, slide_dict
+from .ma2note import (
+    note_dict,
+    slide_dict,
+    check_slide,
+    TapNote,
+    HoldNote,
+    SlideNote,
+    TouchTapNote,
+    TouchHoldNote,
+)
+
+# Versions read by parse_v1 and load_v1
+SUPPORTED_V1 = ("1.02.00", "1.03.00")
+# Number of characters read at a time by load_v1
+LOAD_BLOCK = 1 << 20
 
 _ignored_v1 = [
     "VERSION",
@@ -53,7 +68,7 @@ def parse_v1(ma2, values: List[str]) -> None:
         return
     if line_type == "RESOLUTION":
         # Set the max number of ticks in a measure
-        ma2._resolution = int(values[1])
+        ma2.resolution = int(values[1])
     elif line_type == "BPM":
         # Set the BPM for a measure
         measure = float(values[1]) + float(values[2]) / ma2.resolution
@@ -106,3 +121,171 @@ def _handle_slides_v1(ma2, values: List[str]) -> None:
     duration = int(values[5]) / ma2.resolution
     end_position = int(values[6])
     ma2.add_slide(measure, start_position, end_position, duration, pattern, delay)
+
+
+# Key in MaiMa2.notes_stat of each note line type
+_NOTE_STATS = {name: name for name in note_dict}
+_NOTE_STATS.update({name: "SLD" for name in slide_dict})
+
+_Handler = Callable[[object, List[str]], Optional[object]]
+
+
+def _load_tap(is_break: bool, is_star: bool, is_ex: bool) -> _Handler:
+    def load(ma2, values):
+        measure = float(values[1]) + float(values[2]) / ma2.resolution
+        return TapNote(measure, int(values[3]), is_star, is_break, is_ex)
+
+    return load
+
+
+def _load_hold(is_ex: bool) -> _Handler:
+    def load(ma2, values):
+        measure = float(values[1]) + float(values[2]) / ma2.resolution
+        duration = float(values[4]) / ma2.resolution
+        return HoldNote(measure, int(values[3]), duration, is_ex)
+
+    return load
+
+
+def _load_slide(pattern: int) -> _Handler:
+    # Slides that passed check_slide
+    checked = set()
+
+    def load(ma2, values):
+        measure = float(values[1]) + float(values[2]) / ma2.resolution
+        start_position = int(values[3])
+        end_position = int(values[6])
+        if (start_position, end_position) not in checked:
+            check_slide(pattern, start_position, end_position)
+            checked.add((start_position, end_position))
+
+        delay = int(values[4]) / ma2.resolution
+        duration = int(values[5]) / ma2.resolution
+        return SlideNote(
+            measure, start_position, end_position, pattern, duration, delay
+        )
+
+    return load
+
+
+def _load_touch_tap(ma2, values):
+    measure = float(values[1]) + float(values[2]) / ma2.resolution
+    size = values[6] if len(values) > 6 else "M1"
+    return TouchTapNote(measure, int(values[3]), values[4], values[5] == "1", size)
+
+
+def _load_touch_hold(ma2, values):
+    measure = float(values[1]) + float(values[2]) / ma2.resolution
+    duration = float(values[4]) / ma2.resolution
+    size = values[7] if len(values) > 7 else "M1"
+    return TouchHoldNote(
+        measure, int(values[3]), values[5], duration, values[6] == "1", size
+    )
+
+
+def _load_header(ma2, values):
+    # Lines other than notes go through parse_v1, they are rare
+    parse_v1(ma2, values)
+
+
+def _load_version(ma2, values):
+    ma2.version = (values[1], values[2])
+
+
+def _load_fes_mode(ma2, values):
+    ma2.fes_mode = values[1] == "1"
+
+
+def _skip(ma2, values):
+    return None
+
+
+def _unknown_v1(ma2, values):
+    print(f"Warning: Ignoring unknown line type {values[0]}")
+
+
+def _unknown_version(ma2, values):
+    raise ValueError(f"Unknown Ma2 version: {ma2.version}")
+
+
+_HANDLERS_V1: Dict[str, _Handler] = {
+    "": _skip,
+    "VERSION": _load_version,
+    "FES_MODE": _load_fes_mode,
+    "RESOLUTION": _load_header,
+    "BPM": _load_header,
+    "MET": _load_header,
+    "TAP": _load_tap(False, False, False),
+    "BRK": _load_tap(True, False, False),
+    "XTP": _load_tap(False, False, True),
+    "STR": _load_tap(False, True, False),
+    "BST": _load_tap(True, True, False),
+    "XST": _load_tap(False, True, True),
+    "HLD": _load_hold(False),
+    "XHO": _load_hold(True),
+    "TTP": _load_touch_tap,
+    "THO": _load_touch_hold,
+}
+_HANDLERS_V1.update(
+    {name: _load_slide(pattern) for name, pattern in slide_dict.items()}
+)
+_HANDLERS_V1.update({name: _skip for name in _ignored_v1 if name not in _HANDLERS_V1})
+
+# Lines that are read before the version is known to be supported
+_HANDLERS_UNKNOWN: Dict[str, _Handler] = {
+    "": _skip,
+    "VERSION": _load_version,
+    "FES_MODE": _load_fes_mode,
+}
+
+
+def _get_handlers(ma2) -> Tuple[Dict[str, _Handler], _Handler]:
+    if ma2.version[1] in SUPPORTED_V1:
+        return _HANDLERS_V1, _unknown_v1
+
+    return _HANDLERS_UNKNOWN, _unknown_version
+
+
+def load_v1(ma2, stream: TextIO, block_size: int = LOAD_BLOCK) -> None:
+    """Reads every line of a ma2 file into a MaiMa2, like calling
+    MaiMa2.parse_line on each line, but much faster for whole files.
+
+    The stream is read in blocks and each line type is dispatched through
+    a table of handlers. Notes are built directly instead of through the
+    add_* methods and notes_stat is updated once at the end.
+
+    Args:
+        ma2: The MaiMa2 to add to.
+        stream: A text stream of the ma2 file.
+        block_size: Number of characters read at a time.
+
+    Raises:
+        ValueError: When the ma2 version is not supported, or a note or
+            slide is invalid.
+    """
+    notes = []
+    append = notes.append
+    # Line type of each note
+    note_types = []
+    append_type = note_types.append
+    handlers, default = _get_handlers(ma2)
+    rest = ""
+    while True:
+        block = stream.read(block_size)
+        lines = (rest + block).split("\n")
+        rest = lines.pop() if len(block) != 0 else ""
+        for line in lines:
+            values = line.rstrip().split("\t")
+            note = handlers.get(values[0], default)(ma2, values)
+            if note is not None:
+                append(note)
+                append_type(values[0])
+            elif values[0] == "VERSION":
+                handlers, default = _get_handlers(ma2)
+
+        if len(block) == 0:
+            break
+
+    ma2.notes.extend(notes)
+    for line_type, count in Counter(note_types).items():
+        ma2.notes_stat[_NOTE_STATS[line_type]] += count
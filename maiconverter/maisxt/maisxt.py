@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import math
 import re
 from typing import Union, List, Dict
 
@@ -11,7 +10,7 @@ from .sxtnote import (
     SlideEndNote,
     check_slide,
 )
-from ..event import NoteType
+from ..event import NoteType, measure_to_tick
 from ..tool import measure_to_second, second_to_measure, offset_arg_to_measure
 
 
@@ -239,12 +238,11 @@ class MaiSxt:
             >>> sxt.add_tap(26.75, 4, is_break=True)
             >>> sxt.del_tap(26.75, 4)
         """
+        tick = measure_to_tick(measure)
         tap_notes = [
             x
             for x in self.notes
-            if isinstance(x, TapNote)
-            and math.isclose(x.measure, measure, abs_tol=0.0001)
-            and x.position == position
+            if isinstance(x, TapNote) and x.tick == tick and x.position == position
         ]
         for note in tap_notes:
             self.notes.remove(note)
@@ -296,12 +294,11 @@ class MaiSxt:
             >>> sxt.add_hold(3.25, 0, 2)
             >>> sxt.del_hold(3.25, 0)
         """
+        tick = measure_to_tick(measure)
         hold_notes = [
             x
             for x in self.notes
-            if isinstance(x, HoldNote)
-            and math.isclose(x.measure, measure, abs_tol=0.0001)
-            and x.position == position
+            if isinstance(x, HoldNote) and x.tick == tick and x.position == position
         ]
         for note in hold_notes:
             self.notes.remove(note)
@@ -368,12 +365,13 @@ class MaiSxt:
         self.notes.append(end_slide)
         self.slide_count += 1
 
+        tick = measure_to_tick(measure)
         star_notes = [
             x
             for x in self.notes
             if isinstance(x, TapNote)
             and x.note_type in [NoteType.star, NoteType.break_star]
-            and math.isclose(x.measure, measure, abs_tol=0.0001)
+            and x.tick == tick
             and x.position == start_position
         ]
         for star_note in star_notes:
@@ -387,11 +385,12 @@ class MaiSxt:
         start_position: int,
         end_position: int,
     ) -> MaiSxt:
+        tick = measure_to_tick(measure)
         start_slides = [
             x
             for x in self.notes
             if isinstance(x, SlideStartNote)
-            and math.isclose(x.measure, measure, abs_tol=0.0001)
+            and x.tick == tick
             and x.position == start_position
         ]
         end_slides: List[SlideEndNote] = []
@@ -414,12 +413,13 @@ class MaiSxt:
             ]
             correct_start_slides += slides
 
+        tick = measure_to_tick(measure)
         star_notes = [
             x
             for x in self.notes
             if isinstance(x, TapNote)
             and x.note_type in [NoteType.star, NoteType.break_star]
-            and math.isclose(x.measure, measure, abs_tol=0.0001)
+            and x.tick == tick
             and x.position == start_position
         ]
 
@@ -437,8 +437,9 @@ class MaiSxt:
     def offset(self, offset: Union[float, str]) -> MaiSxt:
         offset = offset_arg_to_measure(offset, self.second_to_measure)
 
+        offset = measure_to_tick(offset)
         for note in self.notes:
-            note.measure = round((note.measure + offset) * 10000.0) / 10000.0
+            note.tick += offset
 
         return self
 
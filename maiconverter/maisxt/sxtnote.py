@@ -194,7 +194,6 @@ class SlideEndNote(MaiNote):
         if pattern <= 0:
             raise ValueError("Slide pattern is not positive " + str(pattern))
 
-        measure = round(10000 * measure) / 10000
         super().__init__(measure, position, NoteType.end_slide)
         self.slide_id = slide_id
         self.pattern = pattern
@@ -219,7 +218,6 @@ class HoldNote(MaiNote):
         if duration < 0:
             raise ValueError(f"Hold duration is negative: {duration}")
 
-        measure = round(10000.0 * measure) / 10000.0
         duration = round(10000.0 * duration) / 10000.0
         super().__init__(measure, position, NoteType.hold)
         self.duration = duration
@@ -11,3 +11,22 @@ from .tools import (
     handle_touch_hold,
 )
 from .simai import SimaiChart, parse_file, parse_file_str
+from .simai_lazy import LazySimaiChart
+from .simai_session import SimaiEditSession, SessionUpdate
+from .maidata import MaiData
+from .catalog import (
+    SongMetadata,
+    read_metadata,
+    read_metadata_file,
+    find_simai_files,
+    iter_catalog,
+    write_catalog,
+)
+from .executor import (
+    ParseExecutor,
+    get_executor,
+    fragment_cache,
+    fragment_cache_info,
+    ParseProfile,
+    profile_parsing,
+)
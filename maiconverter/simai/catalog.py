@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+from types import MappingProxyType
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    TextIO,
+    Tuple,
+)
+
+from .records import RECORD_FORMATS, find_files, iter_records, write_records
+from .simai_parser import iter_directives
+
+CATALOG_FORMATS = RECORD_FORMATS
+# Level columns of the CSV format. Charts go from 1 (Easy) to 7.
+CSV_LEVELS = range(1, 8)
+CSV_HEADER = (
+    ["path", "title", "artist", "wholebpm", "first"]
+    + [f"lv_{n}" for n in CSV_LEVELS]
+    + ["charts", "error"]
+)
+
+
+class SongMetadata(NamedTuple):
+    """Directives of a simai file that describe the song, read without
+    parsing any chart.
+
+    Attributes:
+        path: Path of the simai file.
+        title: Value of "&title=".
+        artist: Value of "&artist=".
+        levels: Value of each "&lv_N=", by chart number.
+        wholebpm: Value of "&wholebpm=", or None if missing or not a number.
+        first: Value of "&first=", or None if missing or not a number.
+        charts: Chart numbers that have a non-empty "&inote_N=", in order.
+        error: Why the file couldn't be read, or None.
+    """
+
+    path: str
+    title: str = ""
+    artist: str = ""
+    levels: Mapping[int, str] = MappingProxyType({})
+    wholebpm: Optional[float] = None
+    first: Optional[float] = None
+    charts: Tuple[int, ...] = ()
+    error: Optional[str] = None
+
+
+def _first_line(value: str) -> str:
+    lines = value.strip().splitlines()
+    return lines[0].rstrip() if len(lines) != 0 else ""
+
+
+def _number(value: str) -> Optional[float]:
+    try:
+        return float(_first_line(value))
+    except ValueError:
+        return None
+
+
+def read_metadata(text: str, path: str = "") -> SongMetadata:
+    """Reads the song metadata of a simai file. Charts are skipped over
+    without being parsed.
+
+    Args:
+        text: Contents of a simai file.
+        path: Path stored in the result.
+
+    Examples:
+        >>> read_metadata("&title=Song\\n&lv_5=12+\\n&inote_5=1,2,\\nE\\n")
+        SongMetadata(path='', title='Song', artist='', levels={5: '12+'}, wholebpm=None, first=None, charts=(5,), error=None)
+    """
+    title = ""
+    artist = ""
+    levels: Dict[int, str] = {}
+    wholebpm = None
+    first = None
+    charts: List[int] = []
+    for key, (start, end) in iter_directives(text):
+        if key == "title":
+            title = _first_line(text[start:end])
+        elif key == "artist":
+            artist = _first_line(text[start:end])
+        elif key == "wholebpm":
+            wholebpm = _number(text[start:end])
+        elif key == "first":
+            first = _number(text[start:end])
+        elif key.startswith("lv_") and key[3:].isdigit():
+            levels[int(key[3:])] = _first_line(text[start:end])
+        elif key.startswith("inote_") and key[6:].isdigit():
+            if text[start:end].strip() != "":
+                charts.append(int(key[6:]))
+
+    return SongMetadata(path, title, artist, levels, wholebpm, first, tuple(charts))
+
+
+def read_metadata_file(path: str, encoding: str = "utf-8") -> SongMetadata:
+    """Opens a simai file and reads its song metadata. Files that can't be
+    read or decoded give a record with only path and error set."""
+    try:
+        with open(path, encoding=encoding) as f:
+            text = f.read()
+    except (OSError, UnicodeDecodeError) as e:
+        return SongMetadata(path, error=f"{type(e).__name__}: {e}")
+
+    return read_metadata(text, path)
+
+
+def find_simai_files(root: str, name: str = "maidata.txt") -> List[str]:
+    """Finds every file called name, ignoring case, under root. Returns
+    their paths sorted."""
+    name = name.lower()
+    return find_files(root, lambda file: file == name)
+
+
+def iter_catalog(
+    root: str,
+    workers: Optional[int] = None,
+    name: str = "maidata.txt",
+    encoding: str = "utf-8",
+) -> Iterator[SongMetadata]:
+    """Reads the song metadata of every simai file under a directory on the
+    worker pool, and yields one record per song sorted by path.
+
+    Args:
+        root: Directory of the song library.
+        workers: Number of worker processes. Defaults to the number of
+            CPUs. 0 reads every file in the current process.
+        name: File name of simai files, ignoring case.
+        encoding: Encoding of simai files.
+
+    Examples:
+        Write a JSON line per song of a library.
+
+        >>> with open("catalog.jsonl", "w", encoding="utf-8") as out:
+        ...     write_catalog(iter_catalog("songs"), out)
+    """
+    paths = find_simai_files(root, name)
+    return iter_records(paths, read_metadata_file, workers, encoding)
+
+
+def _csv_row(record: SongMetadata) -> list:
+    return (
+        [record.path, record.title, record.artist, record.wholebpm, record.first]
+        + [record.levels.get(n, "") for n in CSV_LEVELS]
+        + [" ".join(str(n) for n in record.charts), record.error]
+    )
+
+
+def write_catalog(
+    records: Iterable[SongMetadata], stream: TextIO, format: str = "jsonl"
+) -> int:
+    """Writes song metadata records as they come.
+
+    Args:
+        records: Records from iter_catalog or read_metadata.
+        stream: A text stream. Open CSV files with newline="".
+        format: "jsonl" writes a JSON object per line. "csv" writes a
+            header, then a row per song with lv_1 to lv_7 columns and the
+            chart numbers separated by spaces.
+
+    Returns:
+        The number of records written.
+
+    Raises:
+        ValueError: When format is unknown.
+    """
+    return write_records(records, stream, format, CSV_HEADER, _csv_row)
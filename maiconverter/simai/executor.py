@@ -0,0 +1,654 @@
+import atexit
+import heapq
+import itertools
+import math
+import os
+import time
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+from multiprocessing import Pool, Event
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sized,
+    Tuple,
+)
+
+from .simai_parser import FragmentProfile, parse_fragment, profile_fragment
+
+ABORT = None
+
+
+def _parse_init(event):
+    global ABORT
+    ABORT = event
+
+
+def _parse(fragment: str) -> List:
+    # Return an empty list when the fragment is empty or "E"
+    if len(fragment) == 0 or fragment == "E":
+        return []
+
+    try:
+        return parse_fragment(fragment)
+    except Exception as e:
+        raise RuntimeError(f"Error parsing fragment {fragment}") from e
+
+
+def _profile(fragment: str) -> Tuple[List, FragmentProfile]:
+    if len(fragment) == 0 or fragment == "E":
+        return [], FragmentProfile(fragment, 0.0, "empty", 0)
+
+    try:
+        return profile_fragment(fragment)
+    except Exception as e:
+        raise RuntimeError(f"Error parsing fragment {fragment}") from e
+
+
+def _parse_helper(fragment: str) -> List:
+    global ABORT
+    # Return an empty list when ABORT is set
+    if ABORT.is_set():
+        return []
+
+    try:
+        return _parse(fragment)
+    except Exception:
+        # Abort all jobs
+        ABORT.set()
+        raise
+
+
+def _parse_chunk_helper(fragments: List[str]) -> List[List]:
+    global ABORT
+    if ABORT.is_set():
+        return []
+
+    try:
+        # Identical fragments of a chunk are parsed once
+        parsed: Dict[str, List] = {}
+        result = []
+        for fragment in fragments:
+            events = parsed.get(fragment)
+            if events is None:
+                events = _parse(fragment)
+                parsed[fragment] = events
+
+            result.append(events)
+
+        return result
+    except Exception:
+        ABORT.set()
+        raise
+
+
+# Used instead of _parse_helper and _parse_chunk_helper while profiling.
+# They return (events, profile) pairs, with no profile for repeated fragments.
+
+
+def _profile_helper(fragment: str) -> Tuple[List, Optional[FragmentProfile]]:
+    global ABORT
+    if ABORT.is_set():
+        return [], None
+
+    try:
+        return _profile(fragment)
+    except Exception:
+        ABORT.set()
+        raise
+
+
+def _profile_chunk_helper(
+    fragments: List[str],
+) -> List[Tuple[List, Optional[FragmentProfile]]]:
+    global ABORT
+    if ABORT.is_set():
+        return []
+
+    try:
+        parsed: Dict[str, List] = {}
+        result = []
+        for fragment in fragments:
+            events = parsed.get(fragment)
+            if events is None:
+                events, profile = _profile(fragment)
+                parsed[fragment] = events
+                result.append((events, profile))
+            else:
+                result.append((events, None))
+
+        return result
+    except Exception:
+        ABORT.set()
+        raise
+
+
+class ParseProfile:
+    """Parse time, parser path, and number of events of every fragment
+    parsed while profiling. Fragments served by the fragment cache are not
+    parsed, so they don't appear.
+
+    Attributes:
+        records: A FragmentProfile for each parsed fragment.
+    """
+
+    # Upper bounds of the histogram buckets, in seconds
+    BUCKETS = (1e-5, 1e-4, 1e-3, 1e-2, 1e-1)
+
+    def __init__(self) -> None:
+        self.records: List[FragmentProfile] = []
+
+    def collect(
+        self, results: List[Tuple[List, Optional[FragmentProfile]]]
+    ) -> List[List]:
+        """Records the profiles of (events, profile) pairs and returns the
+        events."""
+        for _, profile in results:
+            if profile is not None:
+                self.records.append(profile)
+
+        return [events for events, _ in results]
+
+    def total_seconds(self) -> float:
+        return sum(record.seconds for record in self.records)
+
+    def paths(self) -> Dict[str, int]:
+        """Number of fragments handled by each parser path."""
+        return dict(Counter(record.path for record in self.records))
+
+    def histogram(self) -> List[Tuple[str, int]]:
+        """Number of fragments in each parse time bucket, from
+        "<10us" to ">=100ms"."""
+        labels = ["<10us", "10us-100us", "100us-1ms", "1ms-10ms", "10ms-100ms"]
+        labels.append(">=100ms")
+        counts = [0] * len(labels)
+        for record in self.records:
+            i = 0
+            while i < len(self.BUCKETS) and record.seconds >= self.BUCKETS[i]:
+                i += 1
+            counts[i] += 1
+
+        return list(zip(labels, counts))
+
+    def slowest(self, n: int = 10) -> List[FragmentProfile]:
+        """The n fragments that took the longest to parse, slowest first."""
+        return heapq.nlargest(n, self.records, key=lambda record: record.seconds)
+
+    def report(self, top: int = 10) -> str:
+        """A summary of the profile with a histogram of parse times and
+        the top slowest fragments."""
+        paths = ", ".join(f"{path} {count}" for path, count in self.paths().items())
+        lines = [
+            f"Parsed {len(self.records)} fragments in "
+            f"{self.total_seconds():.3f}s ({paths})",
+            "Parse time histogram:",
+        ]
+        histogram = self.histogram()
+        most = max([count for _, count in histogram] + [1])
+        for label, count in histogram:
+            bar = "#" * math.ceil(40 * count / most)
+            lines.append(f"  {label:>10} {count:>8} {bar}")
+
+        lines.append(f"Slowest {top} fragments:")
+        for record in self.slowest(top):
+            lines.append(
+                f"  {record.seconds * 1000:>9.3f}ms {record.path:<7} "
+                f"{record.events:>3} events  {record.fragment}"
+            )
+
+        return "\n".join(lines)
+
+
+# The profile being recorded, if any
+_active_profile: Optional[ParseProfile] = None
+
+
+@contextmanager
+def profile_parsing() -> Iterator[ParseProfile]:
+    """Profiles every simai fragment parsed by an executor inside the
+    block, including in worker processes. Profiling is off otherwise and
+    costs nothing.
+
+    Examples:
+        Find the slowest fragments of a chart.
+
+        >>> with profile_parsing() as profile:
+        ...     chart = SimaiChart.from_str(chart_text)
+        >>> print(profile.report(top=5))
+    """
+    global _active_profile
+    previous = _active_profile
+    _active_profile = ParseProfile()
+    try:
+        yield _active_profile
+    finally:
+        _active_profile = previous
+
+
+SCHEDULES = ("fragment", "chart", "hybrid")
+
+
+class FragmentCacheInfo(NamedTuple):
+    """Statistics of the fragment cache.
+
+    Attributes:
+        hits: Lookups of fragments that were already in the cache.
+        misses: Lookups of fragments that had to be parsed.
+        maxsize: Maximum number of fragments kept.
+        currsize: Number of fragments kept.
+        deduplicated: Fragments that weren't looked up because the same
+            text came earlier in the list being parsed.
+    """
+
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+    deduplicated: int = 0
+
+
+class FragmentCache:
+    """A bounded LRU of parsed fragments, keyed by the fragment's text.
+
+    Note:
+        Cached event lists are shared by every fragment with the same text.
+        Do not modify them.
+    """
+
+    def __init__(self, maxsize: int = 4096) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.deduplicated = 0
+        self._events: OrderedDict = OrderedDict()
+
+    def get(self, fragment: str) -> Optional[List]:
+        events = self._events.get(fragment)
+        if events is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._events.move_to_end(fragment)
+        return events
+
+    def put(self, fragment: str, events: List) -> None:
+        if self.maxsize <= 0:
+            return
+
+        self._events[fragment] = events
+        self._events.move_to_end(fragment)
+        while len(self._events) > self.maxsize:
+            self._events.popitem(last=False)
+
+    def resize(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        while len(self._events) > max(maxsize, 0):
+            self._events.popitem(last=False)
+
+    def clear(self) -> None:
+        self._events.clear()
+        self.hits = 0
+        self.misses = 0
+        self.deduplicated = 0
+
+    def info(self) -> FragmentCacheInfo:
+        return FragmentCacheInfo(
+            self.hits,
+            self.misses,
+            self.maxsize,
+            len(self._events),
+            self.deduplicated,
+        )
+
+
+# Shared by every chart parsed in this process
+fragment_cache = FragmentCache()
+
+
+def fragment_cache_info() -> FragmentCacheInfo:
+    """Reports the hits, misses, size, and deduplicated fragments of the
+    parsed fragment cache."""
+    return fragment_cache.info()
+
+
+class ParseExecutor:
+    """Parses lists of simai fragments. Small lists are parsed in the
+    current process. Larger ones are sent to a pool of worker processes
+    that is started on first use and kept alive until shutdown or exit.
+
+    Attributes:
+        workers: Number of worker processes. 0 or 1 always parses serially.
+        serial_threshold: Lists with fewer fragments than this are parsed
+            serially.
+        chunk_seconds: Target parse time of each chunk sent to a worker.
+            Chunk sizes are derived from it and the measured cost per
+            fragment.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        serial_threshold: int = 2000,
+        chunk_seconds: float = 0.05,
+    ) -> None:
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers < 0:
+            raise ValueError(f"Number of workers is negative {workers}")
+
+        self.workers = workers
+        self.serial_threshold = serial_threshold
+        self.chunk_seconds = chunk_seconds
+        self._pool = None
+        self._abort = None
+        # Moving average of the time, in seconds, it takes to parse one fragment
+        self._fragment_cost: Optional[float] = None
+
+    def _update_cost(self, elapsed: float, count: int) -> None:
+        if count == 0:
+            return
+
+        cost = elapsed / count
+        if self._fragment_cost is None:
+            self._fragment_cost = cost
+        else:
+            self._fragment_cost = 0.8 * self._fragment_cost + 0.2 * cost
+
+    def _parse_serial(self, fragments: List[str]) -> List[List]:
+        start = time.perf_counter()
+        if _active_profile is None:
+            result = [_parse(fragment) for fragment in fragments]
+        else:
+            result = _active_profile.collect([_profile(f) for f in fragments])
+        self._update_cost(time.perf_counter() - start, len(fragments))
+
+        return result
+
+    def chunksize(self, count: int) -> int:
+        """Number of fragments sent to a worker at a time when parsing
+        count fragments."""
+        per_worker = math.ceil(count / max(self.workers, 1))
+        if self._fragment_cost is None or self._fragment_cost == 0:
+            return max(1, per_worker)
+
+        return max(1, min(per_worker, int(self.chunk_seconds / self._fragment_cost)))
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._abort = Event()
+            self._pool = Pool(
+                processes=self.workers,
+                initializer=_parse_init,
+                initargs=(self._abort,),
+            )
+
+        return self._pool
+
+    def parse(self, fragments: List[str]) -> List[List]:
+        """Parses every fragment and returns their events in order.
+
+        Identical fragments are only parsed once, and fragments found in
+        the process-wide fragment cache are not parsed at all. Fragments
+        with the same text share the same list of events.
+
+        Raises:
+            RuntimeError: When a fragment fails to parse.
+        """
+        parsed, missing = self._lookup(fragments)
+        self._store(parsed, missing, self._parse_unique(missing))
+
+        return [parsed[fragment] for fragment in fragments]
+
+    @staticmethod
+    def _lookup(fragments: List[str]) -> Tuple[Dict[str, List], List[str]]:
+        # Finds the events of fragments in the fragment cache. Returns them
+        # with the unique fragments that still have to be parsed.
+        parsed: Dict[str, List] = {}
+        missing: List[str] = []
+        for fragment in fragments:
+            if fragment in parsed:
+                # Repeated in this list, not served by the cache
+                fragment_cache.deduplicated += 1
+                continue
+
+            events = fragment_cache.get(fragment)
+            parsed[fragment] = events
+            if events is None:
+                missing.append(fragment)
+
+        return parsed, missing
+
+    @staticmethod
+    def _store(
+        parsed: Dict[str, List], missing: List[str], events_list: List[List]
+    ) -> None:
+        for fragment, events in zip(missing, events_list):
+            parsed[fragment] = events
+            fragment_cache.put(fragment, events)
+
+    def iter_parse(
+        self, fragments: Iterable[str], max_in_flight: Optional[int] = None
+    ) -> Iterator[List]:
+        """Parses fragments and yields their events in order, as soon as
+        they are parsed. Workers parse chunks of fragments ahead of the
+        consumer, but never more than max_in_flight chunks at a time, so
+        memory use doesn't grow with the number of fragments.
+
+        Args:
+            fragments: Simai fragments. Can be a lazy iterable.
+            max_in_flight: Maximum number of chunks being parsed or waiting
+                to be consumed. Defaults to twice the number of workers.
+
+        Raises:
+            RuntimeError: When a fragment fails to parse. Chunks that are
+                still in flight are aborted.
+        """
+        if self.workers <= 1 or (
+            isinstance(fragments, Sized) and len(fragments) < self.serial_threshold
+        ):
+            for fragment in fragments:
+                parsed, missing = self._lookup([fragment])
+                self._store(parsed, missing, self._parse_serial(missing))
+                yield parsed[fragment]
+
+            return
+
+        if max_in_flight is None:
+            max_in_flight = 2 * self.workers
+
+        if self._fragment_cost is None:
+            chunksize = 64
+        else:
+            chunksize = max(1, min(4096, int(self.chunk_seconds / self._fragment_cost)))
+
+        profile = _active_profile
+        helper = _parse_chunk_helper if profile is None else _profile_chunk_helper
+        pool = self._get_pool()
+        self._abort.clear()
+
+        fragments = iter(fragments)
+        in_flight: deque = deque()
+        count = 0
+        start = time.perf_counter()
+        try:
+            while True:
+                while len(in_flight) < max_in_flight:
+                    chunk = list(itertools.islice(fragments, chunksize))
+                    if len(chunk) == 0:
+                        break
+
+                    parsed, missing = self._lookup(chunk)
+                    result = None
+                    if len(missing) != 0:
+                        result = pool.apply_async(helper, (missing,))
+                    in_flight.append((chunk, parsed, missing, result))
+
+                if len(in_flight) == 0:
+                    break
+
+                chunk, parsed, missing, result = in_flight.popleft()
+                if result is not None:
+                    events_list = result.get()
+                    if len(events_list) != len(missing):
+                        # Skipped because a later chunk failed
+                        for *_, later in in_flight:
+                            if later is not None:
+                                later.get()
+                        raise RuntimeError("Parsing was aborted")
+
+                    if profile is not None:
+                        events_list = profile.collect(events_list)
+                    self._store(parsed, missing, events_list)
+                    count += len(missing)
+
+                for fragment in chunk:
+                    yield parsed[fragment]
+        except BaseException:
+            # Stop the chunks that are still in flight, including when the
+            # consumer stops early
+            self._abort.set()
+            raise
+
+        self._update_cost((time.perf_counter() - start) * self.workers, count)
+
+    def _parse_unique(self, fragments: List[str]) -> List[List]:
+        if self.workers <= 1 or len(fragments) < self.serial_threshold:
+            return self._parse_serial(fragments)
+
+        # Measure the cost per fragment on a small sample first, so chunk
+        # sizes can be chosen for the rest of the list.
+        result: List[List] = []
+        if self._fragment_cost is None:
+            result = self._parse_serial(fragments[:64])
+            fragments = fragments[64:]
+
+        pool = self._get_pool()
+        self._abort.clear()
+
+        # Stop jobs when abort is set
+        def fragment_iter():
+            for fragment in fragments:
+                if not self._abort.is_set():
+                    yield fragment
+
+        profile = _active_profile
+        helper = _parse_helper if profile is None else _profile_helper
+        start = time.perf_counter()
+        parsed = pool.map(helper, fragment_iter(), self.chunksize(len(fragments)))
+        result += parsed if profile is None else profile.collect(parsed)
+        self._update_cost((time.perf_counter() - start) * self.workers, len(fragments))
+
+        return result
+
+    def parse_charts(
+        self, charts: List[List[str]], schedule: str = "hybrid"
+    ) -> List[List[List]]:
+        """Parses the fragments of several charts and returns the events of
+        each chart in order.
+
+        Args:
+            charts: A list of fragments for each chart.
+            schedule: How the work is split between workers.
+                "fragment" parses one chart after another, each spread over
+                the workers. "chart" sends each whole chart to a worker, the
+                largest first. "hybrid" parses the fragments of every chart
+                together in evenly sized chunks, so small charts don't wait
+                on large ones. Only "fragment" and "hybrid" use the fragment
+                cache.
+
+        Raises:
+            ValueError: When schedule is unknown.
+            RuntimeError: When a fragment fails to parse.
+        """
+        if schedule not in SCHEDULES:
+            raise ValueError(f"Unknown schedule {schedule}")
+
+        if schedule == "fragment":
+            return [self.parse(fragments) for fragments in charts]
+
+        total = sum(len(fragments) for fragments in charts)
+        if schedule == "hybrid" or self.workers <= 1 or total < self.serial_threshold:
+            events_list = self.parse([f for fragments in charts for f in fragments])
+            result = []
+            start = 0
+            for fragments in charts:
+                result.append(events_list[start : start + len(fragments)])
+                start += len(fragments)
+
+            return result
+
+        pool = self._get_pool()
+        self._abort.clear()
+
+        # Largest charts first so that they don't finish last
+        order = sorted(range(len(charts)), key=lambda i: -len(charts[i]))
+        profile = _active_profile
+        helper = _parse_chunk_helper if profile is None else _profile_chunk_helper
+        start = time.perf_counter()
+        parsed = pool.map(helper, [charts[i] for i in order], chunksize=1)
+        self._update_cost((time.perf_counter() - start) * self.workers, total)
+
+        result: List[List[List]] = [[] for _ in charts]
+        for i, events_list in zip(order, parsed):
+            if profile is not None:
+                events_list = profile.collect(events_list)
+            result[i] = events_list
+
+        return result
+
+    def imap(self, func: Callable, items: Iterable) -> Iterator:
+        """Calls func on each item in the worker pool and yields the
+        results in order as they finish. Calls func in the current process
+        when there are not enough workers or items to make it worthwhile.
+
+        Args:
+            func: A picklable function, defined at the top level of a module.
+            items: Picklable arguments to func.
+        """
+        items = list(items)
+        if self.workers <= 1 or len(items) <= 1:
+            return (func(item) for item in items)
+
+        return self._get_pool().imap(func, items, chunksize=1)
+
+    def shutdown(self) -> None:
+        """Stops the worker processes. The executor can still be used
+        afterwards and starts a new pool when needed."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+
+_executors: Dict[int, ParseExecutor] = {}
+
+
+def get_executor(workers: Optional[int] = None) -> ParseExecutor:
+    """Returns the process-wide ParseExecutor with the given number of workers.
+
+    Args:
+        workers: Number of worker processes. Defaults to the number of CPUs.
+            0 parses serially.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    executor = _executors.get(workers)
+    if executor is None:
+        executor = ParseExecutor(workers)
+        _executors[workers] = executor
+
+    return executor
+
+
+@atexit.register
+def shutdown_executors() -> None:
+    """Stops the worker processes of every executor."""
+    for executor in _executors.values():
+        executor.shutdown()
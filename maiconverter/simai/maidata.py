@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import os
+import tempfile
+from typing import Dict, Iterator, List, Optional, TextIO, Tuple, Union
+
+from .simai import SimaiChart, EXPORT_MODES
+from .executor import get_executor
+
+
+def _export_chart(job: Tuple[SimaiChart, int, str]) -> str:
+    chart, max_den, mode = job
+    return chart.export(max_den=max_den, mode=mode)
+
+
+class MaiData:
+    """A simai file with the title, artist, and charts of a song, like
+    maidata.txt. Parsed back with parse_file or parse_file_str.
+
+    Attributes:
+        title: Song title, written as "&title=".
+        artist: Song artist, written as "&artist=".
+        levels: Level of each chart number, written as "&lv_N=".
+        charts: Tuples (chart number, SimaiChart), written as "&inote_N="
+            in this order.
+
+    Examples:
+        Write the Master and Re:Master charts of a song.
+
+        >>> maidata = MaiData("Song title", "Artist")
+        >>> maidata.add_chart(5, master, level="13")
+        >>> maidata.add_chart(6, re_master, level="14+")
+        >>> maidata.save("maidata.txt")
+    """
+
+    def __init__(
+        self,
+        title: str = "",
+        artist: str = "",
+        levels: Optional[Dict[int, Union[str, float]]] = None,
+        charts: Optional[List[Tuple[int, SimaiChart]]] = None,
+    ) -> None:
+        self.title = title
+        self.artist = artist
+        self.levels: Dict[int, Union[str, float]] = (
+            {} if levels is None else dict(levels)
+        )
+        self.charts: List[Tuple[int, SimaiChart]] = []
+        for difficulty, chart in charts or []:
+            self.add_chart(difficulty, chart)
+
+    def add_chart(
+        self,
+        difficulty: int,
+        chart: SimaiChart,
+        level: Optional[Union[str, float]] = None,
+    ) -> None:
+        """Adds a chart.
+
+        Args:
+            difficulty: Chart number, the N in "&inote_N". 2 is Basic up to
+                6 for Re:Master.
+            chart: The chart.
+            level: Level shown in game, like "13+".
+
+        Raises:
+            ValueError: When there is already a chart with that number.
+        """
+        if any(difficulty == existing for existing, _ in self.charts):
+            raise ValueError(f"Chart {difficulty} already exists")
+
+        self.charts.append((difficulty, chart))
+        if level is not None:
+            self.levels[difficulty] = level
+
+    def iter_export(
+        self,
+        workers: Optional[int] = None,
+        max_den: int = 1000,
+        mode: str = "default",
+    ) -> Iterator[str]:
+        """Exports the file, yielding the directives in order. Charts are
+        exported at the same time on the worker pool and yielded as soon
+        as they and every chart before them are done.
+
+        Args:
+            workers: Number of worker processes. Defaults to the number of
+                CPUs. 0 exports in the current process, a line at a time.
+            max_den: The maximum denominator used when turning gaps between
+                notes into divisors and rests.
+            mode: "default" or "compact". See SimaiChart.export.
+
+        Raises:
+            ValueError: When mode is unknown, or a chart has no BPMs or no
+                starting BPM.
+        """
+        if mode not in EXPORT_MODES:
+            raise ValueError(f"Unknown export mode {mode}")
+
+        yield f"&title={self.title}\n"
+        yield f"&artist={self.artist}\n"
+        for difficulty in sorted(self.levels):
+            yield f"&lv_{difficulty}={self.levels[difficulty]}\n"
+
+        executor = get_executor(workers)
+        if executor.workers <= 1 or len(self.charts) <= 1:
+            for difficulty, chart in self.charts:
+                yield f"&inote_{difficulty}="
+                yield from chart.iter_export(max_den=max_den, mode=mode)
+
+            return
+
+        jobs = [(chart, max_den, mode) for _, chart in self.charts]
+        for (difficulty, _), text in zip(
+            self.charts, executor.imap(_export_chart, jobs)
+        ):
+            yield f"&inote_{difficulty}="
+            yield text
+
+    def export(
+        self,
+        workers: Optional[int] = None,
+        max_den: int = 1000,
+        mode: str = "default",
+    ) -> str:
+        """Exports the file as text. See iter_export."""
+        return "".join(self.iter_export(workers=workers, max_den=max_den, mode=mode))
+
+    def export_to(
+        self,
+        stream: TextIO,
+        workers: Optional[int] = None,
+        max_den: int = 1000,
+        mode: str = "default",
+    ) -> None:
+        """Writes the file to a file-like object as each chart is exported.
+        See iter_export."""
+        for chunk in self.iter_export(workers=workers, max_den=max_den, mode=mode):
+            stream.write(chunk)
+
+    def save(
+        self,
+        path: str,
+        encoding: str = "utf-8",
+        workers: Optional[int] = None,
+        max_den: int = 1000,
+        mode: str = "default",
+    ) -> None:
+        """Writes the file to disk with Windows line endings, like the CLI
+        does for single charts. See iter_export.
+
+        The file is written next to path under a temporary name, then moved
+        over path once every chart is exported, so a chart that fails to
+        export leaves an existing file untouched.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(
+            prefix=".maidata-", suffix=".tmp", dir=directory
+        )
+        try:
+            with open(fd, "w", newline="\r\n", encoding=encoding) as out:
+                self.export_to(out, workers=workers, max_den=max_den, mode=mode)
+
+            # mkstemp creates files only the owner can read
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(temp_path, 0o666 & ~umask)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import csv
+import json
+import os
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, TextIO
+
+from .executor import get_executor
+
+RECORD_FORMATS = ("jsonl", "csv")
+# Number of files read by a worker at a time
+RECORD_CHUNK = 64
+
+
+def find_files(root: str, match: Callable[[str], bool]) -> List[str]:
+    """Finds every file under root whose lowercased name satisfies match.
+    Returns their paths sorted."""
+    paths = []
+    for directory, _, files in os.walk(root):
+        for file in files:
+            if match(file.lower()):
+                paths.append(os.path.join(directory, file))
+
+    paths.sort()
+    return paths
+
+
+def _read_chunk(job) -> list:
+    read, paths, encoding = job
+    return [read(path, encoding) for path in paths]
+
+
+def iter_records(
+    paths: Sequence[str],
+    read: Callable[[str, str], Any],
+    workers: Optional[int] = None,
+    encoding: str = "utf-8",
+) -> Iterator[Any]:
+    """Reads files on the worker pool, a chunk of files per task, and yields
+    one record per file in the order of paths.
+
+    Args:
+        paths: Paths of the files.
+        read: A module level function called with a path and encoding,
+            which returns the record of the file.
+        workers: Number of worker processes. Defaults to the number of
+            CPUs. 0 reads every file in the current process.
+        encoding: Encoding passed to read.
+    """
+    jobs = [
+        (read, paths[i : i + RECORD_CHUNK], encoding)
+        for i in range(0, len(paths), RECORD_CHUNK)
+    ]
+    for records in get_executor(workers).imap(_read_chunk, jobs):
+        yield from records
+
+
+def write_records(
+    records: Iterable[Any],
+    stream: TextIO,
+    format: str,
+    header: Sequence[str],
+    row: Callable[[Any], list],
+) -> int:
+    """Writes NamedTuple records as they come.
+
+    Args:
+        records: The records.
+        stream: A text stream. Open CSV files with newline="".
+        format: "jsonl" writes a JSON object per line, with mappings as
+            objects. "csv" writes header, then row(record) per record.
+        header: Column names of the CSV format.
+        row: Flattens a record into the values of the CSV columns.
+
+    Returns:
+        The number of records written.
+
+    Raises:
+        ValueError: When format is unknown.
+    """
+    if format not in RECORD_FORMATS:
+        raise ValueError(f"Unknown record format {format}")
+
+    count = 0
+    if format == "jsonl":
+        for record in records:
+            stream.write(
+                json.dumps(record._asdict(), ensure_ascii=False, default=dict) + "\n"
+            )
+            count += 1
+
+        return count
+
+    writer = csv.writer(stream)
+    writer.writerow(header)
+    for record in records:
+        writer.writerow(row(record))
+        count += 1
+
+    return count
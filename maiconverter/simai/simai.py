@@ -1,23 +1,111 @@
 from __future__ import annotations
 
+import bisect
 import math
-from typing import Optional, Tuple, List, Union
-from lark import Lark
-
+from typing import Dict, Optional, Tuple, List, Union, Iterable, Iterator, TextIO
 from .tools import (
-    get_measure_divisor,
+    get_grid_divisor,
+    get_compact_rests,
     convert_to_fragment,
-    get_rest,
-    parallel_parse_fragments,
+    get_grid_rest,
+    get_resolution,
+    snap_measure,
+    to_ticks,
+    iter_parse_fragments,
+    parallel_parse_charts,
 )
-from ..event import NoteType
+from ..event import NoteType, measure_to_tick, tick_to_measure
 from .simainote import TapNote, HoldNote, SlideNote, TouchTapNote, TouchHoldNote, BPM
-from .simai_parser import SimaiTransformer
+from .simai_parser import get_file_parser, iter_directives, clean_chart
+from .simai_events import (
+    BPM_EVENT,
+    DIVISOR_EVENT,
+    TAP_EVENT,
+    HOLD_EVENT,
+    SLIDE_EVENT,
+    TOUCH_TAP_EVENT,
+    TOUCH_HOLD_EVENT,
+    BREAK,
+    EX,
+    STAR,
+    TAPLESS,
+    CHAINED,
+    PSEUDO_EACH,
+    FIREWORK,
+)
 
 # I hate the simai format can we use bmson or stepmania chart format for
 # community-made charts instead
 from ..tool import measure_to_second, second_to_measure, offset_arg_to_measure
 
+EXPORT_MODES = ("default", "compact")
+
+# BPMs closer than this are at the same measure
+BPM_TOLERANCE = 0.0001
+
+
+class TempoMap:
+    """The BPMs of a chart sorted by measure, for finding the BPM at a
+    measure with bisect instead of scanning every BPM.
+
+    Attributes:
+        measures: Measure of each BPM, in ascending order.
+        bpms: BPM events in the same order.
+    """
+
+    def __init__(self, bpms: List[BPM]) -> None:
+        self.bpms = list(bpms)
+        self.measures = [bpm.measure for bpm in self.bpms]
+
+    def find(self, measure: float) -> Tuple[int, int]:
+        """Returns the range of indices of BPMs at the given measure."""
+        start = bisect.bisect_left(self.measures, measure - BPM_TOLERANCE)
+        while start > 0 and math.isclose(
+            self.measures[start - 1], measure, abs_tol=BPM_TOLERANCE
+        ):
+            start -= 1
+
+        end = start
+        while end < len(self.measures) and math.isclose(
+            self.measures[end], measure, abs_tol=BPM_TOLERANCE
+        ):
+            end += 1
+
+        return start, end
+
+    def append(self, bpm: BPM) -> bool:
+        """Adds a BPM if it's after every other one. Returns whether it
+        was added."""
+        if len(self.measures) != 0 and bpm.measure < self.measures[-1]:
+            return False
+
+        self.bpms.append(bpm)
+        self.measures.append(bpm.measure)
+        return True
+
+    def remove(self, start: int, end: int) -> None:
+        del self.bpms[start:end]
+        del self.measures[start:end]
+
+    def check(self) -> None:
+        """Raises ValueError when there are no BPMs or no starting BPM."""
+        if len(self.measures) == 0:
+            raise ValueError("No BPMs defined")
+
+        first = bisect.bisect_left(self.measures, 0.0)
+        if first == len(self.measures) or self.measures[first] > 1.0:
+            raise ValueError("No starting BPM defined")
+
+    def lookup(self, measure: float) -> float:
+        """Returns the BPM at the given measure. Same as SimaiChart.get_bpm."""
+        self.check()
+        start, end = self.find(measure)
+        if start != end:
+            return self.bpms[start].bpm
+
+        index = bisect.bisect_right(self.measures, measure)
+        return self.bpms[max(index - 1, 0)].bpm
+
 
 class SimaiChart:
     """A class that represents a simai chart. Contains notes and bpm
@@ -38,172 +126,164 @@ class SimaiChart:
         self.bpms: List[BPM] = []
         self._divisor: Optional[float] = None
         self._measure = 1.0
+        self._tempo_map: Optional[TempoMap] = None
+        # Identity and length of bpms when the tempo map was last up to date
+        self._tempo_key: Optional[Tuple[int, int]] = None
 
     @classmethod
-    def from_str(cls, chart_text: str, message: Optional[str] = None) -> SimaiChart:
+    def from_str(
+        cls,
+        chart_text: str,
+        message: Optional[str] = None,
+        workers: Optional[int] = None,
+    ) -> SimaiChart:
+        """Parses a simai chart.
+
+        Args:
+            chart_text: The simai chart.
+            message: Progress message printed while parsing.
+            workers: Number of worker processes used for parsing. Defaults
+                to the number of CPUs. 0 parses in the current process.
+        """
         # TODO: Rewrite this
         if message is None:
             print("Parsing simai chart...", end="", flush=True)
         else:
             print(message, end="", flush=True)
 
-        simai_chart = cls()
         chart_text = "".join(chart_text.split())
         try:
-            events_list = parallel_parse_fragments(chart_text.split(","))
+            # Notes are added as soon as their fragments are parsed
+            simai_chart = cls.from_events(
+                iter_parse_fragments(chart_text.split(","), workers)
+            )
         except:
             print("ERROR")
             raise
         else:
             print("Done")
 
-        for events in events_list:
-            star_positions = []
-            offset = 0
-            for event in events:
-                event_type = event["type"]
-                if event_type == "bpm":
-                    simai_chart.set_bpm(simai_chart._measure, event["value"])
-                elif event_type == "divisor":
-                    simai_chart._divisor = event["value"]
-                elif event_type == "tap":
-                    is_break, is_ex, is_star = False, False, False
-                    modifier = event["modifier"]
-                    if "b" in modifier:
-                        is_break = True
-                    if "x" in modifier:
-                        is_ex = True
-                    if "$" in modifier:
-                        is_star = True
-
-                    if "`" in modifier:
-                        # Equivalent to one tick in ma2 with resolution of 384
-                        offset += 0.0027
-                    else:
-                        offset = 0
-
-                    simai_chart.add_tap(
-                        measure=simai_chart._measure + offset,
-                        position=event["button"],
-                        is_break=is_break,
-                        is_star=is_star,
-                        is_ex=is_ex,
-                    )
-                elif event_type == "hold":
-                    is_ex = False
-                    modifier = event["modifier"]
-                    if "x" in modifier:
-                        is_ex = True
-
-                    if "`" in modifier:
-                        # Equivalent to one tick in ma2 with resolution of 384
-                        offset += 0.0027
-                    else:
-                        offset = 0
-
-                    simai_chart.add_hold(
-                        measure=simai_chart._measure + offset,
-                        position=event["button"],
-                        duration=event["duration"],
-                        is_ex=is_ex,
-                    )
-                elif event_type == "slide":
-                    is_break, is_ex, is_tapless = False, False, False
-                    modifier = event["modifier"]
-                    if "b" in modifier:
-                        is_break = True
-                    if "x" in modifier:
-                        is_ex = True
-                    if any([a in modifier for a in "?!$"]):
-                        # Tapless slides
-                        # ? means the slide has no tap
-                        # ! produces a tapless slide with no path, just a moving star
-                        # $ is a remnant of 2simai, it is equivalent to ?
-                        is_tapless = True
-
-                    if "*" in modifier:
-                        # Chained slides should have the same offset
-                        pass
-                    elif "`" in modifier:
-                        # Equivalent to one tick in ma2 with resolution of 384
-                        offset += 0.0027
-                    else:
-                        offset = 0
-
-                    if not (is_tapless or event["start_button"] in star_positions):
-                        simai_chart.add_tap(
-                            measure=simai_chart._measure + offset,
-                            position=event["start_button"],
-                            is_break=is_break,
-                            is_star=True,
-                            is_ex=is_ex,
-                        )
-                        star_positions.append(event["start_button"])
-
-                    equivalent_bpm = event["equivalent_bpm"]
-                    duration = event["duration"]
-                    delay = 0.25
-                    if equivalent_bpm is not None:
-                        multiplier = (
-                            simai_chart.get_bpm(simai_chart._measure) / equivalent_bpm
-                        )
-                        duration = multiplier * duration
-                        delay = multiplier * delay
-
-                    simai_chart.add_slide(
-                        measure=simai_chart._measure + offset,
-                        start_position=event["start_button"],
-                        end_position=event["end_button"],
-                        duration=duration,
-                        pattern=event["pattern"],
-                        delay=delay,
-                        reflect_position=event["reflect_position"],
-                    )
-                elif event_type == "touch_tap":
-                    is_firework = False
-                    modifier = event["modifier"]
-                    if "f" in modifier:
-                        is_firework = True
-
-                    if "`" in modifier:
-                        # Equivalent to one tick in ma2 with resolution of 384
-                        offset += 0.0027
-                    else:
-                        offset = 0
-
-                    simai_chart.add_touch_tap(
-                        measure=simai_chart._measure + offset,
-                        position=event["location"],
-                        region=event["region"],
-                        is_firework=is_firework,
-                    )
+        return simai_chart
 
-                elif event_type == "touch_hold":
-                    is_firework = False
-                    modifier = event["modifier"]
-                    if "f" in modifier:
-                        is_firework = True
-
-                    if "`" in modifier:
-                        # Equivalent to one tick in ma2 with resolution of 384
-                        offset += 0.0027
-                    else:
-                        offset = 0
-
-                    simai_chart.add_touch_hold(
-                        measure=simai_chart._measure + offset,
-                        position=event["location"],
-                        region=event["region"],
-                        duration=event["duration"],
-                        is_firework=is_firework,
-                    )
-                else:
-                    raise Exception(f"Unknown event type: {event_type}")
+    @classmethod
+    def from_events(cls, events_list: Iterable[List[tuple]]) -> SimaiChart:
+        """Builds a simai chart from parsed fragments.
 
-            simai_chart._measure += 1 / simai_chart._divisor
+        Args:
+            events_list: The events of each fragment of the chart, in order,
+                as returned by parse_fragment. See simai_events.
+        """
+        simai_chart = cls()
+        for events in events_list:
+            simai_chart._add_fragment(events)
 
         return simai_chart
 
+    def _add_fragment(self, events: List[tuple]) -> None:
+        # Adds the events of the fragment at the current measure, then moves
+        # to the next fragment
+        star_positions = []
+        offset = 0
+        for event in events:
+            type_code = event[0]
+            if type_code == BPM_EVENT:
+                self.set_bpm(self._measure, event[1])
+                continue
+            if type_code == DIVISOR_EVENT:
+                self._divisor = event[1]
+                continue
+
+            flags = event[1]
+            if type_code == SLIDE_EVENT and flags & CHAINED:
+                # Chained slides should have the same offset
+                pass
+            elif flags & PSEUDO_EACH:
+                # Equivalent to one tick in ma2 with resolution of 384
+                offset += 0.0027
+            else:
+                offset = 0
+
+            measure = self._measure + offset
+            if type_code == TAP_EVENT:
+                _, _, button = event
+                self.add_tap(
+                    measure=measure,
+                    position=button,
+                    is_break=bool(flags & BREAK),
+                    is_star=bool(flags & STAR),
+                    is_ex=bool(flags & EX),
+                )
+            elif type_code == HOLD_EVENT:
+                _, _, button, duration = event
+                self.add_hold(
+                    measure=measure,
+                    position=button,
+                    duration=duration,
+                    is_ex=bool(flags & EX),
+                )
+            elif type_code == SLIDE_EVENT:
+                (
+                    _,
+                    _,
+                    start_button,
+                    end_button,
+                    pattern,
+                    reflect_position,
+                    duration,
+                    equivalent_bpm,
+                ) = event
+                # Tapless slides
+                # ? means the slide has no tap
+                # ! produces a tapless slide with no path, just a moving star
+                # $ is a remnant of 2simai, it is equivalent to ?
+                is_tapless = bool(flags & TAPLESS)
+                if not (is_tapless or start_button in star_positions):
+                    self.add_tap(
+                        measure=measure,
+                        position=start_button,
+                        is_break=bool(flags & BREAK),
+                        is_star=True,
+                        is_ex=bool(flags & EX),
+                    )
+                    star_positions.append(start_button)
+
+                delay = 0.25
+                if equivalent_bpm is not None:
+                    multiplier = self.get_bpm(self._measure) / equivalent_bpm
+                    duration = multiplier * duration
+                    delay = multiplier * delay
+
+                self.add_slide(
+                    measure=measure,
+                    start_position=start_button,
+                    end_position=end_button,
+                    duration=duration,
+                    pattern=pattern,
+                    delay=delay,
+                    reflect_position=reflect_position,
+                )
+            elif type_code == TOUCH_TAP_EVENT:
+                _, _, region, location = event
+                self.add_touch_tap(
+                    measure=measure,
+                    position=location,
+                    region=region,
+                    is_firework=bool(flags & FIREWORK),
+                )
+            elif type_code == TOUCH_HOLD_EVENT:
+                _, _, region, location, duration = event
+                self.add_touch_hold(
+                    measure=measure,
+                    position=location,
+                    region=region,
+                    duration=duration,
+                    is_firework=bool(flags & FIREWORK),
+                )
+            else:
+                raise Exception(f"Unknown event type: {type_code}")
+
+        self._measure += 1 / self._divisor
+
     @classmethod
     def open(cls, file: str) -> SimaiChart:
         """Opens a text file containing only a Simai chart. Does NOT accept a regular Simai file which contains
@@ -276,12 +356,11 @@ class SimaiChart:
             >>> simai.add_tap(26.5, 4)
             >>> simai.del_tap(26.75, 4)
         """
+        tick = measure_to_tick(measure)
         tap_notes = [
             x
             for x in self.notes
-            if isinstance(x, TapNote)
-            and math.isclose(x.measure, measure, abs_tol=0.0001)
-            and x.position == position
+            if isinstance(x, TapNote) and x.tick == tick and x.position == position
         ]
         for note in tap_notes:
             self.notes.remove(note)
@@ -333,12 +412,11 @@ class SimaiChart:
             >>> simai.add_hold(3.25, 0, 2)
             >>> simai.del_hold(3.25, 0)
         """
+        tick = measure_to_tick(measure)
         hold_notes = [
             x
             for x in self.notes
-            if isinstance(x, HoldNote)
-            and math.isclose(x.measure, measure, abs_tol=0.0001)
-            and x.position == position
+            if isinstance(x, HoldNote) and x.tick == tick and x.position == position
         ]
         for note in hold_notes:
             self.notes.remove(note)
@@ -397,11 +475,12 @@ class SimaiChart:
         start_position: int,
         end_position: int,
     ) -> SimaiChart:
+        tick = measure_to_tick(measure)
         slide_notes = [
             x
             for x in self.notes
             if isinstance(x, SlideNote)
-            and math.isclose(x.measure, measure, abs_tol=0.0001)
+            and x.tick == tick
             and x.position == start_position
             and x.end_position == end_position
         ]
@@ -428,11 +507,12 @@ class SimaiChart:
         position: int,
         region: str,
     ) -> SimaiChart:
+        tick = measure_to_tick(measure)
         touch_taps = [
             x
             for x in self.notes
             if isinstance(x, TouchTapNote)
-            and math.isclose(x.measure, measure, abs_tol=0.0001)
+            and x.tick == tick
             and x.position == position
             and x.region == region
         ]
@@ -462,11 +542,12 @@ class SimaiChart:
         position: int,
         region: str,
     ) -> SimaiChart:
+        tick = measure_to_tick(measure)
         touch_holds = [
             x
             for x in self.notes
             if isinstance(x, TouchHoldNote)
-            and math.isclose(x.measure, measure, abs_tol=0.0001)
+            and x.tick == tick
             and x.position == position
             and x.region == region
         ]
@@ -498,9 +579,36 @@ class SimaiChart:
 
         bpm_event = BPM(measure, bpm)
         self.bpms.append(bpm_event)
+        # Charts add BPMs in order, so the tempo map is extended instead of
+        # rebuilt whenever possible
+        if self._tempo_map is not None and self._tempo_map.append(bpm_event):
+            self._tempo_key = (id(self.bpms), len(self.bpms))
+        else:
+            self._tempo_map = None
 
         return self
 
+    def tempo_map(self) -> TempoMap:
+        """Returns the BPMs sorted by measure. It is kept until set_bpm,
+        del_bpm, or offset change the BPMs, or bpms is replaced or changes
+        length. Sorts bpms when it has to be rebuilt.
+
+        Note:
+            Call invalidate_tempo_map after changing the measure of a BPM
+            in bpms directly.
+        """
+        key = (id(self.bpms), len(self.bpms))
+        if self._tempo_map is None or self._tempo_key != key:
+            self.bpms.sort(key=lambda x: x.measure)
+            self._tempo_map = TempoMap(self.bpms)
+            self._tempo_key = key
+
+        return self._tempo_map
+
+    def invalidate_tempo_map(self) -> None:
+        """Rebuilds the tempo map on next use."""
+        self._tempo_map = None
+
     def get_bpm(self, measure: float) -> float:
         """Gets the bpm at given measure.
 
@@ -526,22 +634,18 @@ class SimaiChart:
             >>> simai.get_bpm(12)
             250.0
         """
-        if len(self.bpms) == 0:
-            raise ValueError("No BPMs defined")
-        if not any([0.0 <= x.measure <= 1.0 for x in self.bpms]):
-            raise ValueError("No starting BPM defined")
+        return self.tempo_map().lookup(measure)
 
-        self.bpms.sort(key=lambda x: x.measure)
-        previous_bpm = self.bpms[0].bpm
-        for bpm in self.bpms:
-            if math.isclose(measure, bpm.measure, abs_tol=0.0001):
-                return bpm.bpm
-            if bpm.measure > measure:
-                break
-
-            previous_bpm = bpm.bpm
+    def get_bpms(self, measures: Iterable[float]) -> List[float]:
+        """Gets the bpm at each of the given measures. Same as calling
+        get_bpm for each of them.
 
-        return previous_bpm
+        Raises:
+            ValueError: When there are no BPMs defined, or there are no
+                starting BPM defined.
+        """
+        tempo_map = self.tempo_map()
+        return [tempo_map.lookup(measure) for measure in measures]
 
     def del_bpm(self, measure: float) -> SimaiChart:
         """Deletes the bpm at given measure.
@@ -558,26 +662,32 @@ class SimaiChart:
             >>> simai = SimaiChart()
             >>> simai.del_bpm(24)
         """
-        bpms = [
-            x for x in self.bpms if math.isclose(x.measure, measure, abs_tol=0.0001)
-        ]
-        for x in bpms:
-            self.bpms.remove(x)
+        tempo_map = self.tempo_map()
+        start, end = tempo_map.find(measure)
+        if start == end:
+            return self
+
+        removed = {id(bpm) for bpm in tempo_map.bpms[start:end]}
+        self.bpms[:] = [x for x in self.bpms if id(x) not in removed]
+        tempo_map.remove(start, end)
+        self._tempo_key = (id(self.bpms), len(self.bpms))
 
         return self
 
     def offset(self, offset: Union[float, str]) -> SimaiChart:
         offset = offset_arg_to_measure(offset, self.second_to_measure)
 
+        offset = measure_to_tick(offset)
         for note in self.notes:
-            note.measure = round(note.measure + offset, 4)
+            note.tick += offset
 
         for bpm in self.bpms:
             if 0 <= bpm.measure <= 1:
                 continue
 
-            bpm.measure = round(bpm.measure + offset, 4)
+            bpm.tick += offset
 
+        self._tempo_map = None
         return self
 
     def measure_to_second(self, measure: float) -> float:
@@ -591,44 +701,153 @@ class SimaiChart:
 
         return measure
 
-    def export(self, max_den: int = 1000) -> str:
-        # TODO: Rewrite this
-        measures = [event.measure for event in self.notes + self.bpms]
+    def export(self, max_den: int = 1000, mode: str = "default") -> str:
+        """Exports the chart as simai text.
+
+        Args:
+            max_den: The maximum denominator used when turning gaps between
+                notes into divisors and rests.
+            mode: "default" starts a new line at every measure and divisor
+                change, and declares the divisor at the start of each line.
+                "compact" chooses divisors that take the fewest characters,
+                only starts new lines at measures, and only declares
+                divisors when they change. Both place notes at the same
+                times.
+
+        Raises:
+            ValueError: When mode is unknown, or there are no BPMs or no
+                starting BPM.
+        """
+        return "".join(self.iter_export(max_den=max_den, mode=mode))
+
+    def export_to(
+        self, stream: TextIO, max_den: int = 1000, mode: str = "default"
+    ) -> None:
+        """Writes the chart as simai text to a file-like object, one line
+        at a time, without building the whole text in memory.
+
+        Args:
+            stream: A text stream with a write method, like an opened file.
+            max_den: The maximum denominator used when turning gaps between
+                notes into divisors and rests.
+            mode: "default" or "compact". See export.
+
+        Examples:
+            >>> with open("maidata.txt", "w", encoding="utf-8") as out:
+            ...     simai.export_to(out)
+        """
+        for chunk in self.iter_export(max_den=max_den, mode=mode):
+            stream.write(chunk)
+
+    def iter_export(self, max_den: int = 1000, mode: str = "default") -> Iterator[str]:
+        """Exports the chart as simai text, yielding a line at a time.
+        Joining the yielded strings gives the same text as export.
+
+        Args:
+            max_den: The maximum denominator used when turning gaps between
+                notes into divisors and rests.
+            mode: "default" or "compact". See export.
+
+        Raises:
+            ValueError: When mode is unknown, or there are no BPMs or no
+                starting BPM. Raised before anything is yielded.
+        """
+        if mode not in EXPORT_MODES:
+            raise ValueError(f"Unknown export mode {mode}")
+
+        # Measures are snapped once to an integer grid of resolution ticks
+        # per measure, and notes and BPMs are grouped by tick in one pass,
+        # so each measure is visited once. Divisors and rests are then
+        # computed from exact gaps between ticks.
+        lengths = []
+        for note in self.notes:
+            if note.note_type == NoteType.complete_slide:
+                lengths.append((note, note.delay + note.duration))
+            elif note.note_type in [
+                NoteType.hold,
+                NoteType.ex_hold,
+                NoteType.touch_hold,
+            ]:
+                lengths.append((note, note.duration))
+
+        # Notes and BPMs at the same tick share their snapped measure
+        snapped = {
+            tick: snap_measure(tick_to_measure(tick), max_den)
+            for tick in {event.tick for event in self.notes + self.bpms}
+        }
+        snapped_lengths = {
+            length: snap_measure(length, max_den) for _, length in lengths
+        }
+        resolution = get_resolution(
+            list(snapped.values()) + list(snapped_lengths.values())
+        )
+
+        notes_at: Dict[int, List] = {}
+        for note in self.notes:
+            tick = to_ticks(snapped[note.tick], resolution)
+            notes_at.setdefault(tick, []).append(note)
 
-        measures += [int(i) for i in measures]
-        measures.append(1.0)
+        bpms_at: Dict[int, List[BPM]] = {}
+        for bpm in self.bpms:
+            tick = to_ticks(snapped[bpm.tick], resolution)
+            bpms_at.setdefault(tick, []).append(bpm)
+
+        measures = list(notes_at) + list(bpms_at)
+
+        if mode == "default":
+            measures += [tick // resolution * resolution for tick in measures]
+        measures.append(resolution)
 
         measures = list(set(measures))
-        last_whole_measure = max([int(measure) for measure in measures])
         measures.sort()
 
         # whole_divisors contains divisors that fit perfectly all notes in one measure.
         # It either contains an integer or None.
-        whole_divisors: List[Union[int, None]] = []
-        for whole_measure in range(last_whole_measure + 1):
-            note_measures = [
-                note_measure
-                for note_measure in measures
-                if int(note_measure) == whole_measure
-            ]
-            whole_divisors.append(get_measure_divisor(note_measures))
+        measures_in_whole: Dict[int, List[int]] = {}
+        whole_divisors: Dict[int, Optional[int]] = {}
+        # Rests of every measure, chosen up front in compact mode
+        compact_rests: Optional[List[Tuple[int, int, int]]] = None
+        if mode == "default":
+            for tick in measures:
+                measures_in_whole.setdefault(tick // resolution, []).append(tick)
+
+            whole_divisors = {
+                whole_measure: get_grid_divisor(ticks, resolution)
+                for whole_measure, ticks in measures_in_whole.items()
+            }
+        else:
+            end_tick = max(
+                [measures[-1]]
+                + [
+                    to_ticks(snapped[note.tick], resolution)
+                    + to_ticks(snapped_lengths[length], resolution)
+                    for note, length in lengths
+                ]
+            )
+            gaps = [after - tick for tick, after in zip(measures, measures[1:])]
+            gaps.append(end_tick - measures[-1])
+            compact_rests = get_compact_rests(gaps, resolution, max_den=max_den)
+
+        # Raises before anything is yielded
+        tempo_map = self.tempo_map()
+        tempo_map.check()
 
         # last_measure takes into account slide and hold notes' end measure
-        last_measure = 1.0
+        last_measure = resolution
         # measure_tick is our time-tracking variable. Used to know what measure
         # are we in-between rests ","
-        measure_tick = 1.0
+        measure_tick = resolution
         # previous_divisor is used for comparing to current_divisor
         # to know if we should add a "{}" indicator
         previous_divisor: Optional[int] = None
         # previous_measure_int is used for comparing to current measure.
         # If we are in a new whole measure, add a new line and add the divisor.
         previous_measure_int = 0
-        # Our resulting chart in text form. Assuming that string fits in memory
-        result = ""
+        # The line being built. It is yielded when the next one starts.
+        result: List[str] = []
         for (i, current_measure) in enumerate(measures):
-            bpm = [bpm for bpm in self.bpms if bpm.measure == current_measure]
-            notes = [note for note in self.notes if note.measure == current_measure]
+            bpm = bpms_at.get(current_measure, [])
+            notes = notes_at.get(current_measure, [])
 
             hold_slides = [
                 note
@@ -644,24 +863,27 @@ class SimaiChart:
             for hold_slide in hold_slides:
                 # Get hold and slide end measure and compare with last_measure
                 if hold_slide.note_type == NoteType.complete_slide:
-                    last_measure = max(
-                        current_measure + hold_slide.delay + hold_slide.duration,
-                        last_measure,
-                    )
+                    length = hold_slide.delay + hold_slide.duration
                 else:
-                    last_measure = max(
-                        current_measure + hold_slide.duration, last_measure
-                    )
+                    length = hold_slide.duration
 
-            whole_divisor = whole_divisors[int(current_measure)]
+                last_measure = max(
+                    current_measure + to_ticks(snapped_lengths[length], resolution),
+                    last_measure,
+                )
 
-            if i == len(measures) - 1:
+            if compact_rests is not None:
+                whole, current_divisor, rest_amount = compact_rests[i]
+            elif i == len(measures) - 1:
                 # We are at the end so let's check if there are any
                 # active holds or slides
+                whole_divisor = whole_divisors[current_measure // resolution]
                 if last_measure > current_measure:
-                    (whole, current_divisor, rest_amount) = get_rest(
+                    (whole, current_divisor, rest_amount) = get_grid_rest(
                         current_measure,
                         last_measure,
+                        None,
+                        resolution,
                         current_divisor=(
                             previous_divisor if whole_divisor is None else whole_divisor
                         ),
@@ -676,77 +898,136 @@ class SimaiChart:
                     whole, rest_amount = 0, 0
             else:
                 # Why doesn't Python have a safe list 'get' method
-                next_measure: Optional[float] = (
+                next_measure: Optional[int] = (
                     measures[i + 1] if i + 1 < len(measures) else None
                 )
-                after_next_measure: Optional[float] = (
+                after_next_measure: Optional[int] = (
                     measures[i + 2] if i + 2 < len(measures) else None
                 )
-                (whole, current_divisor, rest_amount) = get_rest(
+                whole_divisor = whole_divisors[current_measure // resolution]
+                (whole, current_divisor, rest_amount) = get_grid_rest(
                     current_measure,
                     next_measure,
-                    after_next_measure=after_next_measure,
+                    after_next_measure,
+                    resolution,
                     current_divisor=(
                         previous_divisor if whole_divisor is None else whole_divisor
                     ),
                     max_den=max_den,
                 )
 
-            if (
-                previous_divisor != current_divisor
-                or int(measure_tick) > previous_measure_int
-            ):
-                result += "\n"
-                result += convert_to_fragment(
-                    notes + bpm,
-                    self.get_bpm(current_measure + 1),
-                    current_divisor,
-                    max_den=max_den,
+            current_bpm = tempo_map.lookup(current_measure / resolution + 1)
+
+            # Compact mode doesn't start lines at divisor changes or declare
+            # the divisor again at the start of each line
+            new_measure = measure_tick // resolution > previous_measure_int
+            compact = compact_rests is not None
+            if new_measure or (previous_divisor != current_divisor and not compact):
+                if len(result) != 0:
+                    yield "".join(result)
+                    result = []
+
+                result.append("\n")
+                previous_measure_int = measure_tick // resolution
+
+            if previous_divisor != current_divisor or (new_measure and not compact):
+                result.append(
+                    convert_to_fragment(
+                        notes + bpm, current_bpm, current_divisor, max_den=max_den
+                    )
                 )
                 previous_divisor = current_divisor
-                previous_measure_int = int(measure_tick)
             else:
-                result += convert_to_fragment(
-                    notes + bpm, self.get_bpm(current_measure + 1), max_den=max_den
+                result.append(
+                    convert_to_fragment(notes + bpm, current_bpm, max_den=max_den)
                 )
 
             measure_tick = current_measure
 
-            for _ in range(rest_amount):
-                result += ","
-                measure_tick += 1 / current_divisor
+            result.append("," * rest_amount)
+            measure_tick += rest_amount * resolution // current_divisor
 
             if whole > 0:
                 if current_divisor != 1:
-                    result += "{1}"
+                    result.append("{1}")
                     previous_divisor = 1
 
-                for _ in range(whole):
-                    result += ","
-                    measure_tick += 1
+                result.append("," * whole)
+                measure_tick += whole * resolution
 
-            measure_tick = round(measure_tick * 10000) / 10000
-
-        result += ",\nE\n"
-        return result
+        result.append(",\nE\n")
+        yield "".join(result)
 
 
 def parse_file_str(
-    file: str, lark_file: str = "simai.lark"
+    file: str,
+    lark_file: Optional[str] = None,
+    workers: Optional[int] = None,
+    levels: Optional[Iterable[int]] = None,
+    schedule: str = "hybrid",
 ) -> Tuple[str, List[Tuple[int, SimaiChart]]]:
-    parser = Lark.open(lark_file, rel_to=__file__, parser="lalr")
-
-    dicts: List[dict] = SimaiTransformer().transform(parser.parse(file))
+    """Parses the title and charts of a simai file.
+
+    Args:
+        file: Contents of a simai file.
+        lark_file: Optional grammar for the whole file, e.g. "simai.lark".
+            By default, directives are read by a linear scanner instead.
+        workers: Number of worker processes used for parsing charts.
+            Defaults to the number of CPUs. 0 parses in the current process.
+        levels: Chart numbers, the N in "&inote_N", to parse. Other charts
+            are skipped without being parsed. Defaults to every chart.
+        schedule: How charts are split between workers. "hybrid" parses the
+            fragments of every chart together, "chart" gives each worker
+            whole charts, and "fragment" parses one chart at a time.
+            See ParseExecutor.parse_charts.
+
+    Returns:
+        A tuple (title, charts) where charts is a list of tuples
+        (chart number, SimaiChart) in the order they appear in the file.
+
+    Examples:
+        Parse only the Master and Re:Master charts of a maidata.txt.
+
+        >>> title, charts = parse_file_str(maidata, levels=[5, 6])
+    """
+    if levels is not None:
+        levels = set(levels)
 
     title = ""
+    raw_charts: List[Tuple[int, str]] = []
+    if lark_file is None:
+        for key, (start, end) in iter_directives(file):
+            if key == "title":
+                lines = file[start:end].splitlines()
+                title = lines[0].rstrip() if len(lines) != 0 else ""
+            elif key.startswith("inote_") and key[6:].isdigit():
+                num = int(key[6:])
+                if levels is None or num in levels:
+                    raw_charts.append((num, clean_chart(file[start:end])))
+    else:
+        dicts: List[dict] = get_file_parser(lark_file).parse(file)
+        for element in dicts:
+            if element["type"] == "title":
+                title = element["value"]
+            elif element["type"] == "chart":
+                num, chart = element["value"]
+                if levels is None or num in levels:
+                    raw_charts.append((num, chart))
+
+    print(f"Parsing {len(raw_charts)} charts...", end="", flush=True)
+    try:
+        parsed = parallel_parse_charts(
+            [chart.split(",") for _, chart in raw_charts], workers, schedule
+        )
+    except:
+        print("ERROR")
+        raise
+    else:
+        print("Done")
+
     charts: List[Tuple[int, SimaiChart]] = []
-    for element in dicts:
-        if element["type"] == "title":
-            title: str = element["value"]
-        elif element["type"] == "chart":
-            num, chart = element["value"]
-            simai_chart = SimaiChart.from_str(chart, message=f"Parsing chart #{num}...")
-            charts.append((num, simai_chart))
+    for (num, _), events_list in zip(raw_charts, parsed):
+        charts.append((num, SimaiChart.from_events(events_list)))
 
     return title, charts
 
@@ -754,14 +1035,24 @@ def parse_file_str(
 def parse_file(
     path: str,
     encoding: str = "UTF-8",
-    lark_file: str = "simai.lark",
+    lark_file: Optional[str] = None,
+    workers: Optional[int] = None,
+    levels: Optional[Iterable[int]] = None,
+    schedule: str = "hybrid",
 ) -> Tuple[str, List[Tuple[int, SimaiChart]]]:
+    """Opens a simai file and parses its title and charts. See parse_file_str."""
     with open(path, encoding=encoding) as f:
         simai = f.read()
 
     print(f"Parsing Simai file at {path}")
     try:
-        result = parse_file_str(simai, lark_file=lark_file)
+        result = parse_file_str(
+            simai,
+            lark_file=lark_file,
+            workers=workers,
+            levels=levels,
+            schedule=schedule,
+        )
     except:
         print(f"Error parsing Simai file at {path}")
         raise
@@ -0,0 +1,73 @@
+# Compact events produced by the simai fragment parsers and consumed by
+# SimaiChart.from_events. Events are plain tuples that start with an integer
+# type code, so they are cheap to create, to dispatch on, and to pickle back
+# from worker processes. Notes have their modifiers decoded into flags, always
+# at index 1.
+#
+#   (BPM_EVENT, value)
+#   (DIVISOR_EVENT, value)
+#   (TAP_EVENT, flags, button)
+#   (HOLD_EVENT, flags, button, duration)
+#   (SLIDE_EVENT, flags, start_button, end_button, pattern, reflect_position,
+#       duration, equivalent_bpm)
+#   (TOUCH_TAP_EVENT, flags, region, location)
+#   (TOUCH_HOLD_EVENT, flags, region, location, duration)
+
+from typing import Tuple, Union
+
+# Any of the event tuples above
+SimaiEvent = Tuple[Union[int, float, str], ...]
+
+# Event type codes
+BPM_EVENT = 0
+DIVISOR_EVENT = 1
+TAP_EVENT = 2
+HOLD_EVENT = 3
+SLIDE_EVENT = 4
+TOUCH_TAP_EVENT = 5
+TOUCH_HOLD_EVENT = 6
+
+EVENT_NAMES = {
+    BPM_EVENT: "bpm",
+    DIVISOR_EVENT: "divisor",
+    TAP_EVENT: "tap",
+    HOLD_EVENT: "hold",
+    SLIDE_EVENT: "slide",
+    TOUCH_TAP_EVENT: "touch_tap",
+    TOUCH_HOLD_EVENT: "touch_hold",
+}
+
+# Modifier flags
+BREAK = 1
+EX = 2
+STAR = 4
+# Slide without a star tap, from "?", "!", or "$"
+TAPLESS = 8
+# Chained slide after "*"
+CHAINED = 16
+# Pseudo-each, from "`"
+PSEUDO_EACH = 32
+FIREWORK = 64
+
+TAP_FLAGS = {"b": BREAK, "x": EX, "$": STAR}
+SLIDE_FLAGS = {"b": BREAK, "x": EX, "?": TAPLESS, "!": TAPLESS, "$": TAPLESS}
+
+
+def decode_flags(modifier: str, table: dict) -> int:
+    """Turns the modifier characters of a note into flags. Characters that
+    aren't in table are ignored.
+
+    Examples:
+        >>> decode_flags("bx", TAP_FLAGS) == BREAK | EX
+        True
+    """
+    flags = 0
+    for char in modifier:
+        flags |= table.get(char, 0)
+
+    return flags
+
+
+def add_flags(event: tuple, flags: int) -> tuple:
+    """Returns a copy of a note event with more flags set."""
+    return (event[0], event[1] | flags) + event[2:]
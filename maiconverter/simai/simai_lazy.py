@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import bisect
+import math
+import re
+from typing import Dict, List, Optional, Tuple, Union
+
+from .simai import SimaiChart
+from .simainote import TapNote, HoldNote, SlideNote, TouchTapNote, TouchHoldNote
+from .tools import iter_parse_fragments
+
+# BPM "(120)" and divisor "{4}" markers. Parentheses and braces aren't used
+# by anything else in a fragment.
+_MARKER = re.compile(r"\(([^()]*)\)|\{([^{}]*)\}")
+
+# Pseudo-each notes are placed slightly after their fragment, so notes at
+# the start of a measure can come from fragments of the previous one.
+_MARGIN = 0.1
+
+Note = Union[TapNote, HoldNote, SlideNote, TouchTapNote, TouchHoldNote]
+
+
+class LazySimaiChart(SimaiChart):
+    """A simai chart whose notes are parsed on demand. Only the fragment
+    boundaries, BPM markers, and divisors are scanned up front, so bpms
+    is complete and measures are known. The notes of a measure are parsed
+    the first time a range that includes it is requested with notes_in,
+    and kept for later requests.
+
+    Accessing notes parses the rest of the chart and gives the same notes,
+    in the same order, as SimaiChart.from_str. The chart then behaves like
+    a regular SimaiChart.
+
+    Examples:
+        Get the notes of measures 20 to 28 without parsing the rest.
+
+        >>> simai = LazySimaiChart.from_str(chart_text)
+        >>> preview = simai.notes_in(20, 28)
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._all_notes: Optional[List[Note]] = None
+        self._workers: Optional[int] = None
+        self._fragments: List[str] = []
+        # Measure and divisor at the start of each fragment
+        self._measures: List[float] = []
+        self._divisors: List[Optional[float]] = []
+        # Every BPM marker in order, and the number of them up to and
+        # including each fragment that has BPM markers
+        self._bpm_log: List[Tuple[float, float]] = []
+        self._bpm_indices: List[int] = []
+        self._bpm_counts: List[int] = []
+        # Parsed notes of each whole measure
+        self._spans: Dict[int, List[Note]] = {}
+
+    @property
+    def notes(self) -> List[Note]:
+        if self._all_notes is None:
+            self._all_notes = self._parse_all()
+            self._spans.clear()
+
+        return self._all_notes
+
+    @notes.setter
+    def notes(self, notes: List[Note]) -> None:
+        self._all_notes = notes
+
+    @classmethod
+    def from_str(
+        cls,
+        chart_text: str,
+        message: Optional[str] = None,
+        workers: Optional[int] = None,
+    ) -> SimaiChart:
+        """Scans a simai chart without parsing its notes.
+
+        Args:
+            chart_text: The simai chart.
+            message: Progress message printed while scanning.
+            workers: Number of worker processes used when parsing notes.
+                Defaults to the number of CPUs. 0 parses in the current
+                process.
+
+        Raises:
+            ValueError: When a BPM or divisor marker is not a number, or a
+                divisor is 0.
+        """
+        if message is None:
+            print("Parsing simai chart...", end="", flush=True)
+        else:
+            print(message, end="", flush=True)
+
+        try:
+            simai_chart = cls._scan(chart_text, workers)
+        except:
+            print("ERROR")
+            raise
+        else:
+            print("Done")
+
+        return simai_chart
+
+    @classmethod
+    def _scan(cls, chart_text: str, workers: Optional[int]) -> LazySimaiChart:
+        simai_chart = cls()
+        simai_chart._workers = workers
+        simai_chart._fragments = "".join(chart_text.split()).split(",")
+        for i, fragment in enumerate(simai_chart._fragments):
+            simai_chart._measures.append(simai_chart._measure)
+            simai_chart._divisors.append(simai_chart._divisor)
+            has_bpm = False
+            for match in _MARKER.finditer(fragment):
+                bpm, divisor = match.groups()
+                if bpm is not None:
+                    simai_chart.set_bpm(simai_chart._measure, float(bpm))
+                    simai_chart._bpm_log.append((simai_chart._measure, float(bpm)))
+                    has_bpm = True
+                elif float(divisor) == 0:
+                    raise ValueError("Divisor is 0.")
+                else:
+                    simai_chart._divisor = float(divisor)
+
+            if has_bpm:
+                simai_chart._bpm_indices.append(i)
+                simai_chart._bpm_counts.append(len(simai_chart._bpm_log))
+
+            simai_chart._measure += 1 / simai_chart._divisor
+
+        return simai_chart
+
+    def notes_in(self, start: float, end: float) -> List[Note]:
+        """Gets the notes that start in [start, end), parsing the measures
+        they are in if needed.
+
+        Args:
+            start: Start of the range, in measures.
+            end: End of the range, in measures. Not included.
+
+        Returns:
+            The notes of the range, in the order they appear in the chart.
+        """
+        if self._all_notes is not None:
+            return [note for note in self._all_notes if start <= note.measure < end]
+
+        result = []
+        for whole in range(math.floor(start - _MARGIN), math.floor(end) + 1):
+            for note in self._get_span(whole):
+                if start <= note.measure < end:
+                    result.append(note)
+
+        return result
+
+    def parsed_measures(self) -> List[int]:
+        """Whole measures whose notes have been parsed so far."""
+        if self._all_notes is not None:
+            return list(range(self._first_measure(), self._last_measure() + 1))
+
+        return sorted(self._spans)
+
+    def _first_measure(self) -> int:
+        return int(self._measures[0]) if len(self._measures) != 0 else 0
+
+    def _last_measure(self) -> int:
+        return int(self._measures[-1]) if len(self._measures) != 0 else 0
+
+    def _fragment_range(self, whole: int) -> Tuple[int, int]:
+        return (
+            bisect.bisect_left(self._measures, whole),
+            bisect.bisect_left(self._measures, whole + 1),
+        )
+
+    def _get_span(self, whole: int) -> List[Note]:
+        notes = self._spans.get(whole)
+        if notes is None:
+            notes = self._parse_fragments(*self._fragment_range(whole))
+            self._spans[whole] = notes
+
+        return notes
+
+    def _parse_all(self) -> List[Note]:
+        if len(self._spans) == 0:
+            return self._parse_fragments(0, len(self._fragments))
+
+        notes = []
+        for whole in range(self._first_measure(), self._last_measure() + 1):
+            notes += self._get_span(whole)
+
+        return notes
+
+    def _parse_fragments(self, start: int, end: int) -> List[Note]:
+        if start >= end:
+            return []
+
+        # Replays the fragments on a chart in the same state that from_str
+        # would be in, so slides with an equivalent BPM see the same BPMs
+        simai_chart = SimaiChart()
+        simai_chart._measure = self._measures[start]
+        simai_chart._divisor = self._divisors[start]
+        i = bisect.bisect_left(self._bpm_indices, start)
+        if i != 0:
+            for measure, bpm in self._bpm_log[: self._bpm_counts[i - 1]]:
+                simai_chart.set_bpm(measure, bpm)
+
+        fragments = self._fragments[start:end]
+        for events in iter_parse_fragments(fragments, self._workers):
+            simai_chart._add_fragment(events)
+
+        return simai_chart.notes
@@ -1,6 +1,213 @@
-from typing import List
+import hashlib
+import importlib
+import os
+import re
+import tempfile
+import time
+from typing import List, Dict, Iterable, Iterator, NamedTuple, Optional, Tuple
+import lark
 from lark import Lark, Transformer
 
+from .simai_scanner import scan_fragment
+from .simai_events import (
+    BPM_EVENT,
+    DIVISOR_EVENT,
+    TAP_EVENT,
+    HOLD_EVENT,
+    SLIDE_EVENT,
+    TOUCH_TAP_EVENT,
+    TOUCH_HOLD_EVENT,
+    TAP_FLAGS,
+    SLIDE_FLAGS,
+    EX,
+    FIREWORK,
+    CHAINED,
+    PSEUDO_EACH,
+    add_flags,
+    decode_flags,
+)
+
+
+class ParserCacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    disk_hits: int
+    currsize: int
+
+
+# Compiled parsers of this process, keyed by grammar path and Lark options.
+_parsers: Dict[Tuple, Lark] = {}
+_parser_stats = {"hits": 0, "misses": 0, "disk_hits": 0}
+
+
+def parser_cache_dir() -> Optional[str]:
+    """Returns the directory where serialized parse tables are stored.
+
+    Defaults to a "maiconverter" folder in the system's temporary directory.
+    Can be changed with the MAICONVERTER_CACHE_DIR environment variable.
+    Setting it to an empty string disables the on-disk cache.
+    """
+    cache_dir = os.environ.get("MAICONVERTER_CACHE_DIR")
+    if cache_dir is None:
+        cache_dir = os.path.join(tempfile.gettempdir(), "maiconverter")
+    if cache_dir == "":
+        return None
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+    except OSError:
+        return None
+
+    return cache_dir
+
+
+def _grammar_digest(grammar_path: str) -> str:
+    with open(grammar_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _disk_cache_file(grammar_path: str) -> Optional[str]:
+    cache_dir = parser_cache_dir()
+    if cache_dir is None:
+        return None
+
+    # Name the cache after the grammar's contents so an edited grammar never
+    # picks up stale tables. Lark also checks the options and its own version
+    # before loading a cache file, and rebuilds it on a mismatch.
+    digest = _grammar_digest(grammar_path)[:16]
+    name = os.path.splitext(os.path.basename(grammar_path))[0]
+    return os.path.join(cache_dir, f"{name}-{digest}.lark_cache")
+
+
+def get_parser(lark_file: str, **options) -> Lark:
+    """Returns a compiled parser for a grammar file. A grammar is compiled at
+    most once per process for each set of options, and its LALR tables are
+    loaded from the on-disk cache when available.
+
+    Args:
+        lark_file: Path of the grammar. Relative paths are relative to the
+            simai package.
+        **options: Options passed to Lark. Defaults to parser="lalr".
+
+    Examples:
+        Parse a fragment with the bundled grammar.
+
+        >>> parser = get_parser("simai_fragment.lark")
+        >>> tree = parser.parse("1-5[8:1]")
+    """
+    options.setdefault("parser", "lalr")
+    grammar_path = os.path.abspath(os.path.join(os.path.dirname(__file__), lark_file))
+    key = (grammar_path, tuple(sorted(options.items())))
+
+    parser = _parsers.get(key)
+    if parser is not None:
+        _parser_stats["hits"] += 1
+        return parser
+
+    _parser_stats["misses"] += 1
+    cache_file = None
+    if options["parser"] == "lalr":
+        cache_file = _disk_cache_file(grammar_path)
+        if cache_file is not None and os.path.exists(cache_file):
+            _parser_stats["disk_hits"] += 1
+
+    if cache_file is None:
+        parser = Lark.open(grammar_path, **options)
+    else:
+        parser = Lark.open(grammar_path, cache=cache_file, **options)
+
+    _parsers[key] = parser
+    return parser
+
+
+# Parsers generated from the bundled grammars at build time by
+# "python setup.py build_parsers". They hold serialized parse tables, so
+# loading one doesn't load its grammar.
+_GENERATED_PARSERS = {
+    "simai.lark": "simai_lark_parser",
+    "simai_fragment.lark": "simai_fragment_lark_parser",
+}
+_missing_generated = set()
+
+
+def _get_generated_parser(lark_file: str, transformer: Transformer) -> Optional[Lark]:
+    key = ("generated", lark_file, transformer)
+    parser = _parsers.get(key)
+    if parser is not None:
+        _parser_stats["hits"] += 1
+        return parser
+
+    module_name = _GENERATED_PARSERS.get(lark_file)
+    if module_name is None or lark_file in _missing_generated:
+        return None
+
+    try:
+        module = importlib.import_module(f".{module_name}", __package__)
+    except ImportError:
+        module = None
+
+    # Tables generated from an older grammar or by another version of Lark
+    # are ignored
+    if module is not None:
+        grammar_path = os.path.join(os.path.dirname(__file__), lark_file)
+        if (
+            module.LARK_VERSION != lark.__version__
+            or module.GRAMMAR_SHA256 != _grammar_digest(grammar_path)
+        ):
+            module = None
+
+    if module is None:
+        _missing_generated.add(lark_file)
+        return None
+
+    _parser_stats["misses"] += 1
+    parser = module.load_parser(transformer=transformer)
+    _parsers[key] = parser
+    return parser
+
+
+def get_transforming_parser(lark_file: str, transformer: Transformer) -> Lark:
+    """Returns a parser that applies transformer during LALR reduction, so
+    its parse method returns the transformer's result instead of a tree.
+    The bundled grammars use the parsers generated for them when the
+    package was built. Other grammars, or a missing or outdated generated
+    parser, fall back to get_parser.
+
+    Args:
+        lark_file: Path of the grammar. Relative paths are relative to the
+            simai package.
+        transformer: Transformer whose callbacks are called for each rule.
+            A parser is compiled for each transformer, so reuse them.
+    """
+    parser = _get_generated_parser(lark_file, transformer)
+    if parser is None:
+        parser = get_parser(lark_file, transformer=transformer)
+
+    return parser
+
+
+def parser_cache_info() -> ParserCacheInfo:
+    """Reports the statistics of this process's compiled parser registry.
+    Hits are requests served by an already compiled parser, misses are
+    requests that had to load one. Disk hits are misses that loaded
+    prebuilt tables from the on-disk cache instead of building them.
+    """
+    return ParserCacheInfo(
+        _parser_stats["hits"],
+        _parser_stats["misses"],
+        _parser_stats["disk_hits"],
+        len(_parsers),
+    )
+
+
+def parser_cache_clear() -> None:
+    """Drops this process's compiled parsers and resets the statistics.
+    Does not remove the on-disk cache."""
+    _parsers.clear()
+    _missing_generated.clear()
+    for stat in _parser_stats:
+        _parser_stats[stat] = 0
+
 
 class SimaiTransformer(Transformer):
     def title(self, n):
@@ -38,13 +245,7 @@ class SimaiTransformer(Transformer):
 
     def chart(self, n):
         num, raw_chart = n
-        chart = ""
-        for x in raw_chart.splitlines():
-            if "||" not in x:
-                chart += x
-
-        chart = "".join(chart.split())
-        return {"type": "chart", "value": (int(num), chart)}
+        return {"type": "chart", "value": (int(num), clean_chart(raw_chart))}
 
     def amsg_first(self, n):
         pass
@@ -70,25 +271,79 @@ class SimaiTransformer(Transformer):
         return result
 
 
+_simai_transformer = SimaiTransformer()
+
+
+def get_file_parser(lark_file: str = "simai.lark") -> Lark:
+    """Returns a parser for whole simai files that applies SimaiTransformer
+    during LALR reduction. Its parse method returns a list of dicts instead
+    of a tree. See get_transforming_parser.
+
+    Args:
+        lark_file: The simai file grammar.
+    """
+    return get_transforming_parser(lark_file, _simai_transformer)
+
+
+def clean_chart(raw_chart: str) -> str:
+    """Removes comment lines ("||") and whitespace from a simai chart."""
+    chart = ""
+    for x in raw_chart.splitlines():
+        if "||" not in x:
+            chart += x
+
+    return "".join(chart.split())
+
+
+# A directive starts with "&" at the beginning of a line
+_DIRECTIVE = re.compile(r"^\ufeff?&([^=\r\n]*)=", re.MULTILINE)
+
+
+def iter_directives(text: str) -> Iterator[Tuple[str, Tuple[int, int]]]:
+    """Lazily scans the "&key=value" directives of a simai file in one
+    pass, without parsing any of the values.
+
+    Args:
+        text: Contents of a simai file.
+
+    Yields:
+        Tuples (key, (start, end)) where text[start:end] is the raw value of
+        the directive. Values may span multiple lines and include trailing
+        whitespace.
+
+    Examples:
+        >>> text = "&title=Song\n&lv_5=12\n&inote_5=1,2,\nE\n"
+        >>> [(key, text[start:end]) for key, (start, end) in iter_directives(text)]
+        [('title', 'Song\n'), ('lv_5', '12\n'), ('inote_5', '1,2,\nE\n')]
+    """
+    previous = None
+    for match in _DIRECTIVE.finditer(text):
+        if previous is not None:
+            yield previous.group(1), (previous.end(), match.start())
+
+        previous = match
+
+    if previous is not None:
+        yield previous.group(1), (previous.end(), len(text))
+
+
 class FragmentTransformer(Transformer):
-    def bpm(self, n) -> dict:
+    """Turns simai fragments into events. The fragment parser runs these
+    callbacks while reducing, so every callback only sees its children,
+    which are tokens and the values returned by other callbacks. No tree
+    is built. It holds no state and is shared by every parser.
+    """
+
+    def bpm(self, n) -> tuple:
         (n,) = n
-        event_dict = {
-            "type": "bpm",
-            "value": float(n),
-        }
-        return event_dict
+        return BPM_EVENT, float(n)
 
-    def divisor(self, n) -> dict:
+    def divisor(self, n) -> tuple:
         (n,) = n
         if float(n) == 0:
             raise ValueError("Divisor is 0.")
 
-        event_dict = {
-            "type": "divisor",
-            "value": float(n),
-        }
-        return event_dict
+        return DIVISOR_EVENT, float(n)
 
     def equivalent_bpm(self, n) -> dict:
         if len(n) == 0:
@@ -242,22 +497,24 @@ class FragmentTransformer(Transformer):
             raise ValueError("Incomplete data")
 
         slides = []
+        flags = decode_flags(modifier, SLIDE_FLAGS)
         if start != -1 and end != -1 and reflect != -1:
-            note_dict = {
-                "type": "slide",
-                "start_button": start,
-                "modifier": modifier,
-                "pattern": pattern,
-                "reflect_position": reflect,
-                "end_button": end,
-                "duration": duration,
-                "equivalent_bpm": equivalent_bpm,
-            }
-            slides.append(note_dict)
+            slides.append(
+                (
+                    SLIDE_EVENT,
+                    flags,
+                    start,
+                    end,
+                    pattern,
+                    reflect,
+                    duration,
+                    equivalent_bpm,
+                )
+            )
 
         if len(chained_slides) != 0:
             slides += process_chained_slides(
-                start, duration, equivalent_bpm, modifier + "*", chained_slides
+                start, duration, equivalent_bpm, flags | CHAINED, chained_slides
             )
 
         if len(slides) > 0:
@@ -279,38 +536,15 @@ class FragmentTransformer(Transformer):
             # Ignore simai notes that has button position 0
             return
 
-        is_tap = True
         if "h" in text:
-            is_tap = False
-
-        modifier = ""
-        for char in text:
-            if char == "h":
-                continue
-
-            if is_tap and char in "bx$":
-                modifier += char
-            elif not is_tap and char in "x":
-                modifier += char
-
-        if not is_tap:
             if duration_dict is None:
                 duration = 0
             else:
                 duration = duration_dict["duration"]
 
-            return {
-                "type": "hold",
-                "button": button,
-                "modifier": modifier,
-                "duration": duration,
-            }
+            return HOLD_EVENT, EX if "x" in text else 0, button, duration
 
-        return {
-            "type": "tap",
-            "button": button,
-            "modifier": modifier,
-        }
+        return TAP_EVENT, decode_flags(text, TAP_FLAGS), button
 
     def touch_tap_hold_note(self, items):
         if len(items) == 2:
@@ -333,52 +567,27 @@ class FragmentTransformer(Transformer):
         if region not in "CBE" or position == -1:
             return
 
-        is_tap = True
+        flags = FIREWORK if "f" in text else 0
         if "h" in text:
-            is_tap = False
-
-        modifier = ""
-        for char in text:
-            if char == "h":
-                continue
-
-            if char in "f":
-                modifier += char
-
-        if not is_tap:
             if duration_dict is None:
                 duration = 0
             else:
                 duration = duration_dict["duration"]
 
-            return {
-                "type": "touch_hold",
-                "region": region,
-                "location": position,
-                "modifier": modifier,
-                "duration": duration,
-            }
+            return TOUCH_HOLD_EVENT, flags, region, position, duration
 
-        return {
-            "type": "touch_tap",
-            "region": region,
-            "location": position,
-            "modifier": modifier,
-        }
+        return TOUCH_TAP_EVENT, flags, region, position
 
     def pseudo_each(self, items):
         (item,) = items
         if isinstance(item, list):
             notes = item
-        elif isinstance(item, dict):
+        elif isinstance(item, tuple):
             notes = [item]
         else:
             raise TypeError(f"Invalid type: {type(item)}")
 
-        for note in notes:
-            note["modifier"] += "`"
-
-        return notes
+        return [add_flags(note, PSEUDO_EACH) for note in notes]
 
     def chain(self, items) -> list:
         result = []
@@ -387,18 +596,18 @@ class FragmentTransformer(Transformer):
             if isinstance(item, list):
                 for subitem in item:
                     result.append(subitem)
-            elif isinstance(item, dict):
+            elif isinstance(item, tuple):
                 result.append(item)
         return result
 
 
 def process_chained_slides(
     start_button: int,
-    duration: dict,
-    equivalent_bpm: dict,
-    slide_modifier: str,
+    duration: float,
+    equivalent_bpm: Optional[float],
+    slide_flags: int,
     chained_slides: List[dict],
-):
+) -> List[tuple]:
     complete_slides = []
     for slide in chained_slides:
         if start_button == -1 or slide["reflect"] == -1 or slide["end"] == -1:
@@ -411,25 +620,127 @@ def process_chained_slides(
             else slide["equivalent_bpm"]
         )
 
-        note_dict = {
-            "type": "slide",
-            "start_button": start_button,
-            "modifier": slide_modifier,
-            "pattern": slide["pattern"],
-            "reflect_position": slide["reflect"],
-            "end_button": slide["end"],
-            "duration": duration,
-            "equivalent_bpm": equivalent_bpm,
-        }
-        complete_slides.append(note_dict)
+        complete_slides.append(
+            (
+                SLIDE_EVENT,
+                slide_flags,
+                start_button,
+                slide["end"],
+                slide["pattern"],
+                slide["reflect"],
+                duration,
+                equivalent_bpm,
+            )
+        )
 
     return complete_slides
 
 
-def parse_fragment(fragment: str, lark_file: str = "simai_fragment.lark") -> List[dict]:
-    parser = Lark.open(lark_file, rel_to=__file__, parser="lalr")
+FRAGMENT_GRAMMAR = "simai_fragment.lark"
+
+_fragment_transformer = FragmentTransformer()
+
+
+def get_fragment_parser(lark_file: str = FRAGMENT_GRAMMAR) -> Lark:
+    """Returns a parser for simai fragments that applies FragmentTransformer
+    during LALR reduction. Its parse method returns a list of events
+    instead of a tree. See get_transforming_parser.
+
+    Args:
+        lark_file: The fragment grammar.
+    """
+    return get_transforming_parser(lark_file, _fragment_transformer)
+
+
+def parse_fragment(fragment: str, lark_file: str = FRAGMENT_GRAMMAR) -> List[tuple]:
+    """Parses a simai fragment into a list of events. Common fragments are
+    handled by a hand-written scanner, the rest are parsed by Lark.
+
+    Args:
+        fragment: A simai fragment. Not an empty string or "E".
+        lark_file: The fragment grammar. The scanner is only used with the
+            bundled grammar.
+
+    Returns:
+        Event tuples as described in simai_events.
+    """
+    if lark_file == FRAGMENT_GRAMMAR:
+        events = scan_fragment(fragment)
+        if events is not None:
+            return events
+
+    return _lark_parse_fragment(fragment, lark_file)
+
+
+class FragmentProfile(NamedTuple):
+    fragment: str
+    seconds: float
+    # "scanner", "lark", or "empty"
+    path: str
+    events: int
+
+
+def profile_fragment(fragment: str) -> Tuple[List[tuple], FragmentProfile]:
+    """Parses a simai fragment like parse_fragment does with the bundled
+    grammar, and measures it.
+
+    Returns:
+        A tuple (events, profile) where profile holds the time taken, the
+        parser that handled the fragment, and the number of events.
+    """
+    start = time.perf_counter()
+    events = scan_fragment(fragment)
+    path = "scanner"
+    if events is None:
+        events = _lark_parse_fragment(fragment)
+        path = "lark"
+
+    seconds = time.perf_counter() - start
+    return events, FragmentProfile(fragment, seconds, path, len(events))
+
+
+def _lark_parse_fragment(
+    fragment: str, lark_file: str = FRAGMENT_GRAMMAR
+) -> List[tuple]:
+    parser = get_fragment_parser(lark_file)
     try:
-        return FragmentTransformer().transform(parser.parse(fragment))
+        return parser.parse(fragment)
     except Exception:
         print(f"Error parsing {fragment}")
         raise
+
+
+def check_fragment_scanner(fragments: Iterable[str]) -> int:
+    """Differential test of the hand-written fragment scanner. Parses every
+    fragment with both the scanner and Lark and compares the events.
+
+    Args:
+        fragments: Simai fragments. Fragments that Lark fails to parse must
+            be rejected by the scanner.
+
+    Returns:
+        The number of fragments handled by the scanner.
+
+    Raises:
+        AssertionError: When the scanner's output differs from Lark's.
+    """
+    scanned = 0
+    for fragment in fragments:
+        events = scan_fragment(fragment)
+        if events is None:
+            continue
+
+        scanned += 1
+        try:
+            expected = get_fragment_parser().parse(fragment)
+        except Exception as e:
+            raise AssertionError(
+                f"Scanner accepted {fragment!r} which Lark rejects"
+            ) from e
+
+        if events != expected:
+            raise AssertionError(
+                f"Scanner mismatch for {fragment!r}: {events} != {expected}"
+            )
+
+    return scanned
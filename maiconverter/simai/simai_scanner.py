@@ -0,0 +1,287 @@
+import re
+from typing import List, Optional, Tuple
+
+from .simai_events import (
+    BPM_EVENT,
+    DIVISOR_EVENT,
+    TAP_EVENT,
+    HOLD_EVENT,
+    SLIDE_EVENT,
+    TOUCH_TAP_EVENT,
+    TOUCH_HOLD_EVENT,
+    TAP_FLAGS,
+    SLIDE_FLAGS,
+    EX,
+    FIREWORK,
+    CHAINED,
+    PSEUDO_EACH,
+    add_flags,
+    decode_flags,
+)
+
+# Hand-written scanner for the common constructs of simai_fragment.lark.
+# It produces the same events as FragmentTransformer, and gives up by
+# returning None on anything it doesn't fully understand. That includes all
+# input that would raise an error or be silently dropped by the Lark parser,
+# so that parse_fragment can fall back to Lark and behave exactly as before.
+
+_BUTTONS = "012345678"
+_TAP_CHARS = "hbex$"
+_TOUCH_CHARS = "hfe"
+_SLIDE_MODIFIERS = "b@x?$!"
+_SLIDE_PATTERNS = "-^<>szvw"
+
+# NUMBER from lark's common.lark
+_NUMBER = re.compile(r"(?:[0-9]+(?:\.[0-9]*)?|\.[0-9]+)(?:[eE][+-]?[0-9]+)?")
+_DURATION = re.compile(r"\[(?:(\d+(?:\.\d*)?)#)?([0-9]+):([0-9]+)\]")
+
+
+class _Unsupported(Exception):
+    pass
+
+
+def _scan_number(fragment: str, i: int, closing: str) -> Tuple[int, float]:
+    end = fragment.find(closing, i)
+    if end == -1 or _NUMBER.fullmatch(fragment, i, end) is None:
+        raise _Unsupported
+
+    return end + 1, float(fragment[i:end])
+
+
+def _scan_duration(fragment: str, i: int) -> Tuple[int, Optional[float], float]:
+    match = _DURATION.match(fragment, i)
+    if match is None:
+        raise _Unsupported
+
+    equivalent_bpm, den, num = match.groups()
+    if equivalent_bpm is not None:
+        equivalent_bpm = float(equivalent_bpm)
+
+    den = int(den)
+    duration = 0 if den <= 0 else int(num) / den
+
+    return match.end(), equivalent_bpm, duration
+
+
+def _scan_slide_shape(
+    fragment: str, i: int
+) -> Optional[Tuple[int, str, Optional[int], int]]:
+    # Matches ([-^<>szvw]|p{1,2}|q{1,2}|V[0-8])[0-8] starting at i.
+    # Returns (index after match, pattern, reflect, end) or None.
+    n = len(fragment)
+    if i >= n:
+        return None
+
+    char = fragment[i]
+    reflect = None
+    if char in _SLIDE_PATTERNS:
+        pattern = char
+        i += 1
+    elif char in "pq":
+        if i + 2 < n and fragment[i + 1] == char and fragment[i + 2] in _BUTTONS:
+            pattern = char + char
+            i += 2
+        else:
+            pattern = char
+            i += 1
+    elif char == "V" and i + 1 < n and fragment[i + 1] in _BUTTONS:
+        pattern = char
+        reflect = int(fragment[i + 1]) - 1
+        i += 2
+    else:
+        return None
+
+    if i >= n or fragment[i] not in _BUTTONS:
+        return None
+
+    return i + 1, pattern, reflect, int(fragment[i]) - 1
+
+
+def _scan_slide(fragment: str, i: int) -> Optional[Tuple[int, List[tuple]]]:
+    n = len(fragment)
+    start = int(fragment[i]) - 1
+    j = i + 1
+    while j < n and fragment[j] in _SLIDE_MODIFIERS:
+        j += 1
+
+    shape = _scan_slide_shape(fragment, j)
+    if shape is None:
+        # Not a slide, let the caller try a tap
+        return None
+
+    flags = decode_flags(fragment[i + 1 : j], SLIDE_FLAGS)
+    j, pattern, reflect, end = shape
+    if start == -1 or reflect == -1 or end == -1:
+        raise _Unsupported
+    if j >= n or fragment[j] != "[":
+        raise _Unsupported
+
+    j, equivalent_bpm, duration = _scan_duration(fragment, j)
+    slides = [
+        (SLIDE_EVENT, flags, start, end, pattern, reflect, duration, equivalent_bpm)
+    ]
+
+    chained_flags = flags | CHAINED
+    while j < n and fragment[j] == "*":
+        j += 1
+        while j < n and fragment[j] in _SLIDE_MODIFIERS:
+            j += 1
+
+        shape = _scan_slide_shape(fragment, j)
+        if shape is None:
+            raise _Unsupported
+
+        j, pattern, reflect, end = shape
+        if reflect == -1 or end == -1:
+            raise _Unsupported
+
+        # Chained slides without a duration take the previous one
+        if j < n and fragment[j] == "[":
+            j, chained_bpm, chained_duration = _scan_duration(fragment, j)
+            duration = chained_duration
+            if chained_bpm is not None:
+                equivalent_bpm = chained_bpm
+
+        slides.append(
+            (
+                SLIDE_EVENT,
+                chained_flags,
+                start,
+                end,
+                pattern,
+                reflect,
+                duration,
+                equivalent_bpm,
+            )
+        )
+
+    return j, slides
+
+
+def _scan_tap_hold(fragment: str, i: int) -> Tuple[int, tuple]:
+    n = len(fragment)
+    button = int(fragment[i]) - 1
+    if button == -1:
+        raise _Unsupported
+
+    j = i + 1
+    while j < n and fragment[j] in _TAP_CHARS:
+        j += 1
+
+    text = fragment[i + 1 : j]
+    duration = 0
+    if j < n and fragment[j] == "[":
+        j, _, duration = _scan_duration(fragment, j)
+
+    if "h" in text:
+        return j, (HOLD_EVENT, EX if "x" in text else 0, button, duration)
+
+    return j, (TAP_EVENT, decode_flags(text, TAP_FLAGS), button)
+
+
+def _scan_touch(fragment: str, i: int) -> Tuple[int, tuple]:
+    n = len(fragment)
+    region = fragment[i]
+    j = i + 1
+    if region == "C":
+        if j < n and fragment[j] in "012":
+            j += 1
+    elif j < n and fragment[j] in _BUTTONS:
+        j += 1
+    else:
+        raise _Unsupported
+
+    position = int(fragment[i + 1]) - 1 if j == i + 2 else 0
+    if region not in "CBE" or position == -1:
+        raise _Unsupported
+
+    k = j
+    while k < n and fragment[k] in _TOUCH_CHARS:
+        k += 1
+
+    text = fragment[j:k]
+    duration = 0
+    if k < n and fragment[k] == "[":
+        k, _, duration = _scan_duration(fragment, k)
+
+    flags = FIREWORK if "f" in text else 0
+    if "h" in text:
+        return k, (TOUCH_HOLD_EVENT, flags, region, position, duration)
+
+    return k, (TOUCH_TAP_EVENT, flags, region, position)
+
+
+def _scan_note(fragment: str, i: int) -> Tuple[int, List[tuple]]:
+    char = fragment[i]
+    if char in _BUTTONS:
+        slide = _scan_slide(fragment, i)
+        if slide is not None:
+            return slide
+
+        j, note = _scan_tap_hold(fragment, i)
+        return j, [note]
+    if char in "CBEAD":
+        j, note = _scan_touch(fragment, i)
+        return j, [note]
+
+    raise _Unsupported
+
+
+def _scan_value(fragment: str, i: int) -> Tuple[int, List[tuple]]:
+    char = fragment[i]
+    if char == "(":
+        i, value = _scan_number(fragment, i + 1, ")")
+        return i, [(BPM_EVENT, value)]
+    if char == "{":
+        i, value = _scan_number(fragment, i + 1, "}")
+        if value == 0:
+            raise _Unsupported
+
+        return i, [(DIVISOR_EVENT, value)]
+    if char == "`":
+        if i + 1 >= len(fragment):
+            raise _Unsupported
+
+        i, notes = _scan_note(fragment, i + 1)
+        return i, [add_flags(note, PSEUDO_EACH) for note in notes]
+
+    return _scan_note(fragment, i)
+
+
+def scan_fragment(fragment: str) -> Optional[List[tuple]]:
+    """Parses a simai fragment without Lark.
+
+    Handles taps, holds, slides with chained segments, touch notes,
+    divisors, BPMs, and pseudo-eachs, which covers most real charts.
+
+    Args:
+        fragment: A simai fragment with no whitespace. Not an empty string
+            or "E".
+
+    Returns:
+        The same list of events that parsing with simai_fragment.lark and
+        FragmentTransformer produces, or None when the fragment has to be
+        parsed by Lark instead.
+
+    Examples:
+        >>> scan_fragment("1-5[8:1]")
+        [(4, 0, 0, 4, '-', None, 0.125, None)]
+        >>> scan_fragment("1-5-3[8:1]") is None
+        True
+    """
+    events: List[tuple] = []
+    n = len(fragment)
+    i = 0
+    try:
+        while True:
+            if i >= n:
+                raise _Unsupported
+
+            i, values = _scan_value(fragment, i)
+            events += values
+            if i == n:
+                return events
+            if fragment[i] == "/":
+                i += 1
+    except _Unsupported:
+        return None
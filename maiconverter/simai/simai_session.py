@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+from itertools import chain
+from typing import List, NamedTuple, Optional, Tuple, Union
+
+from .simai import SimaiChart
+from .simainote import TapNote, HoldNote, SlideNote, TouchTapNote, TouchHoldNote, BPM
+from .simai_events import BPM_EVENT
+from .executor import get_executor
+
+Note = Union[TapNote, HoldNote, SlideNote, TouchTapNote, TouchHoldNote]
+
+# Number of fragments compared at a time when diffing texts
+_DIFF_BLOCK = 256
+
+
+def _common_prefix(a: List[str], b: List[str], limit: int) -> int:
+    # Number of equal items at the start of a and b, up to limit. Compares
+    # blocks of items first, which is much faster than one at a time.
+    length = 0
+    while (
+        length + _DIFF_BLOCK <= limit
+        and a[length : length + _DIFF_BLOCK] == b[length : length + _DIFF_BLOCK]
+    ):
+        length += _DIFF_BLOCK
+
+    while length < limit and a[length] == b[length]:
+        length += 1
+
+    return length
+
+
+class SessionUpdate(NamedTuple):
+    """What an update of a SimaiEditSession did.
+
+    Attributes:
+        parsed: Number of fragments that were parsed.
+        replayed: Number of fragments whose notes were rebuilt. Includes
+            the parsed ones, and unchanged ones after them that moved.
+    """
+
+    parsed: int
+    replayed: int
+
+
+class SimaiEditSession:
+    """Keeps a simai chart up to date with text that is being edited,
+    like in a chart editor. Each update compares the new text with the
+    previous one fragment by fragment, only parses fragments that changed,
+    and only rebuilds notes from the first changed fragment until the
+    measure, divisor, and BPMs are back in step with the previous text.
+    Editing a note only parses and rebuilds its own fragment.
+
+    The chart has the same notes and BPMs, in the same order, as
+    SimaiChart.from_str on the same text.
+
+    Examples:
+        >>> session = SimaiEditSession("(120){4}1,2,3,4,E")
+        >>> session.update("(120){4}1,2b,3,4,E")
+        SessionUpdate(parsed=1, replayed=1)
+        >>> session.chart.notes[1].note_type
+        <NoteType.break_tap: 3>
+    """
+
+    def __init__(self, chart_text: str = "", workers: Optional[int] = 0) -> None:
+        """
+        Args:
+            chart_text: The simai chart.
+            workers: Number of worker processes used for parsing. Defaults
+                to 0, which parses in the current process.
+        """
+        self.workers = workers
+        self.chart = SimaiChart()
+        self._fragments: List[str] = []
+        self._events: List[List[tuple]] = []
+        # Measure and divisor at the start of each fragment
+        self._starts: List[Tuple[float, Optional[float]]] = []
+        # Notes and BPMs added by each fragment
+        self._notes: List[List[Note]] = []
+        self._bpms: List[List[BPM]] = []
+        if chart_text != "":
+            self.update(chart_text)
+
+    def update(self, chart_text: str) -> SessionUpdate:
+        """Updates the chart to the new text. When the update fails, the
+        chart and session are left as they were.
+
+        Args:
+            chart_text: The whole simai chart after the edit.
+
+        Returns:
+            How many fragments were parsed and rebuilt.
+
+        Raises:
+            RuntimeError: When a fragment fails to parse.
+        """
+        fragments = "".join(chart_text.split()).split(",")
+        old = self._fragments
+
+        # Fragments that are the same at the start and end of both texts
+        limit = min(len(old), len(fragments))
+        prefix = _common_prefix(old, fragments, limit)
+        suffix = _common_prefix(old[::-1], fragments[::-1], limit - prefix)
+
+        changed = fragments[prefix : len(fragments) - suffix]
+        parsed = get_executor(self.workers).parse(changed)
+        events = self._events[:prefix] + parsed + self._events[len(old) - suffix :]
+        # Number of fragments added by the edit
+        shift = len(fragments) - len(old)
+
+        # Replay the changed fragments on a chart in the state the previous
+        # fragments left it in, then the unchanged ones until they start
+        # where they used to
+        scratch = SimaiChart()
+        if prefix < len(self._starts):
+            scratch._measure, scratch._divisor = self._starts[prefix]
+        else:
+            scratch._measure, scratch._divisor = (
+                self.chart._measure,
+                self.chart._divisor,
+            )
+        scratch.bpms = list(chain.from_iterable(self._bpms[:prefix]))
+
+        starts: List[Tuple[float, Optional[float]]] = []
+        notes: List[List[Note]] = []
+        bpms: List[List[BPM]] = []
+        end = prefix
+        while end < len(fragments):
+            if end >= len(fragments) - suffix and self._in_step(
+                scratch, end - shift, prefix, bpms
+            ):
+                break
+
+            starts.append((scratch._measure, scratch._divisor))
+            note_count = len(scratch.notes)
+            bpm_ids = None
+            if any(event[0] == BPM_EVENT for event in events[end]):
+                bpm_ids = {id(bpm) for bpm in scratch.bpms}
+
+            scratch._add_fragment(events[end])
+            notes.append(scratch.notes[note_count:])
+            if bpm_ids is None:
+                bpms.append([])
+            else:
+                bpms.append([bpm for bpm in scratch.bpms if id(bpm) not in bpm_ids])
+
+            end += 1
+
+        old_end = end - shift
+        note_start = sum(map(len, self._notes[:prefix]))
+        note_end = note_start + sum(map(len, self._notes[prefix:old_end]))
+        self.chart.notes[note_start:note_end] = chain.from_iterable(notes)
+        bpms_changed = any(bpms) or any(self._bpms[prefix:old_end])
+
+        self._fragments = fragments
+        self._events = events
+        self._starts = self._starts[:prefix] + starts + self._starts[old_end:]
+        self._notes = self._notes[:prefix] + notes + self._notes[old_end:]
+        self._bpms = self._bpms[:prefix] + bpms + self._bpms[old_end:]
+        if bpms_changed:
+            self.chart.bpms = list(chain.from_iterable(self._bpms))
+        if end == len(fragments):
+            self.chart._measure, self.chart._divisor = (
+                scratch._measure,
+                scratch._divisor,
+            )
+
+        return SessionUpdate(len(changed), end - prefix)
+
+    def _in_step(
+        self, scratch: SimaiChart, old_index: int, prefix: int, bpms: List[List[BPM]]
+    ) -> bool:
+        # Whether the old fragment at old_index would be rebuilt the same,
+        # because it starts at the same measure and divisor, after the same BPMs
+        if old_index >= len(self._starts):
+            return False
+        if self._starts[old_index] != (scratch._measure, scratch._divisor):
+            return False
+
+        old_bpms = [
+            (bpm.measure, bpm.bpm) for x in self._bpms[prefix:old_index] for bpm in x
+        ]
+        new_bpms = [(bpm.measure, bpm.bpm) for x in bpms for bpm in x]
+        return old_bpms == new_bpms
@@ -44,7 +44,6 @@ class TapNote(SimaiNote):
         is_star: bool = False,
         is_ex: bool = False,
     ) -> None:
-        measure = round(100000.0 * measure) / 100000.0
         if is_ex and is_star:
             super().__init__(measure, position, NoteType.ex_star)
         elif is_ex and not is_star:
@@ -66,7 +65,6 @@ class HoldNote(SimaiNote):
         if duration < 0:
             raise ValueError(f"Hold duration is negative: {duration}")
 
-        measure = round(100000.0 * measure) / 100000.0
         duration = round(100000.0 * duration) / 100000.0
         if is_ex:
             super().__init__(measure, position, NoteType.ex_hold)
@@ -109,7 +107,6 @@ class SlideNote(SimaiNote):
             ValueError: When duration is not positive
                 or when delay is negative
         """
-        measure = round(100000.0 * measure) / 100000.0
         duration = round(100000.0 * duration) / 100000.0
         delay = round(100000.0 * delay) / 100000.0
         if duration <= 0:
@@ -133,8 +130,6 @@ class TouchTapNote(SimaiNote):
     def __init__(
         self, measure: float, position: int, region: str, is_firework: bool = False
     ) -> None:
-        measure = round(measure * 100000.0) / 100000.0
-
         super().__init__(measure, position, NoteType.touch_tap)
         self.is_firework = is_firework
         self.region = region
@@ -149,7 +144,6 @@ class TouchHoldNote(SimaiNote):
         duration: float,
         is_firework: bool = False,
     ) -> None:
-        measure = round(measure * 100000.0) / 100000.0
         duration = round(duration * 100000.0) / 100000.0
 
         super().__init__(measure, position, NoteType.touch_hold)
@@ -163,8 +157,6 @@ class BPM(Event):
         if bpm <= 0:
             raise ValueError("BPM is not positive " + str(bpm))
 
-        measure = round(measure * 100000.0) / 100000.0
-
         super().__init__(measure, EventType.bpm)
         self.bpm = bpm
 
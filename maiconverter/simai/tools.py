@@ -1,8 +1,7 @@
 import math
-from typing import List, Union, Optional, Tuple
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Union, Optional, Set, Tuple
 from fractions import Fraction
-from multiprocessing import Pool, Event
-import os
 
 from ..event import NoteType
 from .simainote import (
@@ -14,15 +13,138 @@ from .simainote import (
     BPM,
     slide_to_pattern_str,
 )
-from .simai_parser import parse_fragment
-
-ABORT = None
+from .executor import get_executor
+from .simai_events import SimaiEvent
 
 
 def _lcm(a: int, b: int) -> int:
     return a * b // math.gcd(a, b)
 
 
+@lru_cache(maxsize=65536)
+def limit_fraction(value: float, max_den: int) -> Fraction:
+    """Same as Fraction(value).limit_denominator(max_den), but remembers
+    results since charts reuse the same durations over and over."""
+    return Fraction(value).limit_denominator(max_den)
+
+
+# Measures are whole ticks, but durations are kept to 4 or 5 decimal places,
+# so snapped values can be up to half of that away, plus floating point error
+SNAP_TOLERANCE = 0.00006
+# Grid of ma2 charts, which most exported charts are converted from
+SNAP_RESOLUTION = 384
+
+
+def _simplest_between(
+    low_num: int, low_den: int, high_num: int, high_den: int
+) -> Tuple[int, int]:
+    # The fraction with the smallest denominator in [low, high], for
+    # 0 <= low < high, as (numerator, denominator)
+    whole = low_num // low_den
+    if whole * low_den == low_num:
+        return whole, 1
+    if (whole + 1) * high_den <= high_num:
+        return whole + 1, 1
+
+    # Continue with the reciprocals of the fractional parts
+    num, den = _simplest_between(
+        high_den, high_num - whole * high_den, low_den, low_num - whole * low_den
+    )
+    return whole * num + den, num
+
+
+def snap_measure(measure: float, max_den: int = 1000) -> Fraction:
+    """Snaps a measure to an exact fraction. Measures that are within
+    rounding of a 384 ticks per measure grid are snapped to it. Others are
+    snapped to the fraction with the smallest denominator within rounding,
+    or to the closest fraction if that denominator is larger than max_den.
+
+    Examples:
+        >>> snap_measure(2.3333)
+        Fraction(7, 3)
+        >>> snap_measure(1.1068)
+        Fraction(425, 384)
+    """
+    whole = math.floor(measure)
+    frac = measure - whole
+    ticks = round(frac * SNAP_RESOLUTION)
+    if abs(frac * SNAP_RESOLUTION - ticks) <= SNAP_TOLERANCE * SNAP_RESOLUTION:
+        snapped = Fraction(ticks, SNAP_RESOLUTION)
+        if snapped.denominator <= max_den:
+            return whole + snapped
+
+    num, den = frac.as_integer_ratio()
+    tol_num, tol_den = SNAP_TOLERANCE.as_integer_ratio()
+    low_num = max(num * tol_den - tol_num * den, 0)
+    high_num = num * tol_den + tol_num * den
+    num, den = _simplest_between(low_num, den * tol_den, high_num, den * tol_den)
+    if den <= max_den:
+        return whole + Fraction(num, den)
+
+    return whole + Fraction(frac).limit_denominator(max_den)
+
+
+def get_resolution(measures: Iterable[Fraction]) -> int:
+    """Returns the number of ticks per measure of the smallest integer grid
+    that fits every snapped measure."""
+    resolution = 1
+    for denominator in {measure.denominator for measure in measures}:
+        resolution = _lcm(resolution, denominator)
+
+    return resolution
+
+
+def to_ticks(measure: Fraction, resolution: int) -> int:
+    """Converts a snapped measure to ticks of a grid from get_resolution."""
+    return measure.numerator * (resolution // measure.denominator)
+
+
+def _reduce_gap(gap: int, resolution: int, max_den: int) -> Tuple[int, int]:
+    # Fraction of a measure covered by a gap of less than a measure, as
+    # (numerator, denominator) with the denominator limited to max_den
+    gcd = math.gcd(gap, resolution)
+    numerator, denominator = gap // gcd, resolution // gcd
+    if denominator > max_den:
+        frac = Fraction(numerator, denominator).limit_denominator(max_den)
+        numerator, denominator = frac.numerator, frac.denominator
+
+    return numerator, denominator
+
+
+@lru_cache(maxsize=4096)
+def _rest_for_gaps(
+    gap: int,
+    gap_after: Optional[int],
+    resolution: int,
+    current_divisor: Optional[int],
+    max_den: int,
+) -> Tuple[int, int, int]:
+    # Rests only depend on the gaps between measures, so the results are
+    # shared by every gap of the same size
+    if gap == 0:
+        if current_divisor is None:
+            return 0, 4, 0
+
+        return 0, current_divisor, 0
+
+    whole, rest = divmod(gap, resolution)
+    numerator, denominator = _reduce_gap(rest, resolution, max_den)
+
+    if current_divisor is not None:
+        if current_divisor % denominator == 0 and gap < resolution:
+            divisor = current_divisor
+            return 0, divisor, numerator * (divisor // denominator)
+
+    if gap_after is not None:
+        _, denominator_after = _reduce_gap(gap_after % resolution, resolution, max_den)
+        _lcm_divisor_after = _lcm(denominator, denominator_after)
+        if _lcm_divisor_after <= 64 and gap < resolution:
+            divisor = _lcm_divisor_after
+            return 0, divisor, numerator * (divisor // denominator)
+
+    return whole, denominator, numerator
+
+
 def get_rest(
     current_measure: float,
     next_measure: float,
@@ -34,48 +156,184 @@ def get_rest(
     # Returns a tuple (whole, divisor, amount)
     if next_measure < current_measure:
         raise ValueError("Current measure is greater than next.")
-    if next_measure == current_measure:
-        if current_divisor is None:
-            return 0, 4, 0
 
-        return 0, current_divisor, 0
+    gap = Fraction(next_measure - current_measure)
+    resolution = gap.denominator
+    gap_after = None
+    if after_next_measure is not None:
+        if next_measure > after_next_measure:
+            raise ValueError("After next measure is greater than next measure")
 
-    difference = math.modf(next_measure - current_measure)
-    difference_frac = Fraction(difference[0]).limit_denominator(max_den)
+        frac_after = Fraction(after_next_measure - next_measure)
+        resolution = _lcm(resolution, frac_after.denominator)
+        gap_after = frac_after.numerator * (resolution // frac_after.denominator)
 
-    if current_divisor is not None:
-        _lcm_divisor = _lcm(current_divisor, difference_frac.denominator)
-        if _lcm_divisor == current_divisor and next_measure - current_measure < 1:
-            divisor = current_divisor
-            whole = 0
-            amount = int(
-                difference[1] * divisor
-                + difference_frac.numerator * (divisor / difference_frac.denominator)
-            )
-            return whole, divisor, amount
+    return _rest_for_gaps(
+        gap.numerator * (resolution // gap.denominator),
+        gap_after,
+        resolution,
+        current_divisor,
+        max_den,
+    )
 
-    if after_next_measure is not None:
-        if next_measure > after_next_measure:
+
+def get_grid_rest(
+    current_tick: int,
+    next_tick: int,
+    after_next_tick: Optional[int],
+    resolution: int,
+    current_divisor: Optional[int] = None,
+    max_den: int = 1000,
+) -> Tuple[int, int, int]:
+    """Like get_rest, for measures on an integer grid of resolution ticks
+    per measure. Gaps between ticks are exact, so equal gaps always give
+    the same rests.
+
+    Returns:
+        A tuple (whole, divisor, amount) of whole measure rests, and rests
+        of 1/divisor measures, needed to get to next_tick.
+    """
+    if next_tick < current_tick:
+        raise ValueError("Current measure is greater than next.")
+
+    gap_after = None
+    if after_next_tick is not None:
+        if next_tick > after_next_tick:
             raise ValueError("After next measure is greater than next measure")
 
-        difference_after = math.modf(after_next_measure - next_measure)
-        difference_after_frac = Fraction(difference_after[0]).limit_denominator(max_den)
-        _lcm_divisor_after = _lcm(
-            difference_frac.denominator, difference_after_frac.denominator
+        gap_after = after_next_tick - next_tick
+
+    return _rest_for_gaps(
+        next_tick - current_tick, gap_after, resolution, current_divisor, max_den
+    )
+
+
+# Number of gaps on each side whose divisors are tried for a gap in
+# get_compact_rests
+COMPACT_WINDOW = 8
+
+
+def _switch_cost(divisor: int, previous: Optional[int]) -> int:
+    # Characters of a "{divisor}" marker, if one is needed
+    return 0 if divisor == previous else len(str(divisor)) + 2
+
+
+def get_compact_rests(
+    gaps: List[int],
+    resolution: int,
+    max_den: int = 1000,
+    window: int = COMPACT_WINDOW,
+) -> List[Tuple[int, int, int]]:
+    """Chooses the rests between consecutive fragments that take the fewest
+    characters, counting commas and "{divisor}" markers. Divisors are
+    picked with dynamic programming over every gap. The divisors tried for
+    a gap are the ones that fit it exactly and come from gaps up to window
+    away, or their lcm if it is at most 64, so the search stays bounded.
+
+    Args:
+        gaps: Gaps in ticks between each fragment and the next.
+        resolution: Ticks per measure.
+        max_den: The maximum denominator of a gap less than a measure.
+        window: Number of gaps on each side whose divisors are tried.
+
+    Returns:
+        A tuple (whole, divisor, amount) for each gap, like get_grid_rest.
+        divisor is declared at the fragment before the gap, followed by
+        amount rests. Whole measure rests are written with "{1}" after them.
+    """
+    parts = []
+    for gap in gaps:
+        whole, rest = divmod(gap, resolution)
+        numerator, denominator = _reduce_gap(rest, resolution, max_den)
+        parts.append((whole, numerator, denominator))
+
+    # Cheapest cost to reach each divisor in effect after a gap, and the
+    # choice that got there
+    costs: Dict[Optional[int], int] = {None: 0}
+    choices: List[Dict[int, Tuple[Optional[int], int, bool]]] = []
+    for i, (whole, numerator, denominator) in enumerate(parts):
+        previous, min_cost = min(costs.items(), key=lambda item: item[1])
+        new_costs: Dict[Optional[int], int] = {}
+        new_choices: Dict[int, Tuple[Optional[int], int, bool]] = {}
+
+        if whole == 0 and numerator == 0:
+            # Nothing to rest, so keep the divisor in effect
+            for state, cost in costs.items():
+                divisor = 1 if state is None else state
+                new_costs[divisor] = cost + _switch_cost(divisor, state)
+                new_choices[divisor] = (state, divisor, False)
+
+            costs = new_costs
+            choices.append(new_choices)
+            continue
+
+        candidates = {denominator}
+        for j in range(max(0, i - window), min(len(parts), i + window + 1)):
+            other = parts[j][2]
+            multiple = _lcm(denominator, other)
+            if multiple <= 64 or multiple == other:
+                candidates.add(multiple)
+
+        candidates.update(
+            state for state in costs if state is not None and state % denominator == 0
         )
-        if _lcm_divisor_after <= 64 and next_measure - current_measure < 1:
-            divisor = _lcm_divisor_after
-            whole = 0
-            amount = int(
-                difference[1] * divisor
-                + difference_frac.numerator * (divisor / difference_frac.denominator)
-            )
-            return whole, divisor, amount
 
-    whole = int(difference[1])
-    amount = difference_frac.numerator
-    divisor = difference_frac.denominator
-    return whole, divisor, amount
+        for divisor in candidates:
+            # Cheapest way to declare divisor at this fragment
+            state, cost = previous, min_cost + _switch_cost(divisor, previous)
+            if costs.get(divisor, cost) < cost:
+                state, cost = divisor, costs[divisor]
+
+            rests = numerator * (divisor // denominator)
+            total = cost + whole * divisor + rests
+            if total < new_costs.get(divisor, total + 1):
+                new_costs[divisor] = total
+                new_choices[divisor] = (state, divisor, False)
+
+            if whole > 0 and numerator > 0:
+                # Rest to the next measure boundary, then "{1}" whole rests
+                total = cost + rests + 3 + whole
+                if total < new_costs.get(1, total + 1):
+                    new_costs[1] = total
+                    new_choices[1] = (state, divisor, True)
+
+        # A divisor that costs at least its marker more than the cheapest
+        # one can always be reached by switching later, so it is dropped
+        best = min(new_costs.values())
+        costs = {
+            state: cost
+            for state, cost in new_costs.items()
+            if cost < best + _switch_cost(state, None)
+        }
+        choices.append(new_choices)
+
+    rests: List[Tuple[int, int, int]] = []
+    state = min(costs, key=lambda key: costs[key])
+    for (whole, numerator, denominator), step in zip(
+        reversed(parts), reversed(choices)
+    ):
+        state, divisor, split = step[state]
+        amount = numerator * (divisor // denominator)
+        if split:
+            rests.append((whole, divisor, amount))
+        else:
+            rests.append((0, divisor, whole * divisor + amount))
+
+    rests.reverse()
+    return rests
+
+
+def get_grid_divisor(ticks: Iterable[int], resolution: int) -> Optional[int]:
+    """Accepts ticks that all belong to the same whole measure. Returns the
+    smallest divisor that fits all of them, or None if it would be larger
+    than 64."""
+    divisor = 1
+    for tick in ticks:
+        divisor = _lcm(divisor, resolution // math.gcd(tick % resolution, resolution))
+        if divisor > 64:
+            return None
+
+    return divisor
 
 
 def get_measure_divisor(measures: List[float], max_den: int = 1000) -> Optional[int]:
@@ -111,46 +369,63 @@ def get_measure_divisor(measures: List[float], max_den: int = 1000) -> Optional[
     return current__lcm
 
 
-def handle_tap(tap: TapNote, slides: List[SlideNote], counter: int) -> Tuple[str, int]:
-    result = ""
-    note_type = tap.note_type
-    if note_type in [NoteType.tap, NoteType.break_tap, NoteType.ex_tap]:
-        # Regular, break, and ex tap note
-        if note_type == NoteType.break_tap:
-            modifier_string = "b"
-        elif note_type == NoteType.ex_tap:
-            modifier_string = "x"
-        else:
-            modifier_string = ""
+# Modifier strings of each note type, looked up instead of branching per note
+_TAP_MODIFIERS = {
+    NoteType.tap: "",
+    NoteType.break_tap: "b",
+    NoteType.ex_tap: "x",
+    # Adding $ would make a star note with no slides
+    NoteType.star: "$",
+    NoteType.break_star: "b$",
+    NoteType.ex_star: "x$",
+}
+_STAR_TYPES = {NoteType.star, NoteType.break_star, NoteType.ex_star}
+# Modifier of a slide's first star, from the tap at its position
+_SLIDE_MODIFIERS = {
+    NoteType.break_star: "b",
+    NoteType.ex_star: "x",
+}
+
+
+def handle_tap(
+    tap: TapNote,
+    slides: List[SlideNote],
+    counter: int,
+    slide_positions: Optional[Set[int]] = None,
+) -> Tuple[str, int]:
+    """Converts a tap or star note to simai. Stars with slides at their
+    position are skipped since handle_slide writes them.
 
-        if counter > 0:
-            result += "/"
+    Args:
+        tap: The tap or star note.
+        slides: Slides that start at the same measure.
+        counter: Number of notes written so far at this measure.
+        slide_positions: Starting positions of slides, if already known.
+            slides is ignored when given.
+    """
+    note_type = tap.note_type
+    if note_type in _STAR_TYPES:
+        if slide_positions is None:
+            slide_positions = {slide.position for slide in slides}
 
-        result += "{}{}".format(tap.position + 1, modifier_string)
-    elif note_type in [NoteType.star, NoteType.break_star, NoteType.ex_star]:
-        produced_slides = [slide for slide in slides if slide.position == tap.position]
-        if len(produced_slides) > 0:
+        if tap.position in slide_positions:
             return "", counter
 
-        # Adding $ would make a star note with no slides
-        if note_type == NoteType.break_star:
-            modifier_string = "b$"
-        elif note_type == NoteType.ex_star:
-            modifier_string = "x$"
-        else:
-            modifier_string = "$"
+    modifier_string = _TAP_MODIFIERS.get(note_type)
+    if modifier_string is None:
+        return "", counter + 1
 
-        if counter > 0:
-            result += "/"
-        result += "{}{}".format(tap.position + 1, modifier_string)
+    if counter > 0:
+        result = "/{}{}".format(tap.position + 1, modifier_string)
+    else:
+        result = "{}{}".format(tap.position + 1, modifier_string)
 
-    counter += 1
-    return result, counter
+    return result, counter + 1
 
 
 def handle_hold(hold: HoldNote, counter: int, max_den: int = 1000) -> Tuple[str, int]:
     result = ""
-    frac = Fraction(hold.duration).limit_denominator(max_den * 2)
+    frac = limit_fraction(hold.duration, max_den * 2)
     if hold.note_type == NoteType.ex_hold:
         modifier_string = "hx"
     else:
@@ -187,7 +462,7 @@ def handle_touch_hold(
     touch: TouchHoldNote, counter: int, max_den: int = 1000
 ) -> Tuple[str, int]:
     result = ""
-    frac = Fraction(touch.duration).limit_denominator(max_den * 2)
+    frac = limit_fraction(touch.duration, max_den * 2)
     if touch.is_firework:
         modifier_string = "hf"
     else:
@@ -207,37 +482,53 @@ def handle_touch_hold(
 def handle_slide(
     slide: SlideNote,
     taps: List[TapNote],
-    positions: List[int],
+    positions: Union[List[int], Set[int]],
     bpm: float,
     counter: int,
     max_den: int = 1000,
+    stars: Optional[Dict[int, TapNote]] = None,
 ) -> Tuple[str, int]:
+    """Converts a slide to simai. The first slide at a position carries its
+    star. Later ones are chained to it with "*".
+
+    Args:
+        slide: The slide note.
+        taps: Taps and stars that start at the same measure.
+        positions: Positions that already have a slide written. The slide's
+            position is added to it.
+        bpm: The BPM at the slide's measure.
+        counter: Number of notes written so far at this measure.
+        max_den: The maximum denominator of the slide's duration.
+        stars: The first tap at each position, if already known. taps is
+            ignored when given.
+    """
     result = ""
-    stars = [star for star in taps if star.position == slide.position]
-    if counter > 0 and slide.position not in positions:
-        result += "/"
+    if slide.position in positions:
+        # Regular star
+        start_position = "*"
+        modifier_string = ""
+    else:
+        if counter > 0:
+            result += "/"
+
+        start_position = str(slide.position + 1)
+        if stars is None:
+            star = next((tap for tap in taps if tap.position == slide.position), None)
+        else:
+            star = stars.get(slide.position)
 
-    if slide.position not in positions:
-        if len(stars) == 0:
+        if star is None:
             # No star
             modifier_string = "?"
-        elif stars[0].note_type == NoteType.break_star:
-            modifier_string = "b"
-        elif stars[0].note_type == NoteType.ex_star:
-            # Ex star
-            modifier_string = "x"
         else:
-            modifier_string = ""
-    else:
-        # Regular star
-        modifier_string = ""
+            modifier_string = _SLIDE_MODIFIERS.get(star.note_type, "")
 
-    if slide.position in positions:
-        start_position = "*"
-    else:
-        start_position = str(slide.position + 1)
+        if isinstance(positions, set):
+            positions.add(slide.position)
+        else:
+            positions.append(slide.position)
 
-    pattern = slide_to_pattern_str(slide)
+    shape = slide_to_pattern_str(slide) + str(slide.end_position + 1)
     if slide.delay != 0.25:
         if slide.delay > 0.0025:
             scale = 0.25 / slide.delay
@@ -249,34 +540,32 @@ def handle_slide(
 
         equivalent_bpm = round(bpm * scale * 10000.0) / 10000.0
         equivalent_duration = slide.duration * scale
-        frac = Fraction(equivalent_duration).limit_denominator(max_den * 10)
-        result += "{}{}{}{}[{:.2f}#{}:{}]".format(
+        frac = limit_fraction(equivalent_duration, max_den * 10)
+        result += "{}{}{}[{:.2f}#{}:{}]".format(
             start_position,
             modifier_string,
-            pattern,
-            slide.end_position + 1,
+            shape,
             equivalent_bpm,
             frac.denominator,
             frac.numerator,
         )
     else:
-        frac = Fraction(slide.duration).limit_denominator(max_den * 10)
-        result += "{}{}{}{}[{}:{}]".format(
+        frac = limit_fraction(slide.duration, max_den * 10)
+        result += "{}{}{}[{}:{}]".format(
             start_position,
             modifier_string,
-            pattern,
-            slide.end_position + 1,
+            shape,
             frac.denominator,
             frac.numerator,
         )
 
-    if slide.position not in positions:
-        positions.append(slide.position)
-
     counter += 1
     return result, counter
 
 
+_EVENT_CLASSES = (BPM, TapNote, HoldNote, TouchTapNote, TouchHoldNote, SlideNote)
+
+
 def convert_to_fragment(
     events: List[Union[TapNote, HoldNote, SlideNote, TouchTapNote, TouchHoldNote, BPM]],
     current_bpm: float,
@@ -284,12 +573,19 @@ def convert_to_fragment(
     max_den: int = 1000,
 ) -> str:
     # Accepts a list of events that starts at the same measure
-    bpms = [bpm for bpm in events if isinstance(bpm, BPM)]
-    tap_notes = [note for note in events if isinstance(note, TapNote)]
-    hold_notes = [note for note in events if isinstance(note, HoldNote)]
-    touch_tap_notes = [note for note in events if isinstance(note, TouchTapNote)]
-    touch_hold_notes = [note for note in events if isinstance(note, TouchHoldNote)]
-    slide_notes = [note for note in events if isinstance(note, SlideNote)]
+    # Events are split by class in one pass
+    by_class: Dict[type, list] = {cls: [] for cls in _EVENT_CLASSES}
+    for event in events:
+        bucket = by_class.get(type(event))
+        if bucket is None:
+            cls = next(cls for cls in _EVENT_CLASSES if isinstance(event, cls))
+            bucket = by_class[cls]
+
+        bucket.append(event)
+
+    bpms = by_class[BPM]
+    tap_notes = by_class[TapNote]
+    slide_notes = by_class[SlideNote]
     slide_notes.sort(
         key=lambda sn: (
             sn.position,
@@ -298,82 +594,101 @@ def convert_to_fragment(
         )
     )
 
-    fragment = ""
+    # Stars and slides by position, so each note is matched in constant time
+    slide_positions = {slide.position for slide in slide_notes}
+    stars: Dict[int, TapNote] = {}
+    for tap_note in tap_notes:
+        stars.setdefault(tap_note.position, tap_note)
+
+    fragment: List[str] = []
     counter = 0
     if len(bpms) != 0:
-        fragment += "({})".format(bpms[0].bpm)
+        fragment.append("({})".format(bpms[0].bpm))
 
     if divisor is not None:
-        fragment += f"{{{divisor}}}"
+        fragment.append(f"{{{divisor}}}")
 
     for tap_note in tap_notes:
-        result = handle_tap(tap_note, slide_notes, counter)
-        fragment += result[0]
+        result = handle_tap(tap_note, slide_notes, counter, slide_positions)
+        fragment.append(result[0])
         counter = result[1]
 
-    for hold_note in hold_notes:
+    for hold_note in by_class[HoldNote]:
         result = handle_hold(hold_note, counter, max_den=max_den)
-        fragment += result[0]
+        fragment.append(result[0])
         counter = result[1]
 
-    for touch_tap_note in touch_tap_notes:
+    for touch_tap_note in by_class[TouchTapNote]:
         result = handle_touch_tap(touch_tap_note, counter)
-        fragment += result[0]
+        fragment.append(result[0])
         counter = result[1]
 
-    for touch_hold_note in touch_hold_notes:
+    for touch_hold_note in by_class[TouchHoldNote]:
         result = handle_touch_hold(touch_hold_note, counter, max_den=max_den)
-        fragment += result[0]
+        fragment.append(result[0])
         counter = result[1]
 
-    positions: List[int] = []
+    positions: Set[int] = set()
     for slide_note in slide_notes:
         result = handle_slide(
-            slide_note, tap_notes, positions, current_bpm, counter, max_den=max_den
+            slide_note,
+            tap_notes,
+            positions,
+            current_bpm,
+            counter,
+            max_den=max_den,
+            stars=stars,
         )
-        fragment += result[0]
+        fragment.append(result[0])
         counter = result[1]
 
-    return fragment
-
+    return "".join(fragment)
 
-def _parse_init(event):
-    global ABORT
-    ABORT = event
 
+def parallel_parse_fragments(
+    fragments: List[str], workers: Optional[int] = None
+) -> List[List[SimaiEvent]]:
+    """Parses a list of simai fragments and returns their events in order.
 
-def _parse_helper(fragment: str) -> List:
-    global ABORT
-    # Return an empty list when ABORT is set or the fragments is empty or "E"
-    if ABORT.is_set() or len(fragment) == 0 or fragment == "E":
-        return []
-
-    try:
-        parsed = parse_fragment(fragment)
-    except Exception as e:
-        # Abort all jobs
-        ABORT.set()
-        raise RuntimeError(f"Error parsing fragment {fragment}") from e
+    Args:
+        fragments: Simai fragments. Empty fragments and "E" produce no events.
+        workers: Number of worker processes. Defaults to the number of CPUs.
+            0 parses serially in the current process.
 
-    return parsed
+    Returns:
+        The event tuples of each fragment. See simai_events for their layout.
+    """
+    return get_executor(workers).parse(fragments)
 
 
-def parallel_parse_fragments(fragments: List[str]) -> list:
-    _abort = Event()
+def iter_parse_fragments(
+    fragments: Iterable[str], workers: Optional[int] = None
+) -> Iterator[List[SimaiEvent]]:
+    """Parses simai fragments and yields their events in order as they are
+    parsed, keeping a bounded number of fragments in flight.
 
-    cpu_count = os.cpu_count()
-    if cpu_count is None:
-        cpu_count = 1
+    Args:
+        fragments: Simai fragments. Empty fragments and "E" produce no events.
+        workers: Number of worker processes. Defaults to the number of CPUs.
+            0 parses serially in the current process.
+    """
+    return get_executor(workers).iter_parse(fragments)
 
-    chunksize = 1 + len(fragments) // cpu_count
 
-    # Stop jobs when abort is set
-    def fragment_iter():
-        for fragment in fragments:
-            if not _abort.is_set():
-                yield fragment
+def parallel_parse_charts(
+    charts: List[List[str]], workers: Optional[int] = None, schedule: str = "hybrid"
+) -> List[List[List[SimaiEvent]]]:
+    """Parses the fragments of several charts on one executor and returns
+    the events of each chart in order.
 
-    with Pool(processes=cpu_count, initializer=_parse_init, initargs=(_abort,)) as pool:
-        result = pool.map(_parse_helper, fragment_iter(), chunksize)
+    Args:
+        charts: A list of simai fragments for each chart.
+        workers: Number of worker processes. Defaults to the number of CPUs.
+            0 parses serially in the current process.
+        schedule: "fragment", "chart", or "hybrid". See ParseExecutor.parse_charts.
 
-    return result
+    Returns:
+        The event tuples of each fragment of each chart. See simai_events
+        for their layout.
+    """
+    return get_executor(workers).parse_charts(charts, schedule)
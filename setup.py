@@ -1,4 +1,82 @@
-from setuptools import setup
+import hashlib
+import os
+
+from setuptools import setup, Command
+from setuptools.command.build_py import build_py
+
+# Parsers generated from the bundled grammars. They hold Lark's serialized
+# parse tables, so loading one at runtime doesn't load its grammar.
+GENERATED_PARSERS = {
+    "simai.lark": "simai_lark_parser.py",
+    "simai_fragment.lark": "simai_fragment_lark_parser.py",
+}
+SIMAI_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "maiconverter", "simai"
+)
+GENERATED_PARSER_TEMPLATE = """# Generated by "python setup.py build_parsers" from {grammar}. Do not edit.
+from lark import Lark
+
+GRAMMAR_SHA256 = {digest!r}
+LARK_VERSION = {lark_version!r}
+DATA = {data!r}
+MEMO = {memo!r}
+
+
+def load_parser(**options) -> Lark:
+    return Lark._load_from_dict(DATA, MEMO, **options)
+"""
+
+
+class BuildParsers(Command):
+    description = "generate the parsers of the simai grammars"
+    user_options = [
+        ("inplace", "i", "write the parsers to the source tree"),
+    ]
+    boolean_options = ["inplace"]
+
+    def initialize_options(self):
+        self.inplace = False
+        self.build_lib = None
+
+    def finalize_options(self):
+        self.set_undefined_options("build_py", ("build_lib", "build_lib"))
+
+    def run(self):
+        from lark import Lark, __version__ as lark_version
+        from lark.grammar import Rule
+        from lark.lexer import TerminalDef
+
+        if self.inplace:
+            out_dir = SIMAI_DIR
+        else:
+            out_dir = os.path.join(self.build_lib, "maiconverter", "simai")
+        os.makedirs(out_dir, exist_ok=True)
+
+        for grammar, module in GENERATED_PARSERS.items():
+            grammar_path = os.path.join(SIMAI_DIR, grammar)
+            with open(grammar_path, "rb") as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+
+            # Same options as get_parser in simai_parser.py
+            parser = Lark.open(grammar_path, parser="lalr")
+            data, memo = parser.memo_serialize([TerminalDef, Rule])
+            with open(os.path.join(out_dir, module), "w", encoding="utf-8") as out:
+                out.write(
+                    GENERATED_PARSER_TEMPLATE.format(
+                        grammar=grammar,
+                        digest=digest,
+                        lark_version=lark_version,
+                        data=data,
+                        memo=memo,
+                    )
+                )
+
+
+class BuildPy(build_py):
+    def run(self):
+        super().run()
+        self.run_command("build_parsers")
+
 
 with open("README.md") as f:
     long_description = f.read()
@@ -36,6 +114,7 @@ setup(
     entry_points={
         "console_scripts": ["maiconverter=maiconverter.cli:main"],
     },
+    cmdclass={"build_parsers": BuildParsers, "build_py": BuildPy},
     python_requires=">=3.7",
     use_scm_version=True,
     setup_requires=["setuptools_scm"],
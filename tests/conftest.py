@@ -0,0 +1,11 @@
+import pytest
+
+
+def _note_key(note):
+    return type(note).__name__, sorted(vars(note).items(), key=str)
+
+
+@pytest.fixture
+def note_key():
+    """Compares notes by type and attributes, since notes have no __eq__."""
+    return _note_key
@@ -0,0 +1,54 @@
+import csv
+import io
+import json
+
+import pytest
+
+from maiconverter.simai import iter_catalog, read_metadata, write_catalog
+
+MAIDATA = (
+    "\ufeff&title=Song\n&artist=Someone\n&wholebpm=150\n&first=1.5\n"
+    "&lv_4=9\n&lv_5=12+\n&inote_4=(150){4}1,2,\nE\n&inote_5=\n&inote_6=(150)1,\nE\n"
+)
+
+
+def test_read_metadata():
+    metadata = read_metadata(MAIDATA, "maidata.txt")
+    assert metadata.title == "Song"
+    assert metadata.artist == "Someone"
+    assert metadata.wholebpm == 150
+    assert metadata.first == 1.5
+    assert metadata.levels == {4: "9", 5: "12+"}
+    assert metadata.charts == (4, 6)
+    assert metadata.error is None
+
+
+def test_catalog(tmp_path):
+    for name in ["b", "a"]:
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "maidata.txt").write_text(
+            MAIDATA.replace("Song", name), encoding="utf-8"
+        )
+    (tmp_path / "c").mkdir()
+    (tmp_path / "c" / "Maidata.txt").write_bytes(b"&title=\xff\n")
+
+    records = list(iter_catalog(str(tmp_path), workers=0))
+    assert [record.title for record in records] == ["a", "b", ""]
+    assert records[2].error.startswith("UnicodeDecodeError")
+
+    out = io.StringIO()
+    assert write_catalog(records, out) == 3
+    lines = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert lines[0]["levels"] == {"4": "9", "5": "12+"}
+    assert lines[0]["charts"] == [4, 6]
+    # Records without levels or charts share immutable defaults
+    assert lines[2]["levels"] == {} and lines[2]["charts"] == []
+    with pytest.raises(TypeError):
+        records[2].levels[1] = "1"
+
+    out = io.StringIO(newline="")
+    write_catalog(records, out, format="csv")
+    rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+    assert rows[1]["title"] == "b"
+    assert rows[1]["lv_5"] == "12+"
+    assert rows[1]["charts"] == "4 6"
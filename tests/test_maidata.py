@@ -0,0 +1,84 @@
+import argparse
+import io
+
+import pytest
+
+from maiconverter.cli import handle_ma2_song, ma2_difficulties
+from maiconverter.maima2 import MaiMa2
+from maiconverter.simai import MaiData, SimaiChart, parse_file_str
+
+
+def chart(position):
+    simai = SimaiChart()
+    simai.set_bpm(0, 150)
+    simai.add_tap(1, position)
+    simai.add_hold(1.5, position + 1, 0.5)
+    return simai
+
+
+def test_export():
+    maidata = MaiData("Title", "Artist")
+    maidata.add_chart(5, chart(0), level="13")
+    maidata.add_chart(6, chart(2), level="14+")
+    with pytest.raises(ValueError):
+        maidata.add_chart(5, chart(4))
+
+    text = maidata.export(workers=0)
+    assert text.startswith("&title=Title\n&artist=Artist\n&lv_5=13\n&lv_6=14+\n")
+    assert maidata.export(workers=2) == text
+
+    out = io.StringIO()
+    maidata.export_to(out, workers=0, mode="compact")
+    assert out.getvalue() == maidata.export(workers=0, mode="compact")
+
+    title, charts = parse_file_str(text, workers=0)
+    assert title == "Title"
+    assert [difficulty for difficulty, _ in charts] == [5, 6]
+    assert [note.position for note in charts[1][1].notes] == [2, 3]
+
+
+def test_save(tmp_path):
+    path = tmp_path / "maidata.txt"
+    path.write_text("old", encoding="utf-8")
+
+    maidata = MaiData("Title")
+    maidata.add_chart(5, chart(0))
+    # A chart without BPMs fails to export after the first one is written
+    maidata.add_chart(6, SimaiChart().add_tap(1, 0))
+    with pytest.raises(ValueError):
+        maidata.save(str(path), workers=0)
+    assert path.read_text(encoding="utf-8") == "old"
+    assert [p.name for p in tmp_path.iterdir()] == ["maidata.txt"]
+
+    maidata.charts.pop()
+    maidata.save(str(path), workers=0)
+    assert path.read_bytes() == maidata.export(workers=0).replace("\n", "\r\n").encode()
+
+
+def test_ma2_song(tmp_path):
+    ma2 = MaiMa2()
+    ma2.set_bpm(0, 150).set_meter(0, 4, 4)
+    ma2.add_tap(1, 0)
+    # "extra" sorts first but must not take the number of song_00
+    for name in ["extra", "song_00", "song_01"]:
+        (tmp_path / f"{name}.ma2").write_text(ma2.export(), encoding="utf-8")
+
+    args = argparse.Namespace(
+        path=str(tmp_path),
+        encoding="utf-8",
+        delay="",
+        parse_workers=0,
+        max_divisor=1000,
+        compact=False,
+    )
+    files = [str(path) for path in tmp_path.iterdir()]
+    handle_ma2_song(files, str(tmp_path), args)
+    text = (tmp_path / "maidata.txt").read_text(encoding="utf-8")
+    assert [
+        line[: line.index("=")] for line in text.split("\n") if "inote" in line
+    ] == [
+        "&inote_2",
+        "&inote_3",
+        "&inote_4",
+    ]
+    assert ma2_difficulties(["a", "b_00", "c", "d_01", "e_03"]) == [4, 2, 6, 3, 5]
@@ -0,0 +1,197 @@
+import csv
+import io
+import json
+import os
+import random
+
+import pytest
+
+from maiconverter.event import TICKS_PER_MEASURE, measure_to_tick
+from maiconverter.maima2 import (
+    MaiMa2,
+    TapNote,
+    HoldNote,
+    SlideNote,
+    TouchTapNote,
+    iter_probe,
+    write_probes,
+)
+from maiconverter.maima2 import probe as ma2_probe
+from maiconverter.maima2.tools import load_v1
+
+MA2 = (
+    "VERSION\t0.00.00\t1.03.00\nFES_MODE\t1\nBPM_DEF\t150.000\t150.000\t150.000\t150.000\n"
+    "MET_DEF\t4\t4\nRESOLUTION\t384\nCLK_DEF\t384\nCOMPATIBLE_CODE\tMA2\n\n"
+    "BPM\t0\t0\t150.000\nBPM\t2\t192\t180.000\nMET\t0\t0\t4\t4\n\n"
+    "TAP\t1\t0\t3\nBRK\t1\t96\t4\nXTP\t1\t96\t5\nSTR\t1\t192\t0\nBST\t1\t192\t1\n"
+    "XST\t1\t288\t2\nHLD\t2\t0\t4\t192\nXHO\t2\t0\t5\t96\nSI_\t1\t192\t0\t96\t192\t4\n"
+    "SCL\t1\t192\t1\t96\t384\t5\nTTP\t2\t96\t0\tC\t1\tM1\nTTP\t2\t96\t3\tB\t0\n"
+    "THO\t3\t0\t0\t384\tC\t1\tL1\n\nT_REC_TAP\t1\nT_REC_ALL\t13\nTTM_RAT_ACV\t10000\n"
+)
+
+
+def test_load_v1(note_key):
+    expected = MaiMa2()
+    for line in MA2.splitlines():
+        if line != "":
+            expected.parse_line(line)
+
+    # Tiny blocks split most lines between reads
+    for block_size in [7, 1 << 20]:
+        ma2 = MaiMa2()
+        load_v1(ma2, io.StringIO(MA2), block_size=block_size)
+        assert [note_key(note) for note in ma2.notes] == [
+            note_key(note) for note in expected.notes
+        ]
+        assert [vars(bpm) for bpm in ma2.bpms] == [vars(bpm) for bpm in expected.bpms]
+        assert ma2.notes_stat == expected.notes_stat
+        assert ma2.fes_mode and ma2.version == expected.version
+
+    with pytest.raises(ValueError):
+        load_v1(MaiMa2(), io.StringIO("VERSION\t0.00.00\t1.00.00\nTAP\t1\t0\t3\n"))
+    with pytest.raises(ValueError):
+        load_v1(MaiMa2(), io.StringIO("SLL\t1\t0\t0\t96\t192\t0\n"))
+
+
+def test_read_tail():
+    # Summary lines come back in file order, whatever is read first
+    text = b"TAP\t1\t0\t3\n\nT_REC_TAP\t1\nT_REC_BRK\t2\nTTM_RAT_ACV\t3\n\n"
+    summary = ma2_probe._read_tail(io.BytesIO(text), len(text), "utf-8")
+    assert list(summary.items()) == [
+        ("T_REC_TAP", 1),
+        ("T_REC_BRK", 2),
+        ("TTM_RAT_ACV", 3),
+    ]
+
+
+def test_probe(tmp_path, monkeypatch):
+    ma2 = MaiMa2(fes_mode=True)
+    ma2.set_bpm(0, 150).set_meter(0, 4, 4)
+    for i in range(200):
+        ma2.add_tap(1 + i / 4, i % 8, is_break=i % 5 == 0)
+    ma2.add_hold(60, 3, 0.5)
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "chart.MA2").write_text(ma2.export(), encoding="utf-8")
+    (tmp_path / "b.ma2").write_bytes(b"VERSION\t0.00.00\t1.03.00\nT_REC_ALL\tx\n")
+
+    # A tiny tail has to be read further back to find the whole summary
+    monkeypatch.setattr(ma2_probe, "PROBE_TAIL", 16)
+    records = list(iter_probe(str(tmp_path), workers=0))
+    assert [os.path.basename(record.path) for record in records] == [
+        "chart.MA2",
+        "b.ma2",
+    ]
+
+    record = records[0]
+    assert record == MaiMa2.probe(record.path)
+    assert record.version == ("0.00.00", "1.03.00")
+    assert record.fes_mode
+    assert record.bpm_def == (150, 150, 150, 150)
+    assert record.met_def == (4, 4)
+    assert record.resolution == 384
+    assert list(record.summary) == ma2_probe.SUMMARY_KEYS
+    assert record.summary["T_REC_BRK"] == 40
+    assert record.summary["T_REC_ALL"] == 201
+    assert records[1].error.startswith("ValueError")
+    assert records[1].bpm_def == () and records[1].summary == {}
+
+    out = io.StringIO()
+    assert write_probes(records, out) == 2
+    assert json.loads(out.getvalue().splitlines()[1])["summary"] == {}
+
+    out = io.StringIO(newline="")
+    assert write_probes(records, out, format="csv") == 2
+    rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+    assert rows[0]["T_NUM_HLD"] == "1"
+    assert rows[0]["bpm_def"] == "150.0 150.0 150.0 150.0"
+
+
+def test_ticks():
+    ma2 = MaiMa2()
+    ma2.set_bpm(0, 150).set_meter(0, 4, 4)
+    # 1/3 and 1/7 of a measure aren't exact floats but are exact ticks
+    ma2.add_tap(1 + 1 / 3, 2).add_tap(4 / 3, 2, is_break=True)
+    ma2.add_tap(2 + 1 / 7, 5).add_hold(3 + 17 / 1920, 0, 0.5)
+    tap = ma2.notes[0]
+    assert tap.tick == TICKS_PER_MEASURE + TICKS_PER_MEASURE // 3
+    assert tap == TapNote(4 / 3, 2)
+    assert hash(tap) == hash(TapNote(4 / 3, 2))
+    assert len({tap, TapNote(4 / 3, 2)}) == 1
+
+    # A 1920 resolution export loads back on the same ticks
+    loaded = MaiMa2()
+    load_v1(loaded, io.StringIO(ma2.export(resolution=1920)))
+    assert loaded.resolution == 1920
+    hold = [note for note in loaded.notes if isinstance(note, HoldNote)][0]
+    assert hold.tick == measure_to_tick(3 + 17 / 1920)
+
+    # Deleting matches ticks exactly, both taps are on the same one
+    ma2.del_tap(4 / 3 + 1e-9, 2)
+    assert len(ma2.notes) == 2
+    ma2.offset(1 / 7)
+    assert [note.tick for note in ma2.notes] == [
+        measure_to_tick(2 + 2 / 7),
+        measure_to_tick(3 + 17 / 1920) + TICKS_PER_MEASURE // 7,
+    ]
+
+
+def test_note_index():
+    rng = random.Random(0)
+    ma2 = MaiMa2()
+    expected = []
+    for _ in range(2000):
+        measure = rng.randrange(64) / 8
+        position = rng.randrange(4)
+        kind = rng.randrange(3)
+        if kind == 0:
+            ma2.add_tap(measure, position, is_break=rng.random() < 0.5)
+            expected.append((TapNote, measure, position))
+        elif kind == 1:
+            ma2.add_slide(measure, position, (position + 4) % 8, 0.25, 1)
+            expected.append((SlideNote, measure, position))
+        else:
+            ma2.add_touch_tap(measure, position, "B")
+            expected.append((TouchTapNote, measure, position))
+
+        if rng.random() < 0.3:
+            kind, measure, position = rng.choice(expected)
+            if kind is TapNote:
+                ma2.del_tap(measure, position)
+            elif kind is SlideNote:
+                ma2.del_slide(measure, position, (position + 4) % 8)
+            else:
+                ma2.del_touch_tap(measure, position, "B")
+            expected = [x for x in expected if x != (kind, measure, position)]
+
+    def key(note):
+        return type(note), note.measure, note.position
+
+    assert sorted(map(key, ma2.notes), key=str) == sorted(expected, key=str)
+    assert sum(ma2.notes_stat.values()) == len(expected)
+    assert [key(note) for note in ma2.notes_between(2, 3.5, kinds=[SlideNote])] == [
+        key(note)
+        for note in sorted(ma2.notes, key=lambda x: x.tick)
+        if isinstance(note, SlideNote) and 2 <= note.measure < 3.5
+    ]
+
+    # Deleting updates lists that were taken from notes before
+    notes = ma2.notes
+    tap = next(note for note in notes if isinstance(note, TapNote))
+    ma2.del_tap(tap.measure, tap.position)
+    assert all(note is not tap for note in notes)
+    assert notes is ma2.notes
+
+    # Still deletes the right notes after the list is reordered
+    ma2.notes.reverse()
+    tap = next(note for note in notes if isinstance(note, TapNote))
+    count = len(notes)
+    ma2.del_tap(tap.measure, tap.position)
+    assert len(notes) < count and all(note is not tap for note in notes)
+
+    # Notes changed through the list are indexed again
+    ma2.notes.append(TapNote(20, 1))
+    assert len(ma2.notes_between(20, 21)) == 1
+    ma2.offset(1)
+    assert len(ma2.notes_between(21, 22)) == 1
+    ma2.notes = []
+    assert ma2.notes_between(0, 100) == []
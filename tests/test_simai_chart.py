@@ -0,0 +1,246 @@
+import io
+from fractions import Fraction
+
+import pytest
+
+from maiconverter.event import TICKS_PER_MEASURE, measure_to_tick
+from maiconverter.simai import (
+    BPM,
+    SimaiChart,
+    LazySimaiChart,
+    SimaiEditSession,
+    SlideNote,
+    TapNote,
+    convert_to_fragment,
+    handle_slide,
+    handle_tap,
+)
+from maiconverter.simai.tools import get_compact_rests, snap_measure
+
+CHART = (
+    "(150){4}1-5[8:1]*V35[4:1]/`2-6[4:1],`3bx/`4h[4:1],{8}1?-5[160#4:1]*<7,"
+    "C1f/`B3h[4:1],(180)5$,6!-2[2:1],E1hf[4:1],1-5[90#4:1](200),{1},,"
+    "{16}" + "1,2/3,4h[8:1],,B2,5bx,`6`7," * 8 + "{4}1-5[4:1],,,,E"
+)
+
+
+def test_lazy_chart(capsys, note_key):
+    full = SimaiChart.from_str(CHART, workers=0)
+
+    lazy = LazySimaiChart.from_str(CHART, "Scanning...", workers=0)
+    assert capsys.readouterr().out.endswith("Scanning...Done\n")
+    assert [vars(bpm) for bpm in lazy.bpms] == [vars(bpm) for bpm in full.bpms]
+    assert lazy.parsed_measures() == []
+
+    expected = [note_key(note) for note in full.notes if 4 <= note.measure < 5]
+    assert len(expected) != 0
+    assert [note_key(note) for note in lazy.notes_in(4, 5)] == expected
+    assert 1 not in lazy.parsed_measures()
+
+    assert [note_key(note) for note in lazy.notes] == [
+        note_key(note) for note in full.notes
+    ]
+    assert lazy.export() == full.export()
+
+    # A BPM change on every fragment, slides use the BPMs before them
+    text = "(150){8}1," + ",".join(
+        f"({75 * (i % 4 + 1)}){i % 8 + 1}-{(i + 3) % 8 + 1}[{150 * (i % 3 + 1)}#8:1]"
+        for i in range(200)
+    )
+    full = SimaiChart.from_str(text, workers=0)
+    lazy = LazySimaiChart.from_str(text, workers=0)
+    assert [note_key(note) for note in lazy.notes_in(10, 12)] == [
+        note_key(note) for note in full.notes if 10 <= note.measure < 12
+    ]
+
+
+def test_export():
+    simai = SimaiChart()
+    simai.set_bpm(0, 150)
+    simai.set_bpm(3, 180)
+    simai.add_tap(1, 0)
+    simai.add_tap(1.25, 1, is_break=True)
+    simai.add_hold(1.5, 2, 0.25)
+    simai.add_slide(2, 3, 7, 1.25, "-")
+    simai.add_tap(2, 3, is_star=True)
+    simai.add_touch_tap(2 + 1 / 3, 0, "C")
+    simai.add_tap(3.125, 4)
+    simai.add_hold(4, 5, 2.5)
+
+    assert simai.export() == (
+        "\n(150){1},\n{4}1,2b,3h[4:1],,\n{3}4-8[4:5],C1,,\n(180){8},5,,,,,,,\n"
+        "{2}6h[2:5],{1},,,\nE\n"
+    )
+
+
+def test_export_snaps_to_grid():
+    # Measures of converted charts are rounded to 4 decimal places
+    simai = SimaiChart()
+    simai.set_bpm(0, 120)
+    for tick in range(0, 384 * 2, 16):
+        simai.add_tap(round(1 + tick / 384, 4), tick % 8)
+
+    lines = simai.export().splitlines()
+    assert lines[2].startswith("{24}1,")
+    assert lines[3].startswith("{24}1,")
+    # Equal gaps always give the same divisors
+    assert lines[2].replace("{24}", "") == lines[3].replace("{24}", "")
+
+
+def test_snap_measure():
+    assert snap_measure(2.3333) == Fraction(7, 3)
+    assert snap_measure(7350.6562) == Fraction(7350 * 32 + 21, 32)
+    assert snap_measure(1.1068) == 1 + Fraction(41, 384)
+    assert snap_measure(0.1234567, max_den=100) == Fraction(10, 81)
+
+
+def test_export_to():
+    simai = SimaiChart.from_str(CHART, workers=0)
+    text = simai.export()
+
+    out = io.StringIO()
+    simai.export_to(out)
+    assert out.getvalue() == text
+
+    lines = list(simai.iter_export())
+    assert "".join(lines) == text
+    assert len(lines) > 1
+    assert all(line.startswith("\n") for line in lines)
+
+
+def test_convert_to_fragment():
+    events = [
+        SlideNote(1, 4, 0, 0.5, "-"),
+        TapNote(1, 0, is_star=True, is_break=True),
+        SlideNote(1, 0, 4, 0.5, "-"),
+        TapNote(1, 2, is_star=True),
+        SlideNote(1, 0, 2, 0.25, "V", reflect_position=6),
+        TapNote(1, 6),
+    ]
+    assert convert_to_fragment(events, 120.0) == "3$/7/1bV73[4:1]*-5[2:1]/5?-1[2:1]"
+
+    # Lists still work when called directly
+    slides = [note for note in events if isinstance(note, SlideNote)]
+    taps = [note for note in events if isinstance(note, TapNote)]
+    assert handle_tap(taps[0], slides, 0) == ("", 0)
+    positions = []
+    assert handle_slide(slides[0], taps, positions, 120.0, 1) == ("/5?-1[2:1]", 2)
+    assert positions == [4]
+
+
+def test_export_compact(note_key):
+    simai = SimaiChart.from_str(CHART, workers=0)
+    # Touch holds are exported without a position, so keep them out
+    simai.notes = [
+        note for note in simai.notes if type(note).__name__ != "TouchHoldNote"
+    ]
+    default = simai.export()
+    compact = simai.export(mode="compact")
+    assert len(compact) < len(default)
+
+    expected = SimaiChart.from_str(default, workers=0)
+    result = SimaiChart.from_str(compact, workers=0)
+    assert [note_key(note) for note in result.notes] == [
+        note_key(note) for note in expected.notes
+    ]
+
+    with pytest.raises(ValueError):
+        simai.export(mode="smallest")
+
+
+def test_get_compact_rests():
+    # 1/3, 1/3, 1/3, then 2.25 measures to the end
+    rests = get_compact_rests([128, 128, 128, 864], 384)
+    assert rests == [(0, 3, 1), (0, 3, 1), (0, 3, 1), (2, 4, 1)]
+    # Staying at {8} is cheaper than switching to {4} and back
+    rests = get_compact_rests([48, 96, 48, 48], 384)
+    assert rests == [(0, 8, 1), (0, 8, 2), (0, 8, 1), (0, 8, 1)]
+
+
+def test_tempo_map():
+    simai = SimaiChart()
+    simai.set_bpm(12, 250)
+    simai.set_bpm(0, 180)
+    simai.set_bpm(6.5, 200)
+    simai.set_bpm(12.00005, 300)
+    assert [bpm.bpm for bpm in simai.bpms] == [180, 200, 300]
+
+    measures = [0, 1, 6.49995, 6.5, 11.99, 12, 12.0001, 30]
+    expected = [180, 180, 200, 200, 200, 300, 300, 300]
+    assert [simai.get_bpm(measure) for measure in measures] == expected
+    assert simai.get_bpms(measures) == expected
+
+    simai.del_bpm(6.5)
+    assert simai.get_bpm(7) == 180
+    simai.bpms.append(BPM(3, 120))
+    assert simai.get_bpm(7) == 120
+    simai.offset(1.0)
+    assert simai.get_bpm(4.5) == 120
+    assert simai.get_bpm(3.5) == 180
+
+    simai.del_bpm(0)
+    with pytest.raises(ValueError):
+        simai.get_bpm(1)
+
+
+def test_edit_session(note_key):
+    def check(session, text):
+        full = SimaiChart.from_str(text, workers=0)
+        assert [note_key(note) for note in session.chart.notes] == [
+            note_key(note) for note in full.notes
+        ]
+        assert [vars(bpm) for bpm in session.chart.bpms] == [
+            vars(bpm) for bpm in full.bpms
+        ]
+
+    session = SimaiEditSession(CHART, workers=0)
+    check(session, CHART)
+
+    # Changing a note only touches its fragment
+    text = CHART.replace("5bx", "5b", 1)
+    assert session.update(text) == (1, 1)
+    check(session, text)
+
+    # A new divisor moves every note after it
+    text = text.replace("{16}", "{12}", 1)
+    update = session.update(text)
+    assert update.parsed == 1 and update.replayed > 1
+    check(session, text)
+
+    # Inserting a fragment then a BPM change
+    text = text.replace("6!-2[2:1],", "6!-2[2:1],7,", 1)
+    session.update(text)
+    check(session, text)
+    text = text.replace("{1},,", "{1},(100),", 1)
+    session.update(text)
+    check(session, text)
+
+    assert session.update(CHART).parsed != 0
+    check(session, CHART)
+    assert session.update(CHART) == (0, 0)
+
+
+def test_add_delete_off_float_grid():
+    # Neither time is exact as a float, adding and deleting must agree
+    for measure in [1 + 1 / 3, 2 + 31 / 48]:
+        simai = SimaiChart()
+        simai.set_bpm(0, 120)
+        simai.add_tap(measure, 0)
+        simai.add_hold(measure, 1, 0.5)
+        simai.add_slide(measure, 2, 6, 0.25, "-")
+        simai.add_touch_tap(measure, 0, "C")
+        simai.add_touch_hold(measure, 0, "C", 0.5)
+        assert all(note.tick == measure_to_tick(measure) for note in simai.notes)
+
+        simai.del_tap(measure, 0)
+        simai.del_hold(measure, 1)
+        simai.del_slide(measure, 2, 6)
+        simai.del_touch_tap(measure, 0, "C")
+        simai.del_touch_hold(measure, 0, "C")
+        assert simai.notes == []
+
+    # Parsed triplets are exactly on the tick grid, from measure 1
+    simai = SimaiChart.from_str("(120){3}1,2,3,{7}1,2,3,E", workers=0)
+    assert [note.tick for note in simai.notes] == [
+        TICKS_PER_MEASURE * n // 21 for n in [21, 28, 35, 42, 45, 48]
+    ]
@@ -0,0 +1,266 @@
+import os
+import random
+import sys
+
+import pytest
+
+from maiconverter.cli import parse_arg
+from maiconverter.simai.simai_events import (
+    TAP_EVENT,
+    HOLD_EVENT,
+    SLIDE_EVENT,
+    TOUCH_HOLD_EVENT,
+    BREAK,
+    EX,
+    TAPLESS,
+    CHAINED,
+    PSEUDO_EACH,
+    FIREWORK,
+)
+from maiconverter.simai import (
+    parse_fragment,
+    check_fragment_scanner,
+    scan_fragment,
+    iter_directives,
+    parse_file_str,
+    ParseExecutor,
+    get_executor,
+    get_parser,
+    get_fragment_parser,
+    FragmentTransformer,
+    fragment_cache,
+    profile_parsing,
+)
+
+
+def random_fragment(rng: random.Random) -> str:
+    def duration():
+        bpm = rng.choice(["", "", "120#", "160.5#"])
+        return f"[{bpm}{rng.choice([0, 1, 4, 8, 12])}:{rng.randint(0, 9)}]"
+
+    def note():
+        button = str(rng.randint(0, 8))
+        roll = rng.random()
+        if roll < 0.3:
+            return button + "".join(
+                rng.choice("hbex$") for _ in range(rng.randint(0, 2))
+            )
+        if roll < 0.6:
+            modifier = "".join(rng.choice("b@x?$!") for _ in range(rng.randint(0, 1)))
+            shape = rng.choice(
+                ["-", "^", "<", ">", "s", "z", "v", "w", "p", "pp", "qq", "V3"]
+            )
+            slide = button + modifier + shape + str(rng.randint(0, 8)) + duration()
+            for _ in range(rng.randint(0, 2)):
+                slide += "*" + rng.choice(["", "b", "e"]) + rng.choice(["-", "V7", "p"])
+                slide += str(rng.randint(1, 8)) + rng.choice(["", duration()])
+            return slide
+        if roll < 0.9:
+            region = rng.choice(["C", "C0", "C1", "C2", "B3", "E8", "A1", "D2", "B"])
+            return (
+                region + rng.choice(["", "f", "h", "hf"]) + rng.choice(["", duration()])
+            )
+        return "`" + note()
+
+    values = [note() for _ in range(rng.randint(1, 3))]
+    if rng.random() < 0.2:
+        values.insert(0, rng.choice(["(120)", "(1e2)", "(.5)", "{4}", "{0}", "{3.5}"]))
+    return rng.choice(["/", "", "//"]).join(values)
+
+
+def test_scanner_matches_lark():
+    fragments = [
+        "1",
+        "3b",
+        "2h[4:1]",
+        "1-5[8:1]",
+        "{16}",
+        "(180)",
+        "B3f",
+        "C",
+        "Chf[2:1]",
+        "12",
+        "1/2/3",
+        "1hx",
+        "1x$",
+        "`1`2`3",
+        "1-5[8:1]*-3[160#4:1]*>7",
+        "1V35[4:1]",
+        "1pp5[8:3]",
+        "1-5",
+        "1//2",
+        "1h-5[4:1]",
+    ]
+    rng = random.Random(0)
+    fragments += [random_fragment(rng) for _ in range(2000)]
+
+    assert check_fragment_scanner(fragments) > 0
+
+
+def test_scanner_handles_common_fragments():
+    for fragment in ["1", "3b", "2h[4:1]", "1-5[8:1]", "{16}", "(180)", "B3f", "`1`2"]:
+        assert scan_fragment(fragment) is not None
+        assert scan_fragment(fragment) == parse_fragment(fragment)
+
+
+def test_fragment_events():
+    assert scan_fragment("`1bx/2h[4:1]") == [
+        (TAP_EVENT, BREAK | EX | PSEUDO_EACH, 0),
+        (HOLD_EVENT, 0, 1, 0.25),
+    ]
+    assert scan_fragment("1?-5[8:1]*<7") == [
+        (SLIDE_EVENT, TAPLESS, 0, 4, "-", None, 0.125, None),
+        (SLIDE_EVENT, TAPLESS | CHAINED, 0, 6, "<", None, 0.125, None),
+    ]
+    assert scan_fragment("Chf[2:1]") == [(TOUCH_HOLD_EVENT, FIREWORK, "C", 0, 0.5)]
+
+
+MAIDATA = """\ufeff&title=Test Song
+&first=-0.5
+&inote_2=(120){4}1,2,
+3,4,
+||comment
+E
+&inote_5=(150){8}1/5,,,
+E
+"""
+
+
+def test_iter_directives():
+    directives = [
+        (key, MAIDATA[start:end]) for key, (start, end) in iter_directives(MAIDATA)
+    ]
+    assert [key for key, _ in directives] == ["title", "first", "inote_2", "inote_5"]
+    assert directives[0][1] == "Test Song\n"
+    assert directives[1][1] == "-0.5\n"
+    assert directives[3][1] == "(150){8}1/5,,,\nE\n"
+
+
+def test_parse_file_str_levels():
+    title, charts = parse_file_str(MAIDATA, workers=0)
+    assert title == "Test Song"
+    assert [num for num, _ in charts] == [2, 5]
+
+    _, lark_charts = parse_file_str(
+        MAIDATA.lstrip("\ufeff"), lark_file="simai.lark", workers=0
+    )
+    for (_, chart), (_, lark_chart) in zip(charts, lark_charts):
+        assert chart.export() == lark_chart.export()
+
+    _, charts = parse_file_str(MAIDATA, workers=0, levels=[5])
+    assert [num for num, _ in charts] == [5]
+    assert len(charts[0][1].notes) == 2
+
+
+def test_levels_argument(tmp_path, monkeypatch):
+    path = tmp_path / "maidata.txt"
+    path.write_text("&inote_2=1,E\n", encoding="utf-8")
+    # Chart numbers don't swallow the input path after them
+    argv = ["maiconverter", "simaifiletoma2", "--levels", "2,5", str(path)]
+    monkeypatch.setattr(sys, "argv", argv)
+    args = parse_arg()
+    assert args.levels == [2, 5]
+    assert args.path == str(path)
+
+
+def test_parse_charts_schedules():
+    rng = random.Random(6)
+    charts = [[random_fragment(rng) for _ in range(count)] for count in [5, 40, 20]]
+    # Keep only fragments that parse
+    charts = [[f for f in c if scan_fragment(f) is not None] for c in charts]
+    expected = [[scan_fragment(f) for f in c] for c in charts]
+
+    executor = ParseExecutor(workers=2, serial_threshold=0)
+    try:
+        for schedule in ["fragment", "chart", "hybrid"]:
+            assert executor.parse_charts(charts, schedule) == expected
+    finally:
+        executor.shutdown()
+
+
+def test_generated_fragment_parser_matches_lark():
+    pytest.importorskip("maiconverter.simai.simai_fragment_lark_parser")
+    lark_parser = get_parser("simai_fragment.lark", transformer=FragmentTransformer())
+    rng = random.Random(8)
+    for _ in range(1000):
+        fragment = random_fragment(rng)
+        try:
+            expected = lark_parser.parse(fragment)
+        except Exception:
+            expected = None
+
+        try:
+            events = get_fragment_parser().parse(fragment)
+        except Exception:
+            events = None
+
+        assert events == expected, fragment
+
+
+def test_iter_parse():
+    rng = random.Random(10)
+    fragments = [random_fragment(rng) for _ in range(600)]
+    fragments = [f for f in fragments if scan_fragment(f) is not None]
+    expected = [scan_fragment(f) for f in fragments]
+
+    executor = ParseExecutor(workers=2, serial_threshold=0)
+    try:
+        assert list(executor.iter_parse(fragments, max_in_flight=2)) == expected
+        with pytest.raises(RuntimeError):
+            list(executor.iter_parse(fragments + ["1-"] + fragments))
+        # The executor still works after an abort
+        assert list(executor.iter_parse(iter(fragments))) == expected
+    finally:
+        executor.shutdown()
+
+
+def test_get_executor():
+    # The default number of workers shares the executor of the CPU count
+    assert get_executor() is get_executor(os.cpu_count() or 1)
+    assert get_executor(0) is not get_executor()
+
+
+def test_fragment_cache_counts():
+    fragment_cache.clear()
+    executor = ParseExecutor(workers=0)
+    executor.parse(["1", "2", "1", "1"])
+    info = fragment_cache.info()
+    # Repeats within one list don't count as cache hits
+    assert (info.hits, info.misses, info.deduplicated) == (0, 2, 2)
+
+    executor.parse(["2", "1"])
+    info = fragment_cache.info()
+    assert (info.hits, info.misses, info.deduplicated) == (2, 2, 2)
+    fragment_cache.clear()
+
+
+def test_profile_parsing():
+    fragments = ["1", "1", "(120){4}1-5[4:1]", "1bx/2", "", "E", "A1f"]
+    expected = [parse_fragment(f) if f not in ["", "E"] else [] for f in fragments]
+    for workers in [0, 2]:
+        fragment_cache.clear()
+        executor = ParseExecutor(workers=workers, serial_threshold=0)
+        try:
+            with profile_parsing() as profile:
+                assert executor.parse(fragments) == expected
+                assert executor.parse_charts([fragments], "chart") == [expected]
+        finally:
+            executor.shutdown()
+
+        paths = {record.fragment: record.path for record in profile.records}
+        assert paths == {
+            "1": "scanner",
+            "(120){4}1-5[4:1]": "scanner",
+            "1bx/2": "scanner",
+            "": "empty",
+            "E": "empty",
+            "A1f": "lark",
+        }
+        # The "chart" schedule bypasses the fragment cache with workers
+        count = 12 if workers > 1 else 6
+        assert len(profile.records) == count
+        assert sum(count for _, count in profile.histogram()) == count
+        assert profile.slowest(1)[0].seconds == max(
+            record.seconds for record in profile.records
+        )
+        assert "A1f" in profile.report(top=12)